@@ -3,23 +3,49 @@ from PyQt5.QtWidgets import (QApplication, QCheckBox, QComboBox, QDateTimeEdit,
         QDial, QDialog, QGridLayout, QGroupBox, QHBoxLayout, QLabel, QLineEdit,
         QProgressBar, QPushButton, QRadioButton, QScrollBar, QSizePolicy,
         QSlider, QSpinBox, QStyleFactory, QTableWidget, QTabWidget, QTextEdit,
-        QVBoxLayout, QWidget, QTableWidgetItem, QMessageBox, QFormLayout, QListWidget)
+        QVBoxLayout, QWidget, QTableWidgetItem, QMessageBox, QFormLayout, QListWidget, QFileDialog)
 from PyQt5.QtGui import * 
 
 from parula import parula
 
+import os
 import sys
 import time
+from datetime import timedelta
 
 import numpy as np
 
-from matplotlib.backends.qt_compat import QtCore, QtWidgets
-from matplotlib.backends.backend_qt5agg import (
-        FigureCanvas, NavigationToolbar2QT as NavigationToolbar)
-from matplotlib.figure import Figure
-from matplotlib.colors import LinearSegmentedColormap
+import perf
+import sweeps
+import sweepExport
+from american import AmericanOption
+from pricing import option, Strategy, OUTPUTS
+from sweepCache import SweepCache
+from timeSlices import timeSlices
+from uiWorkers import JobRunner
 
-from pricing import option
+#sweeps drawn on screen are computed and cached in float32, half the memory of a
+#float64 sweep, see benchmarks/precision.py for the error bounds
+SWEEP_DTYPE = np.float32
+
+#time slices drawn on the Time Evolution of Value tab, evenly spaced from now to
+#expiration. the now, half time and expiration curves are labelled, the rest drawn faint
+EVOLUTION_SLICES = 21
+
+#file types offered by Export to MATLAB, the first is the default
+EXPORT_FILTERS = ["MATLAB v7.3 (*.mat)", "HDF5 (*.h5)", "Compressed NumPy (*.npz)", "NumPy Directory (*.npy)"]
+
+#matplotlib is imported by importPlotting once the window is up, not at startup
+FigureCanvas = None
+Figure = None
+LinearSegmentedColormap = None
+
+def importPlotting():
+    global FigureCanvas, Figure, LinearSegmentedColormap
+    if FigureCanvas is None:
+        from matplotlib.backends.backend_qt5agg import FigureCanvas
+        from matplotlib.figure import Figure
+        from matplotlib.colors import LinearSegmentedColormap
 
 class BlackScholesUI(QDialog):
     def __init__(self, parent=None):
@@ -30,8 +56,19 @@ class BlackScholesUI(QDialog):
         self.outputs = ['price', 'delta', 'vega', 'theta', 'rho', 'omega',\
                         'gamma', 'vanna', 'charm', 'vomma', 'veta', 'speed', \
                             'zomma', 'color', 'ultima', 'dualDelta', 'dualGamma']
+        #greeks shown in the info table, rows 5-10 of column 1 then rows 0-9 of column 3
+        self.tableGreeks = ['delta', 'vega', 'theta', 'rho', 'omega', 'gamma', 'vanna', 'charm', \
+                            'vomma', 'veta', 'speed', 'zomma', 'color', 'ultima', 'dualDelta', 'dualGamma']
             
         self.optionsList = []
+        self.cache = SweepCache()
+        self.selected = []
+        self.addCount = 0
+        self.surface = None
+        self.pendingStage = None
+        self.volSurface = None
+        self.jobs = JobRunner(parent=self)
+        self.jobs.progress.connect(self.onJobProgress)
             
         self.addOptionSelector()
         self.addOptionInputs()
@@ -51,9 +88,14 @@ class BlackScholesUI(QDialog):
         rightLayout.addWidget(self.outputSelectList, 1, 0, 5, 4)
         MATLABButton = QPushButton("Export to MATLAB")
         rightLayout.addWidget(MATLABButton, 6, 0, 1, 2)
+        MATLABButton.clicked.connect(self.onExportClicked)
         plotButton = QPushButton("Plot Sweep Outputs")
         rightLayout.addWidget(plotButton, 6, 2, 1, 2)
         plotButton.clicked.connect(self.onPlotSweepButtonClicked)
+        self.progressBar = QProgressBar()
+        self.progressBar.setRange(0, 100)
+        self.progressBar.setValue(100)
+        rightLayout.addWidget(self.progressBar, 7, 0, 1, 4)
         
         bottomLayout = QGridLayout()
         bottomLayout.addWidget(self.optionsBox, 0, 0, 2, 4)
@@ -80,6 +122,7 @@ class BlackScholesUI(QDialog):
         
         self.setWindowTitle("Black-Scholes Calculations")
         QApplication.setStyle(QStyleFactory.create('Fusion'))
+        QTimer.singleShot(0, self.loadPlots)
         
     def addOptionSelector(self):
         self.optionsSelection = QGroupBox()
@@ -87,11 +130,20 @@ class BlackScholesUI(QDialog):
         addOptionButton.clicked.connect(self.onOptionsAddClicked) 
         self.optionsTypeBox = QComboBox()
         self.optionsTypeBox.addItems(['Long Call', 'Long Put', 'Short Call', 'Short Put'])
+        self.exerciseBox = QComboBox()
+        self.exerciseBox.addItems(['European', 'American'])
+        self.tickerEdit = QLineEdit()
+        self.tickerEdit.setPlaceholderText('Ticker')
+        loadSurfaceButton = QPushButton("Load Vol Surface")
+        loadSurfaceButton.clicked.connect(self.onLoadSurfaceClicked)
         
         layout = QHBoxLayout()
         layout.addWidget(addOptionButton)
         layout.addWidget(self.optionsTypeBox)
+        layout.addWidget(self.exerciseBox)
         layout.addStretch(1)
+        layout.addWidget(self.tickerEdit)
+        layout.addWidget(loadSurfaceButton)
         self.optionsSelection.setLayout(layout)
         
     def onOptionsAddClicked(self):
@@ -164,17 +216,53 @@ class BlackScholesUI(QDialog):
             otype = 'Put'
         
         if K and expDay and S0 and (q is not None) and r and (vol or marketPrice):
+            #built on a worker since the calendar lookup and IV solve can be slow. every
+            #build has a channel of its own, so none is ever superseded, and the build is one
+            #call that does not check progress: once submitted it runs to completion
+            cls = AmericanOption if self.exerciseBox.currentText() == 'American' else option
             if marketPrice is None:
-                opt = option(otype=otype, K=K, expDay=expDay, S0=S0, vol=vol, q=q, r=r, ls=ls)
+                build = lambda progress: cls(otype=otype, K=K, expDay=expDay, S0=S0, vol=vol, q=q, r=r, ls=ls)
             elif vol is None:
-                opt = option(otype=otype, K=K, expDay=expDay, S0=S0, marketPrice=marketPrice, q=q, r=r, ls=ls)
-            self.optionsList.append(opt)
-            self.updateOptionsDisplay()
+                build = lambda progress: cls(otype=otype, K=K, expDay=expDay, S0=S0, marketPrice=marketPrice, q=q, r=r, ls=ls)
+            self.addCount += 1
+            self.jobs.submit('add' + str(self.addCount), build, self.onOptionBuilt, self.onJobFailed)
+    
+    def onLoadSurfaceClicked(self):
+        ticker = str(self.tickerEdit.text()).strip().upper()
+        if not ticker:
+            msgBox = QMessageBox()
+            msgBox.setIcon(QMessageBox.Information)
+            msgBox.setWindowTitle("Error")
+            msgBox.setText("Please Enter a Ticker")
+            msgBox.exec_()
+            return
+        self.jobs.submit('surface', lambda progress: self.loadSurface(ticker, progress), self.onSurfaceLoaded, self.onJobFailed)
+    
+    #runs on a worker: fits an SVI surface to the ticker's puts, from a snapshot under
+    #chainCache/ when one is less than an hour old and from Yahoo (saved as one) otherwise.
+    #a superseded load stops after the expiry being fetched; the fit itself is one
+    #vectorized pass over every expiry and is not interrupted
+    def loadSurface(self, ticker, progress):
+        import chainData
+        from volSurface import VolSurface
+        chain, asOf = chainData.loadChain(ticker, cache=chainData.ChainCache(), maxAge=timedelta(hours=1), progress=progress)
+        return ticker, VolSurface.fromChain(chain, 'Put', asOf, method='svi')
+    
+    def onSurfaceLoaded(self, result):
+        ticker, self.volSurface = result
+        self.surfaceCheck.setText("Volatility From " + ticker + " Surface")
+        self.surfaceCheck.setEnabled(True)
+        self.surfaceCheck.setChecked(True)
+    
+    def onOptionBuilt(self, opt):
+        self.optionsList.append(opt)
+        self.updateOptionsDisplay()
             
             
     def updateOptionsDisplay(self):
         for i, opt in enumerate(self.optionsList):
-            self.optionsTable.setItem(i+1, 0, QTableWidgetItem(opt.ls + ' ' + opt.otype))
+            exercise = ' (American)' if isinstance(opt, AmericanOption) else ''
+            self.optionsTable.setItem(i+1, 0, QTableWidgetItem(opt.ls + ' ' + opt.otype + exercise))
             self.optionsTable.setItem(i+1, 1, QTableWidgetItem(str(opt.K)))
             self.optionsTable.setItem(i+1, 2, QTableWidgetItem(opt.expDayStr))
             self.optionsTable.setItem(i+1, 3, QTableWidgetItem(str(opt.S0)))
@@ -257,17 +345,98 @@ class BlackScholesUI(QDialog):
         self.plotGroupBox.setSizePolicy(QSizePolicy.Preferred,
                 QSizePolicy.Ignored)
         
+        self.tab1 = QWidget()
+        self.tab2 = QWidget()
+        self.plotsLoaded = False
+        
+        self.plotGroupBox.addTab(self.tab1, "&Time Evolution of Value")
+        self.plotGroupBox.addTab(self.tab2, "&Sweep Results")
+        self.plotGroupBox.addTab(self.perfPanel(), "&Performance")
+        #self.plotGroupBox.addTab(tab3, "&Profit Calculator")
+        #self.plotGroupBox.addTab(tab4, "&Delta Hedging")
+    
+    #opt-in timings from perf: per-stage totals and the last perfRows operations,
+    #refreshed while recording and the tab is showing
+    def perfPanel(self):
+        self.perfRows = 50
+        panel = QWidget()
+        self.perfCheck = QCheckBox("Record")
+        self.perfCheck.setChecked(perf.enabled)
+        self.perfCheck.toggled.connect(self.onPerfToggled)
+        clearButton = QPushButton("Clear")
+        clearButton.clicked.connect(self.onPerfClearClicked)
+        exportButton = QPushButton("Export")
+        exportButton.clicked.connect(self.onPerfExportClicked)
+        self.perfStats = QTableWidget(0, 5)
+        self.perfStats.setHorizontalHeaderLabels(['Stage', 'Calls', 'Total ms', 'Max ms', 'Max Size'])
+        self.perfRecent = QTableWidget(0, 4)
+        self.perfRecent.setHorizontalHeaderLabels(['Operation', 'ms', 'Size', 'At s'])
+        
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.perfCheck)
+        buttons.addStretch(1)
+        buttons.addWidget(clearButton)
+        buttons.addWidget(exportButton)
+        layout = QVBoxLayout()
+        layout.addLayout(buttons)
+        layout.addWidget(self.perfStats)
+        layout.addWidget(self.perfRecent)
+        panel.setLayout(layout)
+        
+        self.perfTimer = QTimer(self)
+        self.perfTimer.timeout.connect(self.refreshPerf)
+        self.perfTimer.start(500)
+        self.perfTab = panel
+        return panel
+    
+    def onPerfToggled(self, checked):
+        if checked:
+            perf.enable()
+        else:
+            perf.disable()
+    
+    def onPerfClearClicked(self):
+        perf.clear()
+        self.refreshPerf(force=True)
+    
+    #writes perf.json and perf.trace.json (for chrome://tracing or Perfetto)
+    def onPerfExportClicked(self):
+        perf.toJSON('perf.json')
+        perf.toChromeTrace('perf.trace.json')
+        msgBox = QMessageBox()
+        msgBox.setIcon(QMessageBox.Information)
+        msgBox.setWindowTitle("Export")
+        msgBox.setText("Saved perf.json and perf.trace.json")
+        msgBox.exec_()
+    
+    def refreshPerf(self, force=False):
+        if not force and (not perf.enabled or self.plotGroupBox.currentWidget() is not self.perfTab): return
+        stats = sorted(perf.stats().items(), key=lambda item: -item[1]['seconds'])
+        self.perfStats.setRowCount(len(stats))
+        for i, (name, s) in enumerate(stats):
+            for j, value in enumerate((name, str(s['count']), '%.2f' % (s['seconds']*1e3), '%.2f' % (s['maxSeconds']*1e3), str(s['maxSize']))):
+                self.perfStats.setItem(i, j, QTableWidgetItem(value))
+        recent = perf.recent(self.perfRows)
+        self.perfRecent.setRowCount(len(recent))
+        for i, (name, start, seconds, size, thread) in enumerate(recent):
+            for j, value in enumerate((name, '%.2f' % (seconds*1e3), str(size), '%.3f' % start)):
+                self.perfRecent.setItem(i, j, QTableWidgetItem(value))
+    
+    #swaps the placeholder tabs for matplotlib canvases, called after the window is shown
+    def loadPlots(self):
+        if self.plotsLoaded: return
+        importPlotting()
         self.tab1 = FigureCanvas(Figure(figsize=(4, 8)))
         self.plot1ax = self.tab1.figure.add_subplot(111)
 
         self.tab2 = FigureCanvas(Figure(figsize=(4, 8)))
         self.plot2ax = self.tab2.figure.add_subplot(111)
         
-        
-        self.plotGroupBox.addTab(self.tab1, "&Time Evolution of Value")
-        self.plotGroupBox.addTab(self.tab2, "&Sweep Results")
-        #self.plotGroupBox.addTab(tab3, "&Profit Calculator")
-        #self.plotGroupBox.addTab(tab4, "&Delta Hedging")
+        for i, (tab, name) in enumerate(((self.tab1, "&Time Evolution of Value"), (self.tab2, "&Sweep Results"))):
+            self.plotGroupBox.removeTab(i)
+            self.plotGroupBox.insertTab(i, tab, name)
+        self.plotGroupBox.setCurrentIndex(0)
+        self.plotsLoaded = True
     
     def optionsDisplay(self):
         self.optionsBox = QGroupBox("Options")
@@ -285,70 +454,66 @@ class BlackScholesUI(QDialog):
         self.optionsBox.setLayout(layout)
     
     def onOptionTableClicked(self, row, column):
+        self.loadPlots()
         self.selected = self.optionsTable.selectedItems()
-        fulltime = []
-        halftime = []
-        expiry = []
+        legs = self.selectedOptions()
+        self.jobs.cancel('sweep')
+        if legs:
+            self.jobs.submit('table', lambda progress: self.timeEvolution(legs, progress), self.onTimeEvolutionDone, self.onJobFailed)
+    
+    #selected options in selection order, each row once
+    def selectedOptions(self):
+        legs = []
         usedRows = []
         for item in self.selected:
             if item.row() != 0 and item.row()<=len(self.optionsList) and item.row() not in usedRows:
                 usedRows.append(item.row())
-                opt = self.optionsList[item.row()-1]
-                self.greeksTable.setItem(0, 1, QTableWidgetItem(str(opt.marketPrice)))
-                self.greeksTable.setItem(1, 1, QTableWidgetItem(str(opt.vol)))
-                self.greeksTable.setItem(2, 1, QTableWidgetItem(str(opt.T)))
-                self.greeksTable.setItem(3, 1, QTableWidgetItem(str(opt.q)))
-                self.greeksTable.setItem(4, 1, QTableWidgetItem(str(opt.r)))
-                self.greeksTable.setItem(5, 1, QTableWidgetItem(str(opt.delta(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(6, 1, QTableWidgetItem(str(opt.vega(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(7, 1, QTableWidgetItem(str(opt.theta(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(8, 1, QTableWidgetItem(str(opt.rho(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(9, 1, QTableWidgetItem(str(opt.omega(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(10, 1, QTableWidgetItem(str(opt.gamma(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(0, 3, QTableWidgetItem(str(opt.vanna(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(1, 3, QTableWidgetItem(str(opt.charm(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(2, 3, QTableWidgetItem(str(opt.vomma(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(3, 3, QTableWidgetItem(str(opt.veta(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(4, 3, QTableWidgetItem(str(opt.speed(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(5, 3, QTableWidgetItem(str(opt.zomma(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(6, 3, QTableWidgetItem(str(opt.color(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(7, 3, QTableWidgetItem(str(opt.ultima(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(8, 3, QTableWidgetItem(str(opt.dualDelta(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                self.greeksTable.setItem(9, 3, QTableWidgetItem(str(opt.dualGamma(S0=opt.S0, K=opt.K, vol=opt.vol, r=opt.r, T=opt.T, q=opt.q))))
-                
-                self.plot1ax.clear()
-                toSweep = {'S0' : (opt.S0*0.8, opt.S0*1.2, 50)}
-                toGrab = ('price')
-                fulltime.append(opt.sweep(toSweep, toGrab))
-                self.plot1ax.plot(fulltime[0]['S0'], self.sumprice(fulltime), label='Now')
-                saveT = opt.T
-                opt.T /= 2
-                halftime.append(opt.sweep(toSweep, toGrab))
-                self.plot1ax.plot(halftime[0]['S0'], self.sumprice(halftime), label='Half Time')
-                opt.T = 1e-6
-                expiry.append(opt.sweep(toSweep, toGrab))
-                opt.T = saveT
-                self.plot1ax.plot(expiry[0]['S0'], self.sumprice(expiry), label='Expiration')
-                self.plot1ax.set_xlabel('Stock Price')
-                self.plot1ax.set_ylabel('Option Price')
-                self.plot1ax.legend()
-                self.tab1.draw()
-            
-    def sumprice(self, outs):
-        for i in range(len(outs)):
-            outs[i]['price']=np.array(outs[i]['price'])
-            if i == 0:
-                if outs[0]['ls'] == 'Long':
-                    price=outs[0]['price']
-                elif outs[0]['ls'] == 'Short':
-                    price= -outs[0]['price']
+                legs.append(self.optionsList[item.row()-1])
+        return legs
+    
+    #runs on a worker: greeks of the last selected option and the value of the selected
+    #legs over spot at EVOLUTION_SLICES times from now to expiration, in one pass
+    def timeEvolution(self, legs, progress):
+        opt = legs[-1]
+        g = self.cache.greeks(opt, self.tableGreeks)
+        curves = timeSlices(legs, (legs[0].S0*0.8, legs[0].S0*1.2, 50), slices=EVOLUTION_SLICES, progress=progress)
+        return opt, g, curves
+    
+    @perf.timed('UI.onTimeEvolutionDone')
+    def onTimeEvolutionDone(self, result):
+        opt, g, curves = result
+        self.greeksTable.setItem(0, 1, QTableWidgetItem(str(opt.marketPrice)))
+        self.greeksTable.setItem(1, 1, QTableWidgetItem(str(opt.vol)))
+        self.greeksTable.setItem(2, 1, QTableWidgetItem(str(opt.T)))
+        self.greeksTable.setItem(3, 1, QTableWidgetItem(str(opt.q)))
+        self.greeksTable.setItem(4, 1, QTableWidgetItem(str(opt.r)))
+        for i, name in enumerate(self.tableGreeks):
+            self.greeksTable.setItem(5 + i if i < 6 else i - 6, 1 if i < 6 else 3, QTableWidgetItem(str(g[name])))
+        
+        self.plot1ax.clear()
+        labels = {1.0: 'Now', 0.5: 'Half Time', 0.0: 'Expiration'}
+        spots = curves.coords['S0']
+        for remaining, price in zip(curves.coords['remaining'], curves['price']):
+            label = labels.get(round(remaining, 12))
+            if label is None:
+                self.plot1ax.plot(spots, price, color='0.8', linewidth=0.8, zorder=1)
             else:
-                if outs[i]['ls'] == 'Long':
-                    price+=outs[i]['price']
-                elif outs[i]['ls'] == 'Short':
-                    price-=outs[i]['price']
-        return price
+                self.plot1ax.plot(spots, price, label=label)
+        self.plot1ax.set_xlabel('Stock Price')
+        self.plot1ax.set_ylabel('Option Price')
+        self.plot1ax.legend()
+        self.tab1.draw()
+    
+    def onJobProgress(self, channel, percent):
+        self.progressBar.setValue(percent if self.jobs.busy() else 100)
     
+    def onJobFailed(self, message):
+        msgBox = QMessageBox()
+        msgBox.setIcon(QMessageBox.Information)
+        msgBox.setWindowTitle("Error")
+        msgBox.setText(message)
+        msgBox.exec_()
+            
     def sweepInput(self):
         self.sweepBox = QGroupBox("Sweep Variables")
         
@@ -367,6 +532,9 @@ class BlackScholesUI(QDialog):
         self.max2 = QLineEdit()
         self.steps1 = QLineEdit()
         self.steps2 = QLineEdit()
+        #sweeps read vol from the loaded surface at each strike and expiry when checked
+        self.surfaceCheck = QCheckBox("Volatility From Surface")
+        self.surfaceCheck.setEnabled(False)
 
         self.inputBox = QGridLayout()
         self.inputBox.addWidget(toSweepLabel, 0, 0, 1, 1)
@@ -381,6 +549,7 @@ class BlackScholesUI(QDialog):
         self.inputBox.addWidget(self.max2, 2, 2, 3, 3)
         self.inputBox.addWidget(self.steps1, 1, 3, 2, 4)
         self.inputBox.addWidget(self.steps2, 2, 3, 3, 4)
+        self.inputBox.addWidget(self.surfaceCheck, 5, 0, 1, 4)
         
     def sweepOutput(self):
         self.outputSelectList = QListWidget()
@@ -391,6 +560,27 @@ class BlackScholesUI(QDialog):
         self.outputSelectList.setSelectionMode(1)
         
     def onPlotSweepButtonClicked(self):
+        self.loadPlots()
+        spec = self.sweepSpec()
+        if spec is None: return
+        target, toSweep, toGrab, is1, is2, surface = spec
+        labels = [str(self.inputSelect1.currentText()), str(self.inputSelect2.currentText())]
+        
+        #uncached surfaces are drawn coarse first and refined in the background
+        self.surface = None
+        self.pendingStage = None
+        if len(toSweep) == 2 and not self.cache.contains(target, sweeps.meshgridOrder(toSweep), toGrab, surface, SWEEP_DTYPE):
+            self.jobs.submit('sweep', lambda progress: self.progressiveSweep(target, toSweep, toGrab, is1, is2, surface, progress),
+                             lambda out: self.plotSweep(out, toSweep, toGrab, is1, is2, labels), self.onJobFailed,
+                             lambda stage: self.onSurfaceStage(stage, labels, str(toGrab[0])))
+            return
+        
+        self.jobs.submit('sweep', lambda progress: self.cache.sweep(target, toSweep, toGrab, progress, surface, SWEEP_DTYPE),
+                         lambda out: self.plotSweep(out, toSweep, toGrab, is1, is2, labels), self.onJobFailed)
+    
+    #the sweep set up in the sweep panels: (target, toSweep, toGrab, is1, is2, surface),
+    #or None after telling the user what is missing
+    def sweepSpec(self):
         toSweep = {}
         if len(self.outputSelectList.selectedItems()) < 1: 
             msgBox = QMessageBox()
@@ -401,6 +591,7 @@ class BlackScholesUI(QDialog):
             return
         toGrab = self.outputSelectList.selectedItems()
         toGrab = [str(g.text()) for g in toGrab]
+        is1 = is2 = None
         if str(self.inputSelect1.currentText()) == 'Stock Price': is1 = 'S0'
         if str(self.inputSelect1.currentText()) =='Years to Expiration': is1 = 'T'
         if str(self.inputSelect1.currentText()) =='Volatility': is1 = 'vol'
@@ -428,69 +619,119 @@ class BlackScholesUI(QDialog):
             msgBox.setText("Select At Least One Input")
             msgBox.exec_()
             return
-        if len(self.selected) > 1 and toGrab[0] != 'price' or len(self.selected) > 1 and len(toGrab) > 1:
+        legs = self.selectedOptions()
+        if len(legs) == 0:
             msgBox = QMessageBox()
             msgBox.setIcon(QMessageBox.Information)
             msgBox.setWindowTitle("Error")
-            msgBox.setText("Output Must be Only Price if More than One Option Selected")
+            msgBox.setText("Select At Least One Option")
             msgBox.exec_()
             return
-
+        surface = self.volSurface if self.surfaceCheck.isChecked() else None
+        if surface is not None and 'vol' in toSweep:
+            msgBox = QMessageBox()
+            msgBox.setIcon(QMessageBox.Information)
+            msgBox.setWindowTitle("Error")
+            msgBox.setText("Volatility Comes From the Surface, Uncheck it to Sweep Volatility")
+            msgBox.exec_()
+            return
+        #several legs are swept as one position, any output is then the portfolio's
+        target = legs[0] if len(legs) == 1 else Strategy(legs)
+        return target, toSweep, toGrab, is1, is2, surface
+    
+    def onExportClicked(self):
+        spec = self.sweepSpec()
+        if spec is None: return
+        path, chosen = QFileDialog.getSaveFileName(self, "Export Sweep", "sweep.mat", ";;".join(EXPORT_FILTERS))
+        if not path: return
+        #a name typed without a known extension takes the chosen filter's
+        if os.path.splitext(path)[1].lower() not in sweepExport.FORMATS:
+            path += chosen[chosen.index('*') + 1:-1] if '*' in chosen else '.mat'
+        self.exportSweep(path, *spec)
+    
+    #streams the sweep into path on a worker in float64, in the grid orientation the
+    #sweep is plotted in, one block at a time however large the sweep
+    def exportSweep(self, path, target, toSweep, toGrab, is1, is2, surface):
+        self.jobs.submit('export', lambda progress: sweepExport.exportSweep(target, sweeps.meshgridOrder(toSweep), toGrab, path,
+                                                                             surface=surface, progress=progress),
+                         self.onExportDone, self.onJobFailed)
+    
+    def onExportDone(self, path):
+        msgBox = QMessageBox()
+        msgBox.setIcon(QMessageBox.Information)
+        msgBox.setWindowTitle("Export")
+        msgBox.setText("Sweep written to " + path)
+        msgBox.exec_()
+    
+    #runs on a worker: refines the option's or strategy's surface stage by stage, posting
+    #each stage but the last (which plotSweep draws) as (x, y, z) over the nodes computed so
+    #far. progress is checked after every block, the full-resolution stage included, so a
+    #superseded sweep stops there rather than finishing the grid
+    def progressiveSweep(self, target, toSweep, toGrab, is1, is2, surface, progress):
+        grid = sweeps.meshgridOrder(toSweep)
+        axes = sweeps.sweepAxes(grid)
+        coords = dict(axes)
+        names = [k for k in OUTPUTS if k in toGrab]
+        nStages = max(len(sweeps.refineLevels(vec.size)) for k, vec in axes)
+        kernel, scalars = sweeps.withSurface(target.greeks, axes, target.inputs(), surface)
+        stages = sweeps.refineStages(kernel, axes, scalars, names, dtype=SWEEP_DTYPE, progress=progress)
+        for s, (idx, out) in enumerate(stages):
+            if s == nStages - 1:
+                break
+            z = out[toGrab[0]][np.ix_(*idx)]
+            x = np.broadcast_to(coords[is1][idx[list(grid).index(is1)]], z.shape)
+            y = np.broadcast_to(coords[is2][idx[list(grid).index(is2)]][:, None], z.shape)
+            progress(s+1, nStages, (x, y, z))
+        self.cache.store(target, grid, out, surface, SWEEP_DTYPE)
+        res = sweeps.SweepResult(axes, out, scalars, target.ls)
+        return dict([(k, res[k]) for k in res.keys()])
+    
+    #stages can arrive faster than they are drawn, only the newest pending one is drawn
+    def onSurfaceStage(self, stage, labels, zlabel):
+        scheduled = self.pendingStage is not None
+        self.pendingStage = (stage, labels, zlabel)
+        if not scheduled: QTimer.singleShot(0, self.drawSurfaceStage)
+    
+    @perf.timed('UI.drawSurfaceStage')
+    def drawSurfaceStage(self):
+        if self.pendingStage is None: return
+        (x, y, z), labels, zlabel = self.pendingStage
+        self.pendingStage = None
+        if self.surface is None:
+            #an existing 3-D axes is reused, rebuilding it costs more than the coarse stage
+            if getattr(self.plot2ax, 'name', None) == '3d':
+                for artist in list(self.plot2ax.collections): artist.remove()
+            else:
+                self.tab2.figure.clf()
+                self.plot2ax = self.tab2.figure.add_subplot(111, projection='3d')
+            self.plot2ax.set_xlabel(labels[0])
+            self.plot2ax.set_ylabel(labels[1])
+            self.plot2ax.set_zlabel(zlabel)
+        else:
+            self.surface.remove()
+        parula_map = LinearSegmentedColormap.from_list('parula', parula())
+        self.surface = self.plot2ax.plot_surface(x, y, z, cmap=parula_map)
+        self.tab2.draw()
+    
+    @perf.timed('UI.plotSweep')
+    def plotSweep(self, out, toSweep, toGrab, is1, is2, labels):
+        self.surface = None
+        self.pendingStage = None
+        z = out[toGrab[0]]
+        self.tab2.figure.clf()
         if len(toSweep) == 1:
-            out = []
-            usedRows = []
-            self.tab2.figure.clf()
             self.plot2ax = self.tab2.figure.add_subplot(111)
-            if len(self.selected) > 1:
-                for item in self.selected:
-                    if item.row() != 0 and item.row()<=len(self.optionsList) and item.row() not in usedRows:
-                        opt = self.optionsList[item.row()-1]
-                        usedRows.append(item.row())
-                        out.append(opt.sweep(toSweep, toGrab))
-                        self.plot2ax.clear()
-                        self.plot2ax.plot(out[0][is1], self.sumprice(out))
-                        self.plot2ax.set_xlabel(str(self.inputSelect1.currentText()))
-                        self.plot2ax.set_ylabel(str(toGrab[0]))
-                        self.tab2.draw()
-            else:
-                for item in self.selected:
-                    if item.row() != 0 and item.row()<=len(self.optionsList):
-                        opt = self.optionsList[item.row()-1]
-                        out = opt.sweep(toSweep, toGrab)
-                        self.plot2ax.clear()
-                        self.plot2ax.plot(out[is1], out[toGrab[0]])
-                        self.plot2ax.set_xlabel(str(self.inputSelect1.currentText()))
-                        self.plot2ax.set_ylabel(str(toGrab[0]))
-                        self.tab2.draw()
+            self.plot2ax.plot(out[is1], z)
+            self.plot2ax.set_xlabel(labels[0])
+            self.plot2ax.set_ylabel(str(toGrab[0]))
         elif len(toSweep) == 2:
             parula_map = LinearSegmentedColormap.from_list('parula', parula())
-            out = []
-            usedRows = []
-            self.tab2.figure.clf()
             self.plot2ax = self.tab2.figure.add_subplot(111, projection='3d')
-            if len(self.selected) > 1:
-                for item in self.selected:
-                    if item.row() != 0 and item.row()<=len(self.optionsList) and item.row() not in usedRows:
-                        opt = self.optionsList[item.row()-1]
-                        usedRows.append(item.row())
-                        out.append(opt.sweep(toSweep, toGrab))
-                        self.plot2ax.clear()
-                        self.plot2ax.plot_surface(out[0][is1], out[0][is2], self.sumprice(out), cmap=parula_map)
-                        self.plot2ax.set_xlabel(str(self.inputSelect1.currentText()))
-                        self.plot2ax.set_ylabel(str(self.inputSelect2.currentText()))
-                        self.plot2ax.set_zlabel(str(toGrab[0]))
-                self.tab2.draw()
-            else:
-                for item in self.selected:
-                    if item.row() != 0 and item.row()<=len(self.optionsList):
-                        opt = self.optionsList[item.row()-1]
-                        out = opt.sweep(toSweep, toGrab)
-                        self.plot2ax.clear()
-                        self.plot2ax.plot_surface(out[is1], out[is2], out[toGrab[0]], cmap=parula_map)
-                        self.plot2ax.set_xlabel(str(self.inputSelect1.currentText()))
-                        self.plot2ax.set_ylabel(str(self.inputSelect2.currentText()))
-                        self.plot2ax.set_zlabel(str(toGrab[0]))
-                        self.tab2.draw()
+            self.plot2ax.plot_surface(out[is1], out[is2], z, cmap=parula_map)
+            self.plot2ax.set_xlabel(labels[0])
+            self.plot2ax.set_ylabel(labels[1])
+            self.plot2ax.set_zlabel(str(toGrab[0]))
+        self.tab2.draw()
             
                 
             
@@ -0,0 +1,330 @@
+import functools
+import math
+
+import numpy as np
+
+import perf
+import sweeps
+from pricing import option, OUTPUTS, ncdf, greeks as europeanGreeks, impliedVol as europeanImpliedVol
+
+#'bs2002' is the Bjerksund-Stensland (2002) closed-form approximation, fast and slightly
+#low (typically well under 1% of the price). 'lr' (Leisen-Reimer) and 'crr' (Cox-Ross-
+#Rubinstein) are binomial lattices converging to the true value as steps grow, lr at
+#roughly 1/steps**2 and crr at 1/steps with an oscillating error
+METHODS = ('bs2002', 'lr', 'crr')
+
+#float64 lattice nodes held per block, the lattice prices this many nodes worth of
+#contracts (steps+1 nodes each) at once. small enough for the working rows to stay in
+#cache through the backward induction
+LATTICE_CHUNK = 1 << 16
+
+#finite difference bumps behind the greeks: relative for S0, K and T, absolute for
+#vol and r. the lattices take wider ones since their values carry discretisation noise,
+#even so their third order greeks are rough (crr's more so than lr's)
+BUMPS = {'bs2002': {'S0': 1e-3, 'K': 1e-3, 'vol': 1e-3, 'r': 1e-4, 'T': 1e-3},
+         'lattice': {'S0': 1e-2, 'K': 1e-2, 'vol': 5e-3, 'r': 1e-3, 'T': 1e-2}}
+RELATIVE = ('S0', 'K', 'T')
+
+#each output as (sign, inputs it is differentiated by), repeated for higher orders,
+#matching the conventions of the european kernel (theta and charm against -T)
+DERIVATIVES = {'delta': (1, ('S0',)), 'vega': (1, ('vol',)), 'theta': (-1, ('T',)), 'rho': (1, ('r',)),
+               'gamma': (1, ('S0', 'S0')), 'vanna': (1, ('S0', 'vol')), 'charm': (-1, ('S0', 'T')),
+               'vomma': (1, ('vol', 'vol')), 'veta': (1, ('vol', 'T')), 'speed': (1, ('S0', 'S0', 'S0')),
+               'zomma': (1, ('S0', 'S0', 'vol')), 'color': (1, ('S0', 'S0', 'T')),
+               'ultima': (1, ('vol', 'vol', 'vol')), 'dualDelta': (1, ('K',)), 'dualGamma': (1, ('K', 'K'))}
+
+#central difference stencils by order, as {offset in bumps: weight}
+STENCILS = {1: {-1: -0.5, 1: 0.5}, 2: {-1: 1.0, 0: -2.0, 1: 1.0}, 3: {-2: -0.5, -1: 1.0, 1: -1.0, 2: 0.5}}
+
+_BUMPED = ('S0', 'K', 'vol', 'r', 'T')
+
+def isCallOf(otype):
+    if isinstance(otype, str):
+        isCall = otype.title() == 'Call'
+        if not isCall and otype.title() != 'Put': raise ValueError('Unknown option type ' + otype)
+        return isCall
+    return np.asarray(otype, dtype=bool)
+
+#P(X < a, Y < b) for standard normals with correlation rho, by gauss-legendre quadrature
+#of Drezner-Wesolowsky's integral over asin(rho) as in Genz's bvnd. 12 nodes are accurate
+#to about 1e-15 for |rho| < 0.8, which covers the +-0.786 bs2002 uses. the nodes are
+#summed one at a time so temporaries stay the size of a and b
+_GLX, _GLW = np.polynomial.legendre.leggauss(12)
+
+def bivariateNormal(a, b, rho):
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    hk = a*b
+    hs = (a*a + b*b)/2
+    asr = math.asin(rho)
+    total = 0
+    for x, w in zip(_GLX, _GLW):
+        sn = math.sin(asr*(1 + x)/2)
+        total = total + w*np.exp((sn*hk - hs)/(1 - sn*sn))
+    return total*asr/(4*np.pi) + ncdf(a)*ncdf(b)
+
+#phi and psi of Bjerksund-Stensland (2002), b the cost of carry r - q
+def _phi(S, T, gamma, H, I, r, b, vol):
+    v2 = vol*vol
+    volSqrtT = vol*np.sqrt(T)
+    lam = (-r + gamma*b + 0.5*gamma*(gamma - 1)*v2)*T
+    d = -(np.log(S/H) + (b + (gamma - 0.5)*v2)*T)/volSqrtT
+    kappa = 2*b/v2 + 2*gamma - 1
+    return np.exp(lam)*S**gamma*(ncdf(d) - (I/S)**kappa*ncdf(d - 2*np.log(I/S)/volSqrtT))
+
+def _psi(S, T, gamma, H, I2, I1, t1, r, b, vol):
+    v2 = vol*vol
+    drift = b + (gamma - 0.5)*v2
+    s1, s2 = vol*np.sqrt(t1), vol*np.sqrt(T)
+    e1 = (np.log(S/I1) + drift*t1)/s1
+    e2 = (np.log(I2**2/(S*I1)) + drift*t1)/s1
+    e3 = (np.log(S/I1) - drift*t1)/s1
+    e4 = (np.log(I2**2/(S*I1)) - drift*t1)/s1
+    f1 = (np.log(S/H) + drift*T)/s2
+    f2 = (np.log(I2**2/(S*H)) + drift*T)/s2
+    f3 = (np.log(I1**2/(S*H)) + drift*T)/s2
+    f4 = (np.log(S*I1**2/(H*I2**2)) + drift*T)/s2
+    rho = math.sqrt((math.sqrt(5) - 1)/2)
+    lam = -r + gamma*b + 0.5*gamma*(gamma - 1)*v2
+    kappa = 2*b/v2 + 2*gamma - 1
+    return np.exp(lam*T)*S**gamma*(bivariateNormal(-e1, -f1, rho) - (I2/S)**kappa*bivariateNormal(-e2, -f2, rho)
+                                   - (I1/S)**kappa*bivariateNormal(-e3, -f3, -rho)
+                                   + (I1/I2)**kappa*bivariateNormal(-e4, -f4, -rho))
+
+#american call by the two-step flat exercise boundary of Bjerksund-Stensland (2002).
+#without a dividend yield early exercise never pays and the european value is returned
+def _bs2002Call(S, K, vol, r, T, q):
+    b = r - q
+    v2 = vol*vol
+    t1 = 0.5*(math.sqrt(5) - 1)*T
+    beta = (0.5 - b/v2) + np.sqrt((b/v2 - 0.5)**2 + 2*r/v2)
+    bInf = beta/(beta - 1)*K
+    b0 = np.maximum(K, r/(r - b)*K)
+    scale = K*K/((bInf - b0)*b0)
+    I1 = b0 + (bInf - b0)*(1 - np.exp(-(b*t1 + 2*vol*np.sqrt(t1))*scale))
+    I2 = b0 + (bInf - b0)*(1 - np.exp(-(b*T + 2*vol*np.sqrt(T))*scale))
+    alpha1 = (I1 - K)*I1**-beta
+    alpha2 = (I2 - K)*I2**-beta
+    value = (alpha2*S**beta - alpha2*_phi(S, t1, beta, I2, I2, r, b, vol)
+             + _phi(S, t1, 1, I2, I2, r, b, vol) - _phi(S, t1, 1, I1, I2, r, b, vol)
+             - K*_phi(S, t1, 0, I2, I2, r, b, vol) + K*_phi(S, t1, 0, I1, I2, r, b, vol)
+             + alpha1*_phi(S, t1, beta, I1, I2, r, b, vol) - alpha1*_psi(S, T, beta, I1, I2, I1, t1, r, b, vol)
+             + _psi(S, T, 1, I1, I2, I1, t1, r, b, vol) - _psi(S, T, 1, K, I2, I1, t1, r, b, vol)
+             - K*_psi(S, T, 0, I1, I2, I1, t1, r, b, vol) + K*_psi(S, T, 0, K, I2, I1, t1, r, b, vol))
+    european = europeanGreeks(('price',), 'Call', S, K, vol, r, T, q)['price']
+    #the approximation is a lower bound, as are the european and intrinsic values, so
+    #the largest of them is the closest
+    return np.where(b >= r, european, np.where(S >= I2, S - K, np.maximum(np.maximum(value, european), S - K)))
+
+#puts priced as calls through put-call symmetry, P(S, K, r, q) = C(K, S, q, r), so calls
+#and puts of a mixed book go through one evaluation
+def _bs2002(isCall, S0, K, vol, r, T, q):
+    return _bs2002Call(np.where(isCall, S0, K), np.where(isCall, K, S0), vol, np.where(isCall, r, q), T,
+                       np.where(isCall, q, r))
+
+#fn over the broadcast inputs flattened and taken block elements at a time, so the
+#temporaries stay bounded however large the grid (or stack of bumped grids) is.
+#expired contracts are worth their intrinsic value and never reach fn
+def _blocked(fn, block, isCall, S0, K, vol, r, T, q):
+    args = np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in (isCall, S0, K, vol, r, T, q)])
+    shape = args[0].shape
+    isCall, S0, K, vol, r, T, q = [x.ravel() for x in args]
+    isCall = isCall.astype(bool)
+    out = np.maximum(np.where(isCall, S0 - K, K - S0), 0)
+    rows = np.flatnonzero(T > 0)
+    with np.errstate(all='ignore'):
+        for start in range(0, rows.size, block):
+            part = rows[start:start + block]
+            out[part] = fn(isCall[part], S0[part], K[part], vol[part], r[part], T[part], q[part])
+    return out.reshape(shape)
+
+def bs2002(isCall, S0, K, vol, r, T, q):
+    return _blocked(_bs2002, sweeps.CHUNK, isCall, S0, K, vol, r, T, q)
+
+#peizer-pratt method 2 inversion of the normal cdf onto n binomial steps
+def _peizerPratt(z, n):
+    return 0.5 + np.copysign(np.sqrt(0.25 - 0.25*np.exp(-(z/(n + 1/3 + 0.1/(n + 1)))**2*(n + 1/6))), z)
+
+#backward induction over one block of contracts, nodes laid out (node, contract) so
+#every step works on contiguous rows. stock prices and strikes carry the payoff sign,
+#so exercise values of calls and puts are one subtraction
+def _induct(isCall, S0, K, vol, r, T, q, n, tree):
+    dt = T/n
+    growth = np.exp((r - q)*dt)
+    if tree == 'crr':
+        u = np.exp(vol*np.sqrt(dt))
+        d = 1/u
+        p = (growth - d)/(u - d)
+    else:
+        volSqrtT = vol*np.sqrt(T)
+        d1 = (np.log(S0/K) + (r - q + vol**2/2)*T)/volSqrtT
+        p = _peizerPratt(d1 - volSqrtT, n)
+        u = growth*_peizerPratt(d1, n)/p
+        d = (growth - p*u)/(1 - p)
+    disc = np.exp(-r*dt)
+    pu, pd = disc*p, disc*(1 - p)
+    sign = np.where(isCall, 1.0, -1.0)
+    j = np.arange(n + 1.0)[:, None]
+    S = sign*S0*u**j*d**(n - j)
+    K = sign*K
+    V = np.maximum(S - K, 0)
+    down = 1/d
+    exercise = np.empty_like(V)
+    step = np.empty_like(V)
+    for i in range(n - 1, -1, -1):
+        np.multiply(V[1:i+2], pu, out=step[:i+1])
+        V[:i+1] *= pd
+        V[:i+1] += step[:i+1]
+        S[:i+1] *= down
+        np.subtract(S[:i+1], K, out=exercise[:i+1])
+        np.maximum(V[:i+1], exercise[:i+1], out=V[:i+1])
+    return V[0]
+
+#binomial lattice with early exercise at every node. tree is 'lr' (steps rounded up to
+#odd, as leisen-reimer needs) or 'crr'. inputs broadcast like the european kernel and
+#are priced LATTICE_CHUNK nodes at a time
+def lattice(isCall, S0, K, vol, r, T, q, steps=201, tree='lr'):
+    n = steps + 1 - steps % 2 if tree == 'lr' else steps
+    induct = lambda *args: _induct(*args, n, tree)
+    return _blocked(induct, max(1, LATTICE_CHUNK//(n + 1)), isCall, S0, K, vol, r, T, q)
+
+#american price of every element, by the method and (lattices only) number of steps
+def price(isCall, S0, K, vol, r, T, q=0, method='bs2002', steps=201):
+    if method == 'bs2002': return bs2002(isCall, S0, K, vol, r, T, q)
+    if method in ('lr', 'crr'): return lattice(isCall, S0, K, vol, r, T, q, steps, method)
+    raise ValueError('method must be one of ' + ', '.join(METHODS))
+
+#bump points and weights of the finite differences behind names: {point: index}, where
+#a point is the offset (in bumps) of each input in _BUMPED, and per name the sign,
+#[(index, weight)] and {input: order}
+def _stencils(names):
+    points = {(0,)*len(_BUMPED): 0}
+    plans = {}
+    for name in names:
+        if name not in DERIVATIVES: continue
+        sign, by = DERIVATIVES[name]
+        orders = dict([(k, by.count(k)) for k in by])
+        terms = [((0,)*len(_BUMPED), 1.0)]
+        for k, order in orders.items():
+            i = _BUMPED.index(k)
+            terms = [(p[:i] + (p[i] + off,) + p[i+1:], w*wk) for p, w in terms for off, wk in STENCILS[order].items()]
+        plan = []
+        for p, w in terms:
+            if p not in points: points[p] = len(points)
+            plan.append((points[p], w))
+        plans[name] = (sign, plan, orders)
+    return points, plans
+
+#the european kernel's interface for american exercise: any subset of OUTPUTS of
+#american contracts, the price from the chosen method and every greek by central
+#differences of it. all bumped inputs are stacked on a leading axis and priced in one
+#call, so greeks cost one (bigger) pricing pass rather than one per bump
+@perf.timed('american.greeks')
+def greeks(names, otype, S0, K, vol, r, T, q=0, method='bs2002', steps=201):
+    if isinstance(names, str): names = (names,)
+    for name in names:
+        if name not in OUTPUTS: raise ValueError('Unknown output ' + str(name))
+    isCall = isCallOf(otype)
+    base = dict(zip(('S0', 'K', 'vol', 'r', 'T'), [np.asarray(x, dtype=np.float64) for x in (S0, K, vol, r, T)]))
+    shape = np.broadcast(isCall, q, *base.values()).shape
+    wanted = set(names) | (set(['price', 'delta']) if 'omega' in names else set())
+    points, plans = _stencils(wanted)
+    bumps = BUMPS['bs2002' if method == 'bs2002' else 'lattice']
+    h = dict([(k, bumps[k]*np.abs(base[k]) if k in RELATIVE else np.full(base[k].shape, bumps[k])) for k in _BUMPED])
+    if len(points) == 1:
+        values = price(isCall, *[base[k] for k in _BUMPED], q, method, steps)[None]
+    else:
+        offsets = np.array(list(points), dtype=np.float64).reshape((len(points), len(_BUMPED)) + (1,)*len(shape))
+        args = [base[k] + offsets[:, i]*h[k] if any(p[i] for p in points) else base[k] for i, k in enumerate(_BUMPED)]
+        values = price(isCall, *args, q, method, steps)
+    values = np.broadcast_to(values, (len(points),) + shape)
+    out = {'price': values[0]}
+    for name, (sign, plan, orders) in plans.items():
+        scale = functools.reduce(lambda a, b: a*b, [h[k]**order for k, order in orders.items()])
+        out[name] = sign*sum(w*values[i] for i, w in plan)/scale
+    if 'omega' in wanted:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out['omega'] = out['delta']*base['S0']/out['price']
+    return dict([(name, out[name][()]) for name in names])
+
+#implied vol of american prices: safeguarded newton on the finite-difference vega,
+#started from the european implied vol and kept inside a per-element bisection bracket.
+#returns vol, iterations and noSolution flags like pricing.impliedVol
+@perf.timed('american.impliedVol')
+def impliedVol(price, otype, S0, K, r, T, q=0, method='bs2002', steps=201, tol=1e-8, maxIter=50, volMax=5.0):
+    price, S0, K, r, T, q = np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in (price, S0, K, r, T, q)])
+    shape = price.shape
+    price, S0, K, r, T, q = [x.ravel() for x in (price, S0, K, r, T, q)]
+    isCall = np.broadcast_to(isCallOf(otype), shape).ravel()
+    intrinsic = np.maximum(np.where(isCall, S0 - K, K - S0), 0)
+    noSolution = ~((price > intrinsic) & (price < np.where(isCall, S0, K)) & (T > 0))
+    with np.errstate(all='ignore'):
+        vol = europeanImpliedVol(price, np.where(isCall, 'Call', 'Put'), S0, K, r, T, q)[0]
+    vol = np.where(np.isfinite(vol), np.clip(vol, 1e-3, volMax/2), 0.2)
+    lo = np.full(price.shape, 1e-4)
+    hi = np.full(price.shape, volMax)
+    iterations = np.zeros(price.shape, dtype=np.int64)
+    active = np.flatnonzero(~noSolution)
+    vol[noSolution] = np.nan
+    for i in range(maxIter):
+        if active.size == 0: break
+        s = vol[active]
+        g = greeks(('price', 'vega'), isCall[active], S0[active], K[active], s, r[active], T[active], q[active], method, steps)
+        f = g['price'] - price[active]
+        iterations[active] += 1
+        lo[active] = np.where(f < 0, s, lo[active])
+        hi[active] = np.where(f > 0, s, hi[active])
+        with np.errstate(all='ignore'):
+            new = s - f/g['vega']
+        bad = ~np.isfinite(new) | (new <= lo[active]) | (new >= hi[active])
+        new = np.where(bad, (lo[active] + hi[active])/2, new)
+        priced = np.abs(f) < tol*np.maximum(price[active], 1)
+        vol[active] = np.where(priced, s, new)
+        done = priced | (np.abs(new - s) < tol*s) | (hi[active] - lo[active] < tol*s)
+        active = active[~done]
+    noSolution[active] = True
+    vol[active] = np.nan
+    return vol.reshape(shape), iterations.reshape(shape), noSolution.reshape(shape)
+
+#an option that can be exercised any day up to expiry, with the same price/greeks/
+#sweep interface as option. method is one of METHODS and steps the lattice depth,
+#together the accuracy/speed trade-off: bs2002 for interactive sweeps, lr with a few
+#hundred steps where cents matter
+class AmericanOption(option):
+    def __init__(self, otype, S0, K, q=0, marketPrice=None, T=None, expDay=None, vol=None, r=0.025, ls='Long',
+                 method='bs2002', steps=201):
+        if method not in METHODS:
+            raise ValueError('method must be one of ' + ', '.join(METHODS))
+        self.method = method
+        self.steps = steps
+        option.__init__(self, otype, S0, K, q=q, marketPrice=marketPrice, T=T, expDay=expDay, vol=vol, r=r, ls=ls)
+
+    def IV(self):
+        vol, iterations, noSolution = impliedVol(self.marketPrice, self.otype, self.S0, self.K, self.r, self.T, self.q,
+                                                 self.method, self.steps)
+        if noSolution:
+            print('No implied volatility matches market price ' + str(self.marketPrice))
+        return float(vol)
+
+    def greeks(self, names=OUTPUTS, S0=None, K=None, vol=None, r=None, T=None, q=None, surface=None):
+        S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
+        if surface is not None: vol = surface.vol(K, T)
+        return greeks(names, self.otype, S0, K, vol, r, T, q, self.method, self.steps)
+
+    def key(self):
+        return option.key(self) + (self.method, int(self.steps))
+
+    def engine(self):
+        return ('American', self.method, int(self.steps))
+
+    def kernel(self):
+        return functools.partial(greeks, method=self.method, steps=self.steps)
+
+#the per-output methods of option, each answered by the american kernel
+def _output(name):
+    def method(self, S0=None, K=None, vol=None, r=None, T=None, q=None):
+        return self.greeks((name,), S0, K, vol, r, T, q)[name]
+    method.__name__ = name
+    return method
+
+for _name in OUTPUTS:
+    setattr(AmericanOption, _name, _output(_name))
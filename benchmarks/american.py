@@ -0,0 +1,64 @@
+#american engine accuracy and speed against the european kernel, run from the repo root
+#with python -m benchmarks.american [grid points]
+#accuracy is measured on a spread of puts and dividend-paying calls against a
+#2001-step leisen-reimer lattice, speed as microseconds per contract on an S0 x vol
+#sweep grid, price only and all 17 outputs
+import sys
+
+import numpy as np
+
+import american
+from benchmarks.common import best
+from pricing import greeks, OUTPUTS
+
+#(label, method, steps)
+ENGINES = [('bs2002', 'bs2002', None), ('lr 51', 'lr', 51), ('lr 201', 'lr', 201), ('lr 801', 'lr', 801),
+           ('crr 201', 'crr', 201), ('crr 801', 'crr', 801)]
+
+def contracts(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    isCall = rng.random(n) < 0.5
+    S0 = rng.uniform(70, 130, n)
+    vol = rng.uniform(0.1, 0.6, n)
+    r = rng.uniform(0.0, 0.08, n)
+    T = rng.uniform(0.05, 2.0, n)
+    #calls only exercise early with a dividend yield
+    q = np.where(isCall, rng.uniform(0.01, 0.08, n), rng.uniform(0.0, 0.03, n))
+    return isCall, S0, 100.0, vol, r, T, q
+
+def accuracy():
+    book = contracts()
+    ref = american.price(*book, method='lr', steps=2001)
+    european = greeks(('price',), book[0], *book[1:])['price']
+    print('early exercise premium over european: mean %.4f  max %.4f' % ((ref - european).mean(), (ref - european).max()))
+    #relative errors only where the price is at least a cent
+    priced = ref >= 0.01
+    print('%-10s %12s %12s %12s' % ('engine', 'max abs err', 'rms err', 'max rel err'))
+    for label, method, steps in ENGINES:
+        err = american.price(*book, method=method, steps=steps or 201) - ref
+        print('%-10s %12.2e %12.2e %12.2e' % (label, np.abs(err).max(), np.sqrt(np.mean(err**2)),
+                                               (np.abs(err)/ref)[priced].max()))
+
+def speed(points):
+    n = int(np.sqrt(points))
+    S0, vol = np.meshgrid(np.linspace(50, 150, n), np.linspace(0.05, 0.8, n))
+    args = ('Put', S0, 100.0, vol, 0.05, 0.5, 0.01)
+    print('\n%d contracts, microseconds per contract' % S0.size)
+    print('%-10s %12s %12s' % ('engine', 'price', 'all outputs'))
+    price = best(lambda: greeks(('price',), *args))
+    full = best(lambda: greeks(OUTPUTS, *args))
+    print('%-10s %12.3f %12.3f' % ('european', price/S0.size*1e6, full/S0.size*1e6))
+    for label, method, steps in ENGINES:
+        #the lattices take ~steps**2/2 node updates per contract and all outputs cost
+        #~27 prices for every method, so the slow ones are timed on the first rows
+        rows = S0.shape[0] if steps is None or steps < 201 else max(1, S0.shape[0]//(10 if steps <= 201 else 100))
+        sub = ('Put', S0[:rows], 100.0, vol[:rows], 0.05, 0.5, 0.01)
+        kernel = lambda names: american.greeks(names, *sub, method=method, steps=steps or 201)
+        repeat = 3 if method == 'bs2002' else 1
+        price = best(lambda: kernel(('price',)), repeat)/S0[:rows].size
+        full = best(lambda: kernel(OUTPUTS), repeat)/S0[:rows].size if steps is None or steps <= 201 else np.nan
+        print('%-10s %12.3f %12.3f' % (label, price*1e6, full*1e6))
+
+if __name__ == '__main__':
+    accuracy()
+    speed(int(float(sys.argv[1])) if len(sys.argv) > 1 else 10000)
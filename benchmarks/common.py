@@ -0,0 +1,57 @@
+#helpers shared by the benchmarks: timing, peak memory, error against a reference and
+#the random books the book-level benchmarks (and suite cases) are run on
+import time
+import tracemalloc
+
+import numpy as np
+
+from pricing import option, OptionBook
+
+#best of repeat timed runs of fn after warmup untimed ones, in seconds
+def best(fn, repeat=3, warmup=0):
+    for i in range(warmup):
+        fn()
+    times = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+#peak bytes allocated while fn runs, as tracemalloc sees them (numpy buffers included)
+def peak(fn):
+    tracemalloc.start()
+    fn()
+    size = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size
+
+#largest relative error of got against ref where |ref| is above tiny, absolute error
+#below it. scaled measures tiny and the absolute errors against the largest |ref|
+#rather than 1. got must be finite exactly where ref is, inf is returned otherwise
+def maxRelError(got, ref, tiny=1e-300, scaled=False):
+    got, ref = np.asarray(got, dtype=np.float64), np.asarray(ref, dtype=np.float64)
+    finite = np.isfinite(ref)
+    if not (np.isfinite(got) == finite).all(): return np.inf
+    got, ref = got[finite], ref[finite]
+    big = np.abs(ref) > tiny*(np.abs(ref).max(initial=0) if scaled else 1)
+    rel = np.abs(got[big] - ref[big])/np.abs(ref[big])
+    small = np.abs(got[~big] - ref[~big])/(np.abs(ref).max(initial=1) if scaled else 1)
+    return max(rel.max(initial=0), small.max(initial=0))
+
+#n option legs on spot 100 with listed-looking expiries (a week to a year), strikes
+#spread with the square root of time, a smile in log moneyness and 40% short
+def randomLegs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    T = rng.choice([7, 14, 30, 60, 91, 182, 365], n)/365
+    K = np.round(100*np.exp(rng.normal(0, 0.1, n)*np.sqrt(T*4)))
+    return [option(otype='Call' if c else 'Put', S0=100.0, K=float(k), vol=float(0.2 + 0.3*np.log(k/100)**2), T=float(t),
+                   q=0.01, ls='Short' if s else 'Long') for c, k, t, s in zip(rng.random(n) < 0.5, K, T, rng.random(n) < 0.4)]
+
+#OptionBook of n positions on spot 100 with uniform strikes, vols, expiries and
+#dividend yields, 30% short and 1-9 contracts each, built without any option objects
+def randomOptionBook(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return OptionBook(np.where(rng.random(n) < 0.5, 'Call', 'Put'), 100.0, rng.uniform(60, 140, n), rng.uniform(0.1, 0.6, n),
+                      rng.uniform(0.02, 2, n), r=0.03, q=rng.uniform(0, 0.03, n), ls=np.where(rng.random(n) < 0.3, 'Short', 'Long'),
+                      qty=rng.integers(1, 10, n))
@@ -0,0 +1,26 @@
+#fused greeks kernel against the per-method path, run from the repo root with
+#python -m benchmarks.greeks [points]
+import sys
+
+import numpy as np
+
+from benchmarks.common import best
+from pricing import option, OUTPUTS
+
+def run(points=1000000):
+    n = int(np.sqrt(points))
+    opt = option(otype='Call', S0=100, K=100, vol=0.2, T=0.5, q=0.01)
+    S0, vol = np.meshgrid(np.linspace(50, 150, n), np.linspace(0.05, 0.8, n))
+    data = (S0, opt.K, vol, opt.r, opt.T, opt.q)
+
+    perMethod = best(lambda: [getattr(opt, name)(*data) for name in OUTPUTS])
+    fused = best(lambda: opt.greeks(OUTPUTS, *data))
+    fusedPrice = best(lambda: opt.greeks(('price',), *data))
+    methodPrice = best(lambda: opt.price(*data))
+
+    print('grid points: %d' % S0.size)
+    print('all 17 outputs  per-method %8.3fs  fused %8.3fs  speedup %5.2fx' % (perMethod, fused, perMethod/fused))
+    print('price only      per-method %8.3fs  fused %8.3fs  speedup %5.2fx' % (methodPrice, fusedPrice, methodPrice/fusedPrice))
+
+if __name__ == '__main__':
+    run(int(float(sys.argv[1])) if len(sys.argv) > 1 else 1000000)
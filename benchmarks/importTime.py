@@ -0,0 +1,42 @@
+#import-time budget check using python -X importtime, run from the repo root with
+#python -m benchmarks.importTime. exits non-zero when a module goes over its budget
+#or pulls in a heavy dependency it should only load lazily
+import os
+import re
+import subprocess
+import sys
+
+#module: (budget in ms, modules that must not be imported)
+BUDGETS = {
+    'pricing': (250, ('pandas', 'scipy', 'pandas_market_calendars', 'matplotlib')),
+    'UI': (500, ('pandas', 'scipy', 'pandas_market_calendars', 'matplotlib')),
+}
+
+def importTime(module, repeat=5):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times = []
+    for i in range(repeat):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                              cwd=root, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr)
+        loaded = {}
+        for line in proc.stderr.splitlines():
+            m = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)', line)
+            if m: loaded[m.group(4)] = int(m.group(2))
+        times.append(loaded[module]/1000)
+    return sorted(times)[len(times)//2], set(loaded)
+
+def run():
+    failed = False
+    for module, (budget, forbidden) in BUDGETS.items():
+        ms, loaded = importTime(module)
+        heavy = sorted(m for m in loaded if m.split('.')[0] in forbidden)
+        ok = ms <= budget and not heavy
+        failed |= not ok
+        print('%-8s %7.1f ms (budget %d ms) %s' % (module, ms, budget, 'ok' if ok else 'FAIL'))
+        if heavy: print('         eagerly imports ' + ', '.join(sorted(set(m.split('.')[0] for m in heavy))))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(run())
@@ -0,0 +1,90 @@
+#the numba greeks backend against the numpy one, run from the repo root with
+#python -m benchmarks.jitKernel [grid points]
+#parity is checked on random contracts (calls, puts and a mixed boolean array) for
+#every output in float64 and float32, speed and peak memory on an S0 x vol grid for
+#price only, a few greeks and all 17 outputs, and the kernel's speedup by number of
+#outputs, which pricing.JIT_MIN_OUTPUTS is set from. the kernel is called directly,
+#the 'auto' column is pricing.greeks with the numba backend, which hands the kernel
+#only the cases it wins. the first call's compile (or cache load) time is reported
+#apart. exits non-zero on a parity failure, and quietly when numba is not installed
+import sys
+import time
+
+import numpy as np
+
+import pricing
+from benchmarks.common import best, peak, maxRelError
+from pricing import OUTPUTS
+
+#pricing.greeks on the kernel whatever the outputs and precision
+def jit(names, otype, *args):
+    import jitKernel
+    return jitKernel.greeks(names, otype.title() == 'Call' if isinstance(otype, str) else otype, *args)
+
+#relative tolerance where the reference is above TINY of the largest value, absolute
+#below it. the normal cdf differs in the last bits (erfc against ndtr), which prices
+#deep in the money and omega amplify through cancellation
+RTOL = 1e-9
+F32_RTOL = 1e-5
+TINY = 1e-9
+
+#float32 is held to the float64 numpy result, numba computes float32 points in float64
+def parity(n=20000):
+    rng = np.random.default_rng(0)
+    S0, K, vol, T = rng.uniform(20, 200, n), rng.uniform(20, 200, n), rng.uniform(0.02, 2, n), rng.uniform(0.002, 3, n)
+    mixed = rng.random(n) < 0.5
+    checks = {}
+    for label, otype in (('call', 'Call'), ('put', 'Put'), ('mixed', mixed)):
+        for dtype, tol in ((np.float64, RTOL), (np.float32, F32_RTOL)):
+            args = [x.astype(dtype) for x in (S0, K, vol)] + [0.03, T.astype(dtype), 0.01]
+            ref = pricing.greeks(OUTPUTS, otype, *[x.astype(np.float64) if isinstance(x, np.ndarray) else x for x in args])
+            got = jit(OUTPUTS, otype, *args)
+            key = '%s %s' % (label, np.dtype(dtype).name)
+            for name in OUTPUTS:
+                assert got[name].dtype == dtype, (name, got[name].dtype)
+                checks[key] = (max(checks.get(key, (0, tol))[0], maxRelError(got[name], ref[name], TINY, scaled=True)), tol)
+    failed = False
+    for key, (err, tol) in checks.items():
+        failed |= not err <= tol
+        print('%-16s max error %.3e (tol %.0e) %s' % (key, err, tol, 'ok' if err <= tol else 'FAIL'))
+    return failed
+
+def speed(points):
+    n = int(np.sqrt(points))
+    S0, vol = np.linspace(50, 150, n).reshape(-1, 1), np.linspace(0.05, 0.8, n)
+    print('\n%d grid points, milliseconds' % (n*n))
+    print('%-26s %9s %9s %9s %9s %10s %10s' % ('outputs', 'numpy', 'numba', 'speedup', 'auto', 'numpy MB', 'numba MB'))
+    for label, names in (('price', ('price',)), ('price delta gamma', ('price', 'delta', 'gamma')),
+                         ('charm veta ultima', ('charm', 'veta', 'ultima')), ('all 17', OUTPUTS)):
+        for dtype in (np.float64, np.float32):
+            args = (S0.astype(dtype), 100.0, vol.astype(dtype), 0.05, 0.5, 0.01)
+            pricing.setKernelBackend('numpy')
+            fns = [lambda: pricing.greeks(names, 'Put', *args), lambda: jit(names, 'Put', *args)]
+            times = [best(fn, 5) for fn in fns]
+            sizes = [peak(fn)/2**20 for fn in fns]
+            pricing.setKernelBackend('numba')
+            auto = best(fns[0], 5)
+            print('%-26s %9.2f %9.2f %8.2fx %9.2f %10.1f %10.1f' % (label + ' ' + np.dtype(dtype).name, times[0]*1e3,
+                                                                   times[1]*1e3, times[0]/times[1], auto*1e3, *sizes))
+    pricing.setKernelBackend('numpy')
+    #first k outputs against each other, the crossover JIT_MIN_OUTPUTS stands for
+    print('\nnumba speedup by number of outputs (JIT_MIN_OUTPUTS = %d)' % pricing.JIT_MIN_OUTPUTS)
+    for dtype in (np.float64, np.float32):
+        args = (S0.astype(dtype), 100.0, vol.astype(dtype), 0.05, 0.5, 0.01)
+        row = []
+        for k in (1, 2, 4, 6, 8, 10, 12, 17):
+            names = OUTPUTS[:k]
+            row.append('%d: %.2fx' % (k, best(lambda: pricing.greeks(names, 'Put', *args), 3)/best(lambda: jit(names, 'Put', *args), 3)))
+        print('%-8s %s' % (np.dtype(dtype).name, '  '.join(row)))
+
+if __name__ == '__main__':
+    t0 = time.perf_counter()
+    if pricing.setKernelBackend('numba') != 'numba':
+        print('numba is not installed, only the numpy backend is available')
+        sys.exit(0)
+    pricing.greeks(OUTPUTS, 'Put', np.ones((2, 2)), 100.0, 0.2, 0.05, 0.5, 0.01)
+    print('numba import and first call (compile or cache load) %.2fs\n' % (time.perf_counter() - t0))
+    with np.errstate(all='ignore'):
+        failed = parity()
+        speed(int(float(sys.argv[1])) if len(sys.argv) > 1 else 1000000)
+    sys.exit(1 if failed else 0)
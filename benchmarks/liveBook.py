@@ -0,0 +1,64 @@
+#full-book revaluations per second on spot ticks, run from the repo root with
+#python -m benchmarks.liveBook [--target revals/s]
+#random books of calls and puts are re-priced at a new spot per tick by the live book
+#(cached spot-independent terms) and by OptionBook.total (the fused kernel from
+#scratch), for price alone and for price, delta, gamma and vega. a batch of 100 spots
+#priced in one call, and the cost of an update that decays every leg's T, are shown
+#for comparison. --target fails the run when the 1000-leg price revaluation rate is
+#below it
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import randomOptionBook
+from liveBook import LiveBook
+
+RISK = ('price', 'delta', 'gamma', 'vega')
+
+#calls per second of fn(spot) over a stream of spots, at least seconds of work
+def rate(fn, seconds=0.2):
+    spots = 100.0 + np.random.default_rng(1).normal(0, 0.5, 1000)
+    fn(spots[0])
+    calls, t0 = 0, time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        for s in spots[:50]:
+            fn(float(s))
+        calls += 50
+    return calls/(time.perf_counter() - t0)
+
+def reset(book, S0):
+    book.S0 = np.full(len(book), S0)
+    return book
+
+def run(target=None):
+    print('%-8s %14s %14s %9s %14s %14s %9s %14s %12s' % ('legs', 'kernel price', 'live price', 'speedup', 'kernel risk',
+          'live risk', 'speedup', 'live batch', 'update us'))
+    rates = {}
+    for n in (10, 100, 1000, 10000, 100000):
+        book = randomOptionBook(n)
+        live = LiveBook(book)
+        kernelPrice = rate(lambda s: reset(book, s).total(('price',)))
+        livePrice = rate(lambda s: live.total(s))
+        kernelRisk = rate(lambda s: reset(book, s).total(RISK))
+        liveRisk = rate(lambda s: live.total(s, RISK))
+        batch = np.linspace(95, 105, 100).reshape(-1, 1)
+        batchRate = 100*rate(lambda s: live.total(batch), 0.1)
+        T = live.book.T.copy()
+        t0 = time.perf_counter()
+        for i in range(20):
+            live.update(T=T)
+        update = (time.perf_counter() - t0)/20
+        rates[n] = livePrice
+        print('%-8d %14.0f %14.0f %8.1fx %14.0f %14.0f %8.1fx %14.0f %12.1f' % (n, kernelPrice, livePrice, livePrice/kernelPrice,
+              kernelRisk, liveRisk, liveRisk/kernelRisk, batchRate, update*1e6))
+    print('full-book revaluations per second, live batch prices 100 spots per call')
+    if target is not None:
+        ok = rates[1000] >= target
+        print('1000 legs: %.0f revals/s against a target of %.0f %s' % (rates[1000], target, 'ok' if ok else 'BELOW TARGET'))
+        return 0 if ok else 1
+    return 0
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    sys.exit(run(float(args[args.index('--target') + 1]) if '--target' in args else None))
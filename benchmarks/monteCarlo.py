@@ -0,0 +1,59 @@
+#monte carlo engine accuracy, variance reduction and throughput, run from the repo root
+#with python -m benchmarks.monteCarlo [paths]
+#the european put is checked against its closed form (z is the error in standard
+#errors, over several seeds), the path-dependent payoffs report the variance reduction of antithetic and
+#control variates against plain sampling at equal paths, and the pool is timed on 1
+#worker up to every core, which must all give the same estimate
+import os
+import sys
+
+import numpy as np
+
+from monteCarlo import simulate, PathOption, Barrier, Lookback
+from pricing import greeks
+
+MODES = [('plain', False, False), ('antithetic', True, False), ('control', False, True), ('both', True, True)]
+
+#each mode over 8 seeds: z should average about 0 with an rms about 1
+def accuracy(paths, seeds=8):
+    exact = greeks(('price',), 'Put', 100.0, 105.0, 0.25, 0.03, 0.75, 0.01)['price']
+    print('european put, closed form %.5f, %d seeds of %d paths' % (exact, seeds, paths))
+    print('%-12s %10s %10s %8s %8s %14s' % ('mode', 'price', 'stderr', 'mean z', 'rms z', 'paths/s'))
+    for label, antithetic, control in MODES:
+        runs = [simulate('european', 'Put', 100.0, 105.0, 0.25, 0.03, 0.75, 0.01, paths=paths, antithetic=antithetic,
+                         control=control, seed=seed, workers=1) for seed in range(seeds)]
+        z = np.array([(res['price'] - exact)/res['stderr'] if res['stderr'] > 0 else 0.0 for res in runs])
+        print('%-12s %10.5f %10.5f %8.2f %8.2f %14.0f' % (label, runs[0]['price'], runs[0]['stderr'], z.mean(),
+              np.sqrt(np.mean(z**2)), np.mean([res['pathsPerSecond'] for res in runs])))
+
+def pathDependent(paths):
+    contracts = [('asian call', PathOption('asian', 'Call', 100.0, 100.0, 0.3, 1.0, 0.02)),
+                 ('down-and-out call 90', PathOption(Barrier(90.0, 'down-and-out'), 'Call', 100.0, 100.0, 0.3, 1.0, 0.02)),
+                 ('up-and-in call 120', PathOption(Barrier(120.0, 'up-and-in'), 'Call', 100.0, 100.0, 0.3, 1.0, 0.02)),
+                 ('floating lookback put', PathOption(Lookback(), 'Put', 100.0, None, 0.3, 1.0, 0.02)),
+                 ('fixed lookback call', PathOption(Lookback('fixed'), 'Call', 100.0, 100.0, 0.3, 1.0, 0.02))]
+    print('\n%d paths, 252 monitoring dates, variance reduction against plain sampling' % paths)
+    print('%-22s %10s %10s %11s %11s %11s %12s' % ('payoff', 'price', 'stderr', 'antithetic', 'control', 'both', 'paths/s'))
+    for label, opt in contracts:
+        res = dict([(mode, opt.simulate(paths=paths, antithetic=a, control=c, workers=1)) for mode, a, c in MODES])
+        ratio = lambda mode: (res['plain']['stderr']/res[mode]['stderr'])**2
+        print('%-22s %10.4f %10.4f %10.1fx %10.1fx %10.1fx %12.0f' % (label, res['both']['price'], res['both']['stderr'],
+              ratio('antithetic'), ratio('control'), ratio('both'), res['both']['pathsPerSecond']))
+
+def scaling(paths):
+    cores = os.cpu_count() or 1
+    counts = sorted(set([1, 2, 4, cores]))
+    print('\nasian call, %d paths over %d cores' % (paths, cores))
+    print('%-8s %14s %10s %s' % ('workers', 'paths/s', 'speedup', 'price'))
+    base = None
+    for workers in counts:
+        res = simulate('asian', 'Call', 100.0, 100.0, 0.3, 0.02, 1.0, paths=paths, workers=workers)
+        base = base or res
+        print('%-8d %14.0f %9.2fx %.10f%s' % (workers, res['pathsPerSecond'], res['pathsPerSecond']/base['pathsPerSecond'],
+              res['price'], '' if res['price'] == base['price'] else '  MISMATCH'))
+
+if __name__ == '__main__':
+    paths = int(float(sys.argv[1])) if len(sys.argv) > 1 else 200000
+    accuracy(paths*2)
+    pathDependent(paths)
+    scaling(paths*4)
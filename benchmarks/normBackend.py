@@ -0,0 +1,59 @@
+#accuracy and speed of the normal cdf/pdf backend against scipy.stats, run from the
+#repo root with python -m benchmarks.normBackend. exits non-zero if any path drifts
+#from scipy.stats by more than the tolerances below over the d1/d2 range
+import sys
+
+import numpy as np
+from scipy import stats
+
+import pricing
+from benchmarks.common import best, maxRelError
+from pricing import option, OUTPUTS, ncdf, npdf
+
+#relative tolerance where the reference is above 1e-300, absolute below it. greeks get
+#a looser bound since deep in-the-money prices (and omega) subtract nearly equal terms
+RTOL = 1e-12
+GREEK_RTOL = 1e-9
+
+def checkGreeks(checks, n=2000):
+    rng = np.random.default_rng(0)
+    S0, K, vol, T = rng.uniform(20, 200, n), rng.uniform(20, 200, n), rng.uniform(0.02, 2, n), rng.uniform(0.002, 3, n)
+    for otype in ('Call', 'Put'):
+        opt = option(otype=otype, S0=100, K=100, vol=0.2, T=0.5)
+        pricing.setNormBackend('stats')
+        ref = opt.greeks(OUTPUTS, S0, K, vol, 0.03, T, 0.01)
+        pricing.setNormBackend('special')
+        arr = opt.greeks(OUTPUTS, S0, K, vol, 0.03, T, 0.01)
+        scal = [opt.greeks(OUTPUTS, S0[i], K[i], vol[i], 0.03, T[i], 0.01) for i in range(0, n, 10)]
+        checks[otype + ' greeks array'] = max(maxRelError(arr[k], ref[k]) for k in OUTPUTS)
+        checks[otype + ' greeks scalar'] = max(maxRelError([s[k] for s in scal], ref[k][::10]) for k in OUTPUTS)
+
+def run():
+    x = np.linspace(-38, 38, 200001)
+    checks = {
+        'cdf array': maxRelError(ncdf(x), stats.norm.cdf(x)),
+        'pdf array': maxRelError(npdf(x), stats.norm.pdf(x)),
+        'cdf scalar': maxRelError([ncdf(float(v)) for v in x[::20]], stats.norm.cdf(x[::20])),
+        'pdf scalar': maxRelError([npdf(float(v)) for v in x[::20]], stats.norm.pdf(x[::20])),
+    }
+    with np.errstate(all='ignore'):
+        checkGreeks(checks)
+
+    failed = False
+    for name, err in checks.items():
+        tol = GREEK_RTOL if 'greeks' in name else RTOL
+        failed |= not err <= tol
+        print('%-20s max error %.3e (tol %.0e) %s' % (name, err, tol, 'ok' if err <= tol else 'FAIL'))
+
+    opt = option(otype='Call', S0=100, K=105, vol=0.25, T=0.4)
+    grid = np.linspace(50, 150, 1000000)
+    for backend in ('stats', 'special'):
+        pricing.setNormBackend(backend)
+        scalar = best(lambda: opt.greeks(OUTPUTS, 100.0, 105.0, 0.25, 0.025, 0.4, 0.0), 5)
+        array = best(lambda: opt.greeks(('price', 'delta', 'gamma'), grid, 105.0, 0.25, 0.025, 0.4, 0.0), 5)
+        print('%-8s 17 scalar greeks %8.1f us   price/delta/gamma on 1e6 points %6.1f ms' % (backend, scalar*1e6, array*1e3))
+    pricing.setNormBackend('special')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(run())
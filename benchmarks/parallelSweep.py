@@ -0,0 +1,51 @@
+#process-pool sweep sharding against the serial sweep, run from the repo root with
+#python -m benchmarks.parallelSweep [grid points] [max workers]
+#an S0 x vol sweep of all 17 outputs is timed on 1 worker (the serial sweep) and on
+#pools of 2, 4, ... up to every core (or max workers), each result must be identical
+#to the serial one.
+#speedup is against the serial sweep, efficiency is speedup per worker. a strategy with
+#an american leg, whose kernel is far slower per point, is timed the same way
+import os
+import sys
+import time
+
+import numpy as np
+
+from american import AmericanOption
+from pricing import option, Strategy, OUTPUTS
+
+def counts(most):
+    n, out = 1, []
+    while n < most:
+        out.append(n)
+        n *= 2
+    return out + [most]
+
+def scaling(label, target, toSweep, names, most):
+    print('\n%s, %d points, %d outputs, %d cores' % (label, np.prod([s[2] for s in toSweep.values()]), len(names),
+                                                     os.cpu_count() or 1))
+    print('%-8s %10s %12s %9s %11s %s' % ('workers', 'seconds', 'Mpoints/s', 'speedup', 'efficiency', ''))
+    serial = None
+    for workers in counts(most):
+        t0 = time.perf_counter()
+        res = target.sweepGrid(toSweep, names, workers=workers)
+        seconds = time.perf_counter() - t0
+        if serial is None: serial = (seconds, res)
+        same = all(np.array_equal(res[k], serial[1][k], equal_nan=True) for k in names)
+        speedup = serial[0]/seconds
+        print('%-8d %10.3f %12.2f %8.2fx %10.0f%% %s' % (workers, seconds, np.prod(res.shape)/seconds/1e6, speedup,
+                                                        100*speedup/workers, '' if same else 'MISMATCH'))
+        del res
+
+if __name__ == '__main__':
+    points = int(float(sys.argv[1])) if len(sys.argv) > 1 else 2000000
+    most = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    n = int(np.sqrt(points))
+    with np.errstate(all='ignore'):
+        scaling('european put', option(otype='Put', S0=100.0, K=100.0, vol=0.2, T=0.5, q=0.01),
+                {'S0': (50, 150, n), 'vol': (0.05, 0.8, n)}, OUTPUTS, most)
+        legs = [option(otype='Call', S0=100.0, K=105.0, vol=0.2, T=0.5),
+                AmericanOption(otype='Put', S0=100.0, K=95.0, vol=0.25, T=0.5, q=0.01, ls='Short')]
+        m = n//4
+        scaling('call plus short american put', Strategy(legs), {'S0': (50, 150, m), 'vol': (0.05, 0.8, m)},
+                ('price', 'delta', 'gamma'), most)
@@ -0,0 +1,107 @@
+#float32 sweeps against float64, run from the repo root with
+#python -m benchmarks.precision [grid points]
+#every one of the 17 outputs is swept in both precisions over several grids, calls and
+#puts, and must stay within the bounds below. scale error is the worst absolute error
+#over the largest magnitude on the grid, relative error is element-wise where the
+#value is at least FLOOR of that magnitude (smaller values are what is lost to rounding
+#of the large ones), both where the float64 value is finite. outputs in
+#sweeps.FLOAT64_ONLY are swept in float64 arithmetic and their raw float32 error is
+#shown alongside. a strategy given integer inputs must price like float64 ones and
+#float32 ones must stay float32. exits non-zero when a bound or a check fails
+import sys
+
+import numpy as np
+
+import sweeps
+from benchmarks.common import best, peak
+from pricing import option, Strategy, OUTPUTS
+
+SCALE_BOUND = 1e-4
+RELATIVE_BOUND = 1e-2
+FLOOR = 1e-3
+
+#(label, toSweep, fixed inputs)
+GRIDS = [('S0 x vol, T 1d', {'S0': (50, 150, 200), 'vol': (0.05, 0.8, 200)}, {'T': 1/252}),
+         ('S0 x vol, T 0.02', {'S0': (50, 150, 200), 'vol': (0.05, 0.8, 200)}, {'T': 0.02}),
+         ('S0 x vol, T 0.5', {'S0': (50, 150, 200), 'vol': (0.05, 0.8, 200)}, {'T': 0.5}),
+         ('S0 x vol, T 2', {'S0': (50, 150, 200), 'vol': (0.05, 0.8, 200)}, {'T': 2.0}),
+         ('S0 x T', {'S0': (50, 150, 200), 'T': (1/252, 2, 200)}, {'vol': 0.3}),
+         ('K x vol', {'K': (50, 150, 200), 'vol': (0.05, 0.8, 200)}, {'T': 0.25})]
+
+#only where the float64 value is finite, omega is infinite where the price underflows
+def errors(ref, value):
+    finite = np.isfinite(ref)
+    ref, value = ref[finite], value[finite].astype(np.float64)
+    scale = np.abs(ref).max() if ref.size else 0.0
+    if scale == 0: return 0.0, 0.0
+    with np.errstate(all='ignore'):
+        err = np.abs(value - ref)
+        big = np.abs(ref) >= FLOOR*scale
+        rel = (err/np.abs(ref))[big]
+    if not np.isfinite(err).all(): return np.inf, np.inf
+    return err.max()/scale, rel.max() if rel.size else 0.0
+
+#worst scale and relative error per output over every grid and option type, with the
+#raw float32 arithmetic error for FLOAT64_ONLY outputs
+def accuracy():
+    worst = dict([(name, [0.0, 0.0, 0.0, 0.0]) for name in OUTPUTS])
+    for label, toSweep, fixed in GRIDS:
+        for otype in ('Call', 'Put'):
+            inputs = dict(otype=otype, S0=100.0, K=100.0, vol=0.2, T=0.5, r=0.03, q=0.01)
+            inputs.update(fixed)
+            opt = option(**inputs)
+            with np.errstate(all='ignore'):
+                ref = opt.sweepGrid(toSweep, OUTPUTS)
+                single = opt.sweepGrid(toSweep, OUTPUTS, dtype=np.float32)
+            axes = sweeps.sweepAxes(toSweep)
+            for name in OUTPUTS:
+                assert single[name].dtype == np.float32
+                w = worst[name]
+                w[:2] = np.maximum(w[:2], errors(ref[name], single[name]))
+                if name in sweeps.FLOAT64_ONLY:
+                    #the same output with the kernel itself run in float32
+                    grid = sweeps.openGrid(axes, opt.inputs(), np.float32)
+                    with np.errstate(all='ignore'):
+                        value = opt.greeks((name,), *[grid[k] for k in sweeps.INPUTS])[name]
+                    w[2:] = np.maximum(w[2:], errors(ref[name], np.broadcast_to(value, ref[name].shape)))
+    print('float32 against float64 over %d grids, calls and puts' % len(GRIDS))
+    print('%-8s %12s %12s  %s' % ('output', 'scale err', 'rel err', ''))
+    failed = False
+    for name in OUTPUTS:
+        scaled, rel, rawScaled, rawRel = worst[name]
+        ok = scaled <= SCALE_BOUND and rel <= RELATIVE_BOUND
+        failed |= not ok
+        note = 'float64 only, float32 arithmetic: %.2e %.2e' % (rawScaled, rawRel) if name in sweeps.FLOAT64_ONLY else ''
+        print('%-8s %12.2e %12.2e  %s %s' % (name, scaled, rel, 'ok' if ok else 'OUT OF BOUNDS', note))
+    return failed
+
+#the legs' own inputs follow the given ones only when those are all float32, an integer
+#spot (scalar or array) must not truncate them
+def inputTypes():
+    strategy = Strategy([option('Call', 100.0, 100.0, vol=0.2, T=0.5, q=0.01),
+                         option('Put', 100.0, 95.0, vol=0.25, T=0.5, ls='Short')])
+    price = lambda S0: strategy.greeks(('price',), S0=S0)['price']
+    checks = [('integer spot', np.array_equal(price(100), price(100.0))),
+              ('integer spot array', np.array_equal(price(np.array([90, 100, 110])), price(np.array([90.0, 100.0, 110.0])))),
+              ('float32 spot array stays float32', price(np.array([90, 100, 110], dtype=np.float32)).dtype == np.float32),
+              ('float32 with a float64 input', strategy.greeks(('price',), S0=np.float32(100), T=0.5)['price'].dtype == np.float64)]
+    print('\nstrategy input precision')
+    for label, ok in checks:
+        print('%-34s %s' % (label, 'ok' if ok else 'FAILED'))
+    return not all(ok for label, ok in checks)
+
+def speed(points):
+    n = int(np.sqrt(points))
+    opt = option(otype='Put', S0=100.0, K=100.0, vol=0.2, T=0.5, q=0.01)
+    toSweep = {'S0': (50, 150, n), 'vol': (0.05, 0.8, n)}
+    print('\n%dx%d sweep, all 17 outputs' % (n, n))
+    print('%-8s %10s %14s' % ('dtype', 'seconds', 'peak MB'))
+    for dtype in (np.float64, np.float32):
+        run = lambda: opt.sweepGrid(toSweep, OUTPUTS, dtype=dtype)
+        print('%-8s %10.3f %14.1f' % (np.dtype(dtype).name, best(run), peak(run)/2**20))
+
+if __name__ == '__main__':
+    failed = accuracy()
+    failed |= inputTypes()
+    speed(int(float(sys.argv[1])) if len(sys.argv) > 1 else 1000000)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,35 @@
+#scenario engine timing and taylor error, run from the repo root with
+#python -m benchmarks.scenarios [legs]
+#a random book of calls and puts over several expiries is shocked over grids from
+#intraday moves to a stress test, in full revaluation and taylor modes. the error is
+#the taylor cube against full revaluation: max absolute, rms and max relative to the
+#largest full pnl, with the scenario where it is worst
+import sys
+
+import numpy as np
+
+import scenarios
+from benchmarks.common import randomLegs
+
+SHOCK_SETS = [
+    ('intraday', {'spot': (-0.01, 0.01, 21), 'vol': (-0.01, 0.01, 5), 'time': [0, 1/252]}),
+    ('daily', {'spot': (-0.03, 0.03, 25), 'vol': (-0.03, 0.03, 7), 'time': [0, 1/252, 3/252]}),
+    ('weekly', {'spot': (-0.08, 0.08, 33), 'vol': (-0.05, 0.05, 11), 'time': [0, 5/252], 'rate': [-0.0025, 0, 0.0025]}),
+    ('stress', {'spot': (-0.25, 0.25, 51), 'vol': (-0.1, 0.2, 13), 'time': [0, 5/252, 21/252], 'rate': [-0.01, 0, 0.01]}),
+]
+
+def run(legs):
+    book = scenarios.asStrategy(randomLegs(legs))
+    print('%d legs, book value %.2f' % (legs, scenarios.baseValue(book)))
+    print('%-10s %9s %10s %10s %9s %11s %11s %9s  %s' % ('shocks', 'scenarios', 'full ms', 'taylor ms', 'speedup', 'max abs err',
+          'rms err', 'max rel', 'worst at'))
+    for label, shocks in SHOCK_SETS:
+        res = scenarios.compare(book, shocks)
+        full, taylor = res['seconds']['full'], res['seconds']['taylor']
+        worst = ' '.join('%s %+.4g' % kv for kv in res['worst'].items())
+        print('%-10s %9d %10.2f %10.2f %8.0fx %11.4f %11.4f %8.2f%%  %s' % (label, res['error'].size, full*1e3, taylor*1e3,
+              full/taylor, res['maxAbs'], res['rms'], 100*res['maxRel'], worst))
+
+if __name__ == '__main__':
+    with np.errstate(all='ignore'):
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
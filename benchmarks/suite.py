@@ -0,0 +1,286 @@
+#benchmark suite with stored baselines, run from the repo root with
+#python -m benchmarks.suite [--save] [--only name,...] [--threshold x]
+#every case is timed as the best of several runs after a warmup and compared with
+#benchmarks/baseline.json, exiting non-zero when one is slower than its baseline by
+#more than its threshold (relative, e.g. 0.3 = 30%). a case over its threshold is timed
+#once more before it counts, so one noisy run does not fail the suite. each timing is
+#taken relative to a fixed calibration workload timed just before it, which cancels
+#most of the drift in machine speed between (and within) runs. --save records the
+#current timings as the new baseline; re-save when moving to a different machine
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import best
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+THRESHOLD = 0.3
+
+#fixed numpy and interpreter work, the yardstick the cases are measured against
+def calibration():
+    x = np.random.default_rng(0).standard_normal(200000)
+    def fn():
+        np.sort(x)
+        np.exp(x).sum()
+        total = 0.0
+        for v in range(100000):
+            total += v*0.5
+    return best(fn, 7, warmup=1)
+
+#each case does its setup and returns the callable that is timed
+
+#the 17 per-greek methods and the fused kernel on one set of python floats
+def scalarGreeks():
+    from pricing import option, OUTPUTS
+    opt = option(otype='Call', S0=100.0, K=105.0, vol=0.25, T=0.4, q=0.01)
+    def fn():
+        for i in range(200):
+            for name in OUTPUTS:
+                getattr(opt, name)()
+            opt.greeks(OUTPUTS, opt.S0, opt.K, opt.vol, opt.r, opt.T, opt.q)
+    return fn
+
+def sweep(n, dtype=np.float64):
+    def case():
+        from pricing import option, OUTPUTS
+        opt = option(otype='Put', S0=100.0, K=100.0, vol=0.2, T=0.5, q=0.01)
+        #small grids are looped to a few milliseconds of work so timer noise stays small
+        loops = max(1, 40000//(n*n))
+        return lambda: [opt.sweep({'S0' : (50, 150, n), 'vol' : (0.05, 0.8, n)}, OUTPUTS, dtype=dtype) for i in range(loops)]
+    return case
+
+#quotes over 10 expiries and 40 strikes, priced at a known smile then inverted. kept
+#away from quotes at intrinsic value, where vega vanishes and no vol is identifiable
+def syntheticQuotes():
+    from pricing import greeks
+    T = np.repeat(np.linspace(0.1, 1.0, 10), 40)
+    K = np.tile(np.linspace(70, 130, 40), 10)
+    vol = 0.2 + 0.3*np.log(K/100)**2
+    return T, K, vol, greeks(('price',), 'Put', 100.0, K, vol, 0.025, T, 0.01)['price']
+
+#option.IV one quote at a time, the way options are built from market prices
+def ivChain():
+    from pricing import option
+    T, K, vol, price = syntheticQuotes()
+    opts = [option(otype='Put', S0=100.0, K=k, vol=v, T=t, q=0.01) for t, k, v in zip(T, K, vol)]
+    for opt, p in zip(opts, price):
+        opt.marketPrice = p
+    return lambda: [opt.IV() for opt in opts]
+
+#the batch solver over the same chain
+def ivBatch():
+    from pricing import impliedVol
+    T, K, vol, price = syntheticQuotes()
+    return lambda: [impliedVol(price, 'Put', 100.0, K, 0.025, T, 0.01) for i in range(10)]
+
+#american puts on the same grid as sweep17, bs2002 price only
+def americanSweep():
+    from american import AmericanOption
+    opt = AmericanOption(otype='Put', S0=100.0, K=100.0, vol=0.2, T=0.5, q=0.01, r=0.05)
+    return lambda: opt.sweep({'S0' : (50, 150, 200), 'vol' : (0.05, 0.8, 200)}, ('price',))
+
+#the synthetic chain priced on a 201 step leisen-reimer lattice
+def americanLattice():
+    import american
+    T, K, vol, price = syntheticQuotes()
+    return lambda: american.price(False, 100.0, K, vol, 0.025, T, 0.01, method='lr', steps=201)
+
+#asian call over 252 monitoring dates with both variance reductions, in process
+def monteCarloAsian():
+    from monteCarlo import simulate
+    return lambda: simulate('asian', 'Call', 100.0, 100.0, 0.3, 0.02, 1.0, paths=50000, workers=1)
+
+#200 spot ticks on a 1000 leg book, price, delta, gamma and vega from the cached terms
+def liveBookTicks():
+    from benchmarks.common import randomOptionBook
+    from liveBook import LiveBook
+    live = LiveBook(randomOptionBook(1000))
+    spots = 100.0 + np.random.default_rng(1).normal(0, 0.5, 200)
+    return lambda: [live.total(float(s), ('price', 'delta', 'gamma', 'vega')) for s in spots]
+
+#stress cube of 51 spot x 13 vol x 3 time x 3 rate shocks on a 200 leg book
+def scenarioCube(mode):
+    def make():
+        import scenarios
+        from benchmarks.common import randomLegs
+        from benchmarks.scenarios import SHOCK_SETS
+        book = scenarios.asStrategy(randomLegs(200))
+        return lambda: scenarios.scenarios(book, dict(SHOCK_SETS)['stress'], mode)
+    return make
+
+#option construction from an expiry date string, calendar already loaded
+def optionExpDay():
+    from pricing import option
+    today = np.datetime64('today', 'D')
+    days = [str(today + np.timedelta64(d, 'D')) for d in range(7, 400, 7)]
+    option(otype='Call', S0=100.0, K=100.0, vol=0.2, expDay=days[0])
+    return lambda: [option(otype='Call', S0=100.0, K=100.0, vol=0.2, expDay=d) for d in days*20]
+
+#a synthetic SPY-like chain of puts over 12 weekly expiries, in the layout of
+#chainData.fetchChain, so the case runs the same offline on any machine
+def syntheticChain():
+    import pandas as pd
+    rng = np.random.default_rng(0)
+    today = np.datetime64('today', 'D')
+    frames = []
+    for d in range(7, 91, 7):
+        K = np.arange(225.0, 676.0, 5.0)
+        k = np.log(K/450)
+        frames.append(pd.DataFrame({'strike': K, 'bid': 1.0, 'ask': 1.1, 'volume': rng.integers(0, 60, K.size).astype(float),
+                                    'impliedVolatility': 0.18 - 0.15*k + 0.6*k**2 + rng.normal(0, 0.003, K.size),
+                                    'expiry': str(today + np.timedelta64(d, 'D')), 'type': 'Put', 'underlying': 450.0}))
+    return pd.concat(frames, ignore_index=True)
+
+def makeSurf():
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    import volSurfacePlot
+    chain = syntheticChain()
+    q = chain[(chain['type'] == 'Put') & (chain['volume'] >= 10)]
+    T = volSurfacePlot.toT(q['bid'], q['ask'], q['expiry'])
+    K, vol = q['strike'].to_numpy(dtype=np.float64), q['impliedVolatility'].to_numpy(dtype=np.float64)
+    return lambda: volSurfacePlot.make_surf(T, K, vol, len(set(T)))
+
+#one window shared by the UI cases, with options added through the handlers
+_ui = {}
+
+def ui():
+    if not _ui:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5.QtCore import QThreadPool
+        from PyQt5.QtWidgets import QApplication
+        import UI
+        app = QApplication.instance() or QApplication(sys.argv)
+        window = UI.BlackScholesUI()
+        window.show()
+        def wait():
+            while window.jobs.busy() or QThreadPool.globalInstance().activeThreadCount():
+                app.processEvents()
+                time.sleep(0.001)
+            app.processEvents()
+        _ui.update(app=app, window=window, wait=wait)
+        for K, otype, vol in ((100, 0, '0.2'), (110, 2, '0.25'), (95, 1, '0.3')):
+            window.optionsTypeBox.setCurrentIndex(otype)
+            window.kEdit.setText(str(K))
+            window.TEdit.setText(str(np.datetime64('today', 'D') + np.timedelta64(120, 'D')))
+            window.S0Edit.setText('100')
+            window.qEdit.setText('0')
+            window.rEdit.setText('0.02')
+            window.volEdit.setText(vol)
+            window.onOptionsAddClicked()
+            wait()
+        window.loadPlots()
+    return _ui['window'], _ui['wait']
+
+def uiAddOption():
+    window, wait = ui()
+    def fn():
+        for i in range(10):
+            window.onOptionsAddClicked()
+            wait()
+            window.optionsList.pop()
+    return fn
+
+def uiTableClick():
+    window, wait = ui()
+    window.optionsTable.selectRow(1)
+    def fn():
+        window.onOptionTableClicked(1, 0)
+        wait()
+    return fn
+
+#2-D sweep over all three legs, cleared from the cache so every run computes and draws
+def uiSweep(cached):
+    def case():
+        from PyQt5.QtWidgets import QTableWidgetSelectionRange
+        window, wait = ui()
+        window.optionsTable.setRangeSelected(QTableWidgetSelectionRange(1, 0, 3, 0), True)
+        window.selected = window.optionsTable.selectedItems()
+        window.inputSelect1.setCurrentIndex(1)
+        window.min1.setText('80')
+        window.max1.setText('120')
+        window.steps1.setText('60')
+        window.inputSelect2.setCurrentIndex(3)
+        window.min2.setText('0.1')
+        window.max2.setText('0.5')
+        window.steps2.setText('60')
+        for row in range(window.outputSelectList.count()):
+            window.outputSelectList.item(row).setSelected(row == 1)
+        def fn():
+            if not cached: window.cache.clear()
+            window.onPlotSweepButtonClicked()
+            wait()
+        return fn
+    return case
+
+#(name, case, repeats, threshold)
+CASES = [
+    ('scalarGreeks', scalarGreeks, 7, THRESHOLD),
+    #overhead bound, so noisier than the larger grids
+    ('sweep17 50x50', sweep(50), 9, 0.5),
+    ('sweep17 200x200', sweep(200), 7, THRESHOLD),
+    ('sweep17 1000x1000', sweep(1000), 3, THRESHOLD),
+    ('sweep17 1000x1000 f32', sweep(1000, np.float32), 3, THRESHOLD),
+    ('IV chain per option', ivChain, 5, THRESHOLD),
+    ('IV chain batch', ivBatch, 9, THRESHOLD),
+    ('american bs2002 200x200', americanSweep, 7, THRESHOLD),
+    ('american lr201 chain', americanLattice, 5, THRESHOLD),
+    ('monteCarlo asian 50k', monteCarloAsian, 5, THRESHOLD),
+    ('liveBook 1000 legs', liveBookTicks, 7, THRESHOLD),
+    ('scenarios stress full', scenarioCube('full'), 5, THRESHOLD),
+    ('scenarios stress taylor', scenarioCube('taylor'), 9, 0.5),
+    ('option expDay', optionExpDay, 7, THRESHOLD),
+    ('make_surf synthetic chain', makeSurf, 7, THRESHOLD),
+    ('UI add option', uiAddOption, 5, 0.5),
+    ('UI table click', uiTableClick, 7, 0.5),
+    ('UI sweep uncached', uiSweep(False), 7, 0.5),
+    ('UI sweep cached', uiSweep(True), 7, 0.5),
+]
+
+def environment():
+    import scipy, pandas
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'scipy': scipy.__version__,
+            'pandas': pandas.__version__, 'machine': platform.machine(), 'processor': platform.processor()}
+
+def run(args):
+    save = '--save' in args
+    only = args[args.index('--only') + 1].split(',') if '--only' in args else None
+    threshold = float(args[args.index('--threshold') + 1]) if '--threshold' in args else None
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            baseline = json.load(f)
+    results = dict(baseline.get('results', {}))
+    failed = False
+    with np.errstate(all='ignore'):
+        for name, case, repeat, allowed in CASES:
+            if only is not None and name not in only: continue
+            allowed = allowed if threshold is None else threshold
+            fn = case()
+            base = baseline.get('results', {}).get(name)
+            for attempt in range(2):
+                calib = calibration()
+                seconds = best(fn, repeat, warmup=1)
+                #slowdown against the baseline with the machine's current speed factored out
+                ratio = None if base is None else (seconds/calib)/(base['seconds']/base['calibration'])
+                if ratio is None or ratio <= 1 + allowed: break
+            results[name] = {'seconds': seconds, 'calibration': calib}
+            if ratio is None:
+                status = 'no baseline'
+            else:
+                ok = ratio <= 1 + allowed
+                failed |= not ok
+                status = '%5.2fx baseline (limit %.2fx) %s' % (ratio, 1 + allowed, 'ok' if ok else 'REGRESSION')
+            print('%-22s %10.2f ms   %s' % (name, seconds*1e3, status))
+    if save:
+        with open(BASELINE, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=1, sort_keys=True)
+        print('baseline saved to ' + BASELINE)
+        return 0
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(run(sys.argv[1:]))
@@ -0,0 +1,64 @@
+#sweep export peak memory and throughput, run from the repo root with
+#python -m benchmarks.sweepExport [points]
+#a two-leg strategy is swept over S0 x vol for price and delta and written in every
+#format by sweepExport.exportSweep, against sweeping into memory and writing with
+#scipy.io.savemat as demo/demo.py does. peak is the largest traced allocation (numpy
+#arrays included) during the export, which for the streaming formats stays around a
+#block whatever the size of the sweep. HDF5 and MAT are skipped when h5py is not installed
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from scipy import io
+
+import sweepExport
+from pricing import option, Strategy
+
+def measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+def size(path):
+    if not os.path.isdir(path): return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+def run(points):
+    n = int(np.sqrt(points))
+    strategy = Strategy([option('Call', 100.0, 100.0, vol=0.2, T=0.5), option('Put', 100.0, 95.0, vol=0.25, T=0.5, ls='Short')])
+    toSweep = {'S0': (50, 150, n), 'vol': (0.05, 0.8, n)}
+    toGrab = ('price', 'delta')
+    data = 8*n*n*len(toGrab)
+    print('%d points, %s of float64 outputs' % (n*n, '%.1f MB' % (data/1e6)))
+    print('%-10s %10s %10s %10s %11s' % ('format', 'seconds', 'MB/s', 'peak MB', 'file MB'))
+    tmp = tempfile.mkdtemp()
+    try:
+        def savemat():
+            out = strategy.sweep(toSweep, toGrab)
+            io.savemat(os.path.join(tmp, 'savemat.mat'), dict([(k, out[k]) for k in ('S0', 'vol') + toGrab]))
+        cases = [('savemat', savemat, 'savemat.mat')]
+        for ext in ('.mat', '.h5', '.npz', '.npy'):
+            path = os.path.join(tmp, 'sweep' + ext)
+            cases.append((ext[1:], lambda path=path: sweepExport.exportSweep(strategy, toSweep, toGrab, path), path))
+        for label, fn, path in cases:
+            try:
+                seconds, peak = measure(fn)
+            except ImportError as e:
+                print('%-10s skipped, %s' % (label, e))
+                continue
+            print('%-10s %10.2f %10.1f %10.1f %11.1f' % (label, seconds, data/1e6/seconds, peak/1e6,
+                  size(os.path.join(tmp, path))/1e6))
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == '__main__':
+    with np.errstate(all='ignore'):
+        run(int(float(sys.argv[1])) if len(sys.argv) > 1 else 4000000)
@@ -0,0 +1,39 @@
+#sweep spec handling across the entry points, run from the repo root with
+#python -m benchmarks.sweepSpecs
+#option.sweep, Strategy.sweep and SweepCache.sweep lay results out like np.meshgrid
+#(the first two axes swapped) but must read every spec as sweepGrid does: a
+#(min, max, steps) tuple is a range, an array or list is the values themselves, three
+#values included. exits non-zero when any entry point disagrees with sweepGrid
+import sys
+
+import numpy as np
+
+from pricing import option, Strategy
+from sweepCache import SweepCache
+
+SPECS = [('range', {'S0': (90, 110, 5)}),
+         ('array of 3', {'S0': np.array([90.0, 100.0, 110.0])}),
+         ('list of 3', {'S0': [90.0, 100.0, 110.0]}),
+         ('array of 3 x range', {'S0': np.array([90.0, 100.0, 110.0]), 'vol': (0.1, 0.3, 4)}),
+         ('range x array of 3', {'vol': (0.1, 0.3, 4), 'T': np.array([0.1, 0.5, 1.0])})]
+
+def run():
+    opt = option('Call', S0=100.0, K=100.0, vol=0.2, T=0.5)
+    strategy = Strategy([opt, option('Put', S0=100.0, K=95.0, vol=0.25, T=0.5, ls='Short')])
+    cache = SweepCache()
+    entries = [('option.sweep', opt, opt.sweep), ('Strategy.sweep', strategy, strategy.sweep),
+               ('SweepCache.sweep', opt, lambda toSweep, toGrab: cache.sweep(opt, toSweep, toGrab))]
+    print('%-20s %-18s %-12s %s' % ('spec', 'entry point', 'shape', ''))
+    failed = False
+    for label, toSweep in SPECS:
+        for name, target, sweep in entries:
+            grid = target.sweepGrid(toSweep, ('price',))['price']
+            expected = grid if grid.ndim < 2 else np.swapaxes(grid, 0, 1)
+            got = sweep(toSweep, ('price',))['price']
+            ok = got.shape == expected.shape and np.array_equal(got, expected)
+            failed |= not ok
+            print('%-20s %-18s %-12s %s' % (label, name, 'x'.join(map(str, got.shape)), 'ok' if ok else 'MISMATCH'))
+    return failed
+
+if __name__ == '__main__':
+    sys.exit(1 if run() else 0)
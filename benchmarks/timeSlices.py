@@ -0,0 +1,48 @@
+#time slice engine against the per-leg, per-slice sweeps it replaces in the UI, run
+#from the repo root with python -m benchmarks.timeSlices [legs]
+#the old path copies every leg for every slice and sweeps S0 with T set on the copy
+#(1e-6 standing in for expiration), then sums the legs. both are timed for a few slice
+#counts, and the expiration slice is checked against the intrinsic payoff. the
+#differences between the two come from the time value left at T=1e-6 near the strikes
+import copy
+import sys
+
+import numpy as np
+
+from benchmarks.common import best, randomLegs
+from pricing import Strategy
+from timeSlices import timeSlices, intrinsic
+
+SPOTS = (80.0, 120.0, 50)
+
+def perLeg(legs, remaining):
+    out = np.zeros((len(remaining), SPOTS[2]))
+    for leg in legs:
+        for i, f in enumerate(remaining):
+            legT = copy.copy(leg)
+            legT.T = max(leg.T*f, 1e-6)
+            price = legT.sweep({'S0': SPOTS}, 'price')['price']
+            out[i] += -price if leg.ls == 'Short' else price
+    return out
+
+def run(n):
+    legs = randomLegs(n)
+    strategy = Strategy(legs)
+    print('%d legs, %d spots, ms per call' % (n, SPOTS[2]))
+    print('%-8s %12s %12s %9s %14s' % ('slices', 'per leg', 'timeSlices', 'speedup', 'max abs diff'))
+    for slices in (3, 21, 101):
+        remaining = np.linspace(1, 0, slices)
+        new = timeSlices(strategy, SPOTS, slices=slices)['price']
+        diff = np.abs(new - perLeg(legs, remaining)).max()
+        old = best(lambda: perLeg(legs, remaining), 1 if slices*n > 2000 else 3)
+        fast = best(lambda: timeSlices(strategy, SPOTS, slices=slices), 5)
+        print('%-8d %12.2f %12.2f %8.0fx %14.2e' % (slices, old*1e3, fast*1e3, old/fast, diff))
+    spots = np.linspace(*SPOTS[:2], SPOTS[2])
+    payoff = sum(w*intrinsic(leg.otype == 'Call', spots, leg.K) for leg, w in zip(legs, strategy.weights))
+    expiry = timeSlices(strategy, SPOTS, remaining=[0])['price'][0]
+    print('expiration slice against the payoff: max abs diff %.2e' % np.abs(expiry - payoff).max())
+
+if __name__ == '__main__':
+    with np.errstate(all='ignore'):
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
+        run(50)
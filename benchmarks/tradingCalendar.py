@@ -0,0 +1,52 @@
+#trading calendar year fractions, run from the repo root with
+#python -m benchmarks.tradingCalendar
+#volSurfacePlot.toT, which turns a chain's expiries into T for the vol surface, goes
+#through tradingCalendar.nyse like option(expDay=) does, so its values now match the
+#pricing side: 252 days and +1 (toT used 255 days and +2 before, shown alongside). for
+#a spread of expiries from a week to two years, toT is checked against
+#nyse.yearFraction and option(expDay=).T. the cost of building options from expiry
+#strings is shown with the calendar's holidays loaded and cached. exits non-zero when
+#toT and the pricing side disagree
+import sys
+
+import numpy as np
+import pandas as pd
+
+import tradingCalendar
+import volSurfacePlot
+from benchmarks.common import best
+from pricing import option
+
+DAYS = (3, 7, 10, 30, 45, 91, 182, 365, 730)
+
+#toT against the calendar, as of today and as of a chain snapshot date
+def parity():
+    today = np.datetime64('today', 'D')
+    failed = False
+    print('%-12s %6s %12s %12s %12s %12s' % ('expiry', 'days', 'toT', 'yearFraction', 'option T', 'old toT'))
+    for asOf in (None, today - np.timedelta64(30, 'D')):
+        print('as of %s' % (today if asOf is None else asOf))
+        expiries = pd.Series([str(today + np.timedelta64(d, 'D')) for d in DAYS])
+        T = volSurfacePlot.toT(None, None, expiries, today=asOf)
+        ref = tradingCalendar.nyse.yearFraction(expiries.to_numpy(dtype='datetime64[D]'), asOf)
+        old = tradingCalendar.nyse.yearFraction(expiries.to_numpy(dtype='datetime64[D]'), asOf, daysInYear=255, offset=2)
+        for i, d in enumerate(expiries):
+            opt = option(otype='Call', S0=100.0, K=100.0, vol=0.2, expDay=d).T if asOf is None else np.nan
+            ok = T[i] == ref[i] and (asOf is not None or T[i] == opt)
+            failed |= not ok
+            print('%-12s %6d %12.6f %12.6f %12.6f %12.6f %s' % (d, tradingCalendar.nyse.busdays(d, asOf), T[i], ref[i], opt,
+                                                              old[i], 'ok' if ok else 'MISMATCH'))
+    return failed
+
+def speed(n=1000):
+    today = np.datetime64('today', 'D')
+    days = [str(today + np.timedelta64(d, 'D')) for d in range(7, 7*n + 7, 7)]
+    tradingCalendar.nyse.clear()
+    first = best(lambda: [option(otype='Call', S0=100.0, K=100.0, vol=0.2, expDay=d) for d in days], 1)
+    cached = best(lambda: [option(otype='Call', S0=100.0, K=100.0, vol=0.2, expDay=d) for d in days])
+    print('\n%d options from expDay: %.1f us each on first use, %.1f us cached' % (n, first/n*1e6, cached/n*1e6))
+
+if __name__ == '__main__':
+    failed = parity()
+    speed()
+    sys.exit(1 if failed else 0)
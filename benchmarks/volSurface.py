@@ -0,0 +1,53 @@
+#VolSurface fit time and query throughput against the griddata path make_surf used to
+#take on every plot, on a synthetic chain. run from the repo root with
+#python -m benchmarks.volSurface [query points]
+import sys
+
+import numpy as np
+from scipy.interpolate import griddata
+
+from benchmarks.common import best
+from volSurface import VolSurface
+
+#skewed smile over 20 expiries and strikes 50-150% of spot with quote noise
+def chain(spot, expiries=20, strikes=120, seed=0):
+    rng = np.random.default_rng(seed)
+    T = np.repeat(np.linspace(0.01, 0.25, expiries), strikes)
+    K = np.tile(np.linspace(0.5*spot, 1.5*spot, strikes), expiries)
+    k = np.log(K/spot)
+    vol = 0.18 - 0.15*k + 0.6*k**2 + 0.05*np.sqrt(T) + rng.normal(0, 0.003, k.size)
+    return T, K, vol
+
+#make_surf before VolSurface: one strike row per dollar, fresh triangulation every call
+def legacyMakeSurf(X, Y, Z, nDates):
+    XX, YY = np.meshgrid(np.linspace(min(X), max(X), nDates), np.linspace(min(Y), max(Y), int(max(Y)-min(Y))))
+    ZZ = griddata(np.array([X, Y]).T, np.array(Z), (XX, YY), method='linear')
+    nans = np.isnan(ZZ)
+    x = lambda z: z.nonzero()[0]
+    ZZ[nans] = np.interp(x(nans), x(~nans), ZZ[~nans])
+    return XX, YY, ZZ
+
+def run(points=1000000):
+    rng = np.random.default_rng(1)
+    for spot in (45.0, 450.0, 4500.0):
+        T, K, vol = chain(spot)
+        legacy = best(lambda: legacyMakeSurf(T, K, vol, 20))
+        print('spot %6.0f  legacy make_surf %8.3fs (%d strike rows)' % (spot, legacy, int(K.max() - K.min())))
+        KQ = rng.uniform(0.5*spot, 1.5*spot, points)
+        TQ = rng.uniform(0.01, 0.25, points)
+        for method in ('linear', 'svi'):
+            fit = best(lambda: VolSurface(T, K, vol, method, spot=spot))
+            surface = VolSurface(T, K, vol, method, spot=spot)
+            query = best(lambda: surface.vol(KQ, TQ))
+            grid = best(lambda: surface.grid(20))
+            rmse = np.sqrt(np.mean((surface.vol(K, T) - vol)**2))
+            print('   %-6s fit %8.4fs  query %6.3f us/pt  grid(20, 100) %7.4fs  rmse at quotes %.2e'
+                  % (method, fit, query/points*1e6, grid, rmse))
+        #the linear surface is the same interpolant griddata builds, inside the quotes' hull
+        XX, YY, ZZ = legacyMakeSurf(T, K, vol, 20)
+        inside = ~np.isnan(griddata(np.array([T, K]).T, vol, (XX, YY), method='linear'))
+        diff = np.abs(VolSurface(T, K, vol).vol(YY, XX) - ZZ)[inside].max()
+        print('   linear vs griddata inside the hull: max abs diff %.2e' % diff)
+
+if __name__ == '__main__':
+    run(int(float(sys.argv[1])) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,175 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import perf
+import tradingCalendar
+
+#snapshot file names, the UTC time the chain was taken
+STAMP = '%Y%m%dT%H%M%SZ'
+
+#columns added to every row of a fetched chain on top of the source's own
+ADDED = ('expiry', 'type', 'underlying')
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+#interface of a chain source. chain returns one expiry as {'Call': frame, 'Put': frame}
+#with one row per strike, asOf the time the data is valid for (None for live data)
+class ChainSource():
+    def spot(self, ticker):
+        raise NotImplementedError
+
+    def expiries(self, ticker):
+        raise NotImplementedError
+
+    def chain(self, ticker, expiry):
+        raise NotImplementedError
+
+    def asOf(self, ticker):
+        return None
+
+#live chains from Yahoo Finance. one yfinance Ticker is shared per symbol, its list of
+#expiries is loaded by expiries() before the per-expiry requests run concurrently
+class YahooSource(ChainSource):
+    def __init__(self):
+        self._tickers = {}
+        self._lock = threading.Lock()
+
+    def _ticker(self, ticker):
+        with self._lock:
+            if ticker not in self._tickers:
+                import yfinance as yf
+                self._tickers[ticker] = yf.Ticker(ticker)
+            return self._tickers[ticker]
+
+    def spot(self, ticker):
+        info = self._ticker(ticker).info
+        return (info['bid'] + info['ask'])/2
+
+    def expiries(self, ticker):
+        return list(self._ticker(ticker).options)
+
+    def chain(self, ticker, expiry):
+        chain = self._ticker(ticker).option_chain(expiry)
+        return {'Call': chain.calls, 'Put': chain.puts}
+
+#snapshots of fetched chains, one columnar file per ticker and UTC timestamp under
+#root/TICKER/. fmt is 'parquet' or 'feather', both need pyarrow
+class ChainCache():
+    def __init__(self, root='chainCache', fmt='parquet'):
+        if fmt not in ('parquet', 'feather'):
+            raise ValueError('fmt must be parquet or feather')
+        self.root = root
+        self.fmt = fmt
+
+    def path(self, ticker, timestamp):
+        return os.path.join(self.root, ticker.upper(), timestamp.strftime(STAMP) + '.' + self.fmt)
+
+    def save(self, ticker, frame, timestamp=None):
+        timestamp = utcnow() if timestamp is None else timestamp
+        path = self.path(ticker, timestamp)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        frame = frame.reset_index(drop=True)
+        if self.fmt == 'parquet':
+            frame.to_parquet(path, index=False)
+        else:
+            frame.to_feather(path)
+        return timestamp
+
+    #timestamps of every snapshot of ticker, oldest first
+    def snapshots(self, ticker):
+        folder = os.path.join(self.root, ticker.upper())
+        if not os.path.isdir(folder): return []
+        ext = '.' + self.fmt
+        return sorted(datetime.strptime(f[:-len(ext)], STAMP) for f in os.listdir(folder) if f.endswith(ext))
+
+    def latest(self, ticker):
+        snaps = self.snapshots(ticker)
+        return snaps[-1] if snaps else None
+
+    #the snapshot taken at timestamp, or the latest one. None when there is none
+    def load(self, ticker, timestamp=None):
+        timestamp = self.latest(ticker) if timestamp is None else timestamp
+        if timestamp is None: return None
+        path = self.path(ticker, timestamp)
+        return pd.read_parquet(path) if self.fmt == 'parquet' else pd.read_feather(path)
+
+#serves chains from a ChainCache snapshot (the latest unless timestamp is given), so
+#surfaces can be rebuilt and benchmarked offline exactly as they were fetched
+class ReplaySource(ChainSource):
+    def __init__(self, cache, timestamp=None):
+        self.cache = ChainCache(cache) if isinstance(cache, str) else cache
+        self.timestamp = timestamp
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _frame(self, ticker):
+        with self._lock:
+            if ticker not in self._frames:
+                timestamp = self.timestamp or self.cache.latest(ticker)
+                frame = self.cache.load(ticker, timestamp)
+                if frame is None:
+                    raise FileNotFoundError('No snapshot of ' + ticker + ' under ' + self.cache.root)
+                self._frames[ticker] = (timestamp, frame)
+            return self._frames[ticker]
+
+    def spot(self, ticker):
+        return float(self._frame(ticker)[1]['underlying'].iloc[0])
+
+    def expiries(self, ticker):
+        return list(pd.unique(self._frame(ticker)[1]['expiry']))
+
+    def chain(self, ticker, expiry):
+        frame = self._frame(ticker)[1]
+        rows = frame[frame['expiry'] == expiry]
+        return dict([(otype, rows[rows['type'] == otype].drop(columns=list(ADDED))) for otype in ('Call', 'Put')])
+
+    def asOf(self, ticker):
+        return self._frame(ticker)[0]
+
+#every expiry of ticker with at least minBusdays trading days left as of the source's
+#date, fetched on maxWorkers threads and concatenated once into one frame with the
+#expiry, type ('Call'/'Put') and underlying spot added to each row. progress, when
+#given, is called as progress(done, total) after each expiry arrives and may raise to
+#stop the fetch, expiries not yet requested are then dropped
+@perf.timed('chainData.fetchChain')
+def fetchChain(source, ticker, minBusdays=2, maxWorkers=8, progress=None):
+    spot = source.spot(ticker)
+    asOf = source.asOf(ticker)
+    dates = source.expiries(ticker)
+    if dates:
+        today = None if asOf is None else np.datetime64(asOf, 'D')
+        dates = [d for d, n in zip(dates, tradingCalendar.nyse.busdays(dates, today)) if n >= minBusdays]
+    with ThreadPoolExecutor(max_workers=max(1, min(maxWorkers, len(dates)))) as pool:
+        futures = [pool.submit(source.chain, ticker, d) for d in dates]
+        chains = []
+        try:
+            for future in futures:
+                chains.append(future.result())
+                if progress is not None: progress(len(chains), len(dates))
+        except BaseException:
+            for future in futures: future.cancel()
+            raise
+    frames = [frame.assign(expiry=d, type=otype, underlying=spot)
+              for d, chain in zip(dates, chains) for otype, frame in chain.items()]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(ADDED))
+
+#(chain, asOf) for ticker. a cached snapshot younger than maxAge (a timedelta) is used
+#as is, otherwise the chain is fetched from source (Yahoo by default) and, with a
+#cache, saved as a new snapshot. progress is passed on to fetchChain
+def loadChain(ticker, source=None, cache=None, maxAge=None, minBusdays=2, maxWorkers=8, progress=None):
+    if cache is not None and maxAge is not None:
+        latest = cache.latest(ticker)
+        if latest is not None and utcnow() - latest <= maxAge:
+            return cache.load(ticker, latest), latest
+    source = YahooSource() if source is None else source
+    frame = fetchChain(source, ticker, minBusdays, maxWorkers, progress)
+    asOf = source.asOf(ticker) or utcnow()
+    if cache is not None:
+        cache.save(ticker, frame, asOf)
+    return frame, asOf
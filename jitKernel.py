@@ -0,0 +1,106 @@
+#optional compiled backend for pricing.greeks, selected with
+#pricing.setKernelBackend('numba') or OPTIONS_KERNEL=numba. needs numba, which is not
+#in requirements.txt; pricing falls back to numpy without it. pricing only hands it
+#float64 grids with pricing.JIT_MIN_OUTPUTS or more outputs, where it is faster
+import math
+
+import numpy as np
+from numba import njit
+
+from pricing import OUTPUTS
+
+_SQRT2 = math.sqrt(2)
+_SQRT2PI = math.sqrt(2*math.pi)
+_INDEX = dict([(name, i) for i, name in enumerate(OUTPUTS)])
+
+#outputs needing the normal cdf terms (price and delta included for omega), the pdf
+#of d1 and the pdf of d2
+_CDF = [_INDEX[k] for k in ('price', 'delta', 'theta', 'rho', 'omega', 'charm', 'dualDelta')]
+_PDF1 = [_INDEX[k] for k in OUTPUTS if k not in ('price', 'delta', 'rho', 'omega', 'dualDelta', 'dualGamma')]
+_PDF2 = [_INDEX['dualGamma']]
+
+#every grid point of pricing.greeks in one loop: the inputs are broadcast views of the
+#grid's shape, out is (len(codes), points) with codes indexing OUTPUTS. points go in C
+#order and terms depending only on inputs that did not change since the last point
+#(discount factors, sqrt(T), log(S0/K)) are reused, which is what broadcasting buys the
+#numpy backend. the formulas are written term for term like pricing._call/_put/_both
+#so the two backends agree to rounding, in float64 whatever the output precision. the
+#normal cdf is always the erfc form, setNormBackend does not apply here, and division
+#by zero gives inf/nan as in numpy
+@njit(cache=True, error_model='numpy')
+def _kernel(isCall, S0, K, vol, r, T, q, codes, cdf, pdf1, pdf2, out):
+    lastT, lastR, lastQ, lastS, lastK = np.nan, np.nan, np.nan, np.nan, np.nan
+    sqrtT, eqT, erT, logSK = np.nan, np.nan, np.nan, np.nan
+    f8 = np.float64
+    i = 0
+    #rows of the last axis, each row's inputs are 1-D views
+    for row in np.ndindex(S0.shape[:-1]):
+        callRow, S0Row, KRow, volRow, rRow, TRow, qRow = isCall[row], S0[row], K[row], vol[row], r[row], T[row], q[row]
+        for e in range(S0Row.shape[0]):
+            s, k, v, rr, t, qq = f8(S0Row[e]), f8(KRow[e]), f8(volRow[e]), f8(rRow[e]), f8(TRow[e]), f8(qRow[e])
+            if t != lastT:
+                sqrtT = math.sqrt(t)
+            if t != lastT or qq != lastQ:
+                eqT = math.exp(-qq*t)
+            if t != lastT or rr != lastR:
+                erT = math.exp(-rr*t)
+            if s != lastS or k != lastK:
+                logSK = math.log(s/k)
+            lastT, lastR, lastQ, lastS, lastK = t, rr, qq, s, k
+            volSqrtT = v*sqrtT
+            d1 = (logSK+(rr - qq + v**2/2)*t)/volSqrtT
+            d2 = d1-volSqrtT
+            nd1 = math.exp(-d1*d1/2)/_SQRT2PI if pdf1 else 0.0
+            nd2 = math.exp(-d2*d2/2)/_SQRT2PI if pdf2 else 0.0
+            call = callRow[e]
+            sign = 1.0 if call else -1.0
+            N1, N2, price, delta = 0.0, 0.0, 0.0, 0.0
+            if cdf:
+                #N(d1), N(d2) for calls and N(-d1), N(-d2) for puts
+                N1 = 0.5*math.erfc(-sign*d1/_SQRT2)
+                N2 = 0.5*math.erfc(-sign*d2/_SQRT2)
+                price = s*eqT*N1-k*erT*N2 if call else k*erT*N2 - s*eqT*N1
+                delta = sign*eqT*N1
+            vega = eqT*s*sqrtT*nd1
+            for j in range(codes.shape[0]):
+                c = codes[j]
+                if c == 0: x = price
+                elif c == 1: x = delta
+                elif c == 2: x = vega
+                elif c == 3: x = -(eqT*s*nd1*v)/(2*sqrtT) - sign*(rr*k*erT*N2 - qq*s*eqT*N1)
+                elif c == 4: x = sign*k*t*erT*N2
+                elif c == 5: x = delta * (s/price)
+                elif c == 6: x = eqT*(nd1/(s*v*sqrtT))
+                elif c == 7: x = -eqT*nd1*d2/v
+                elif c == 8: x = sign*qq*eqT*N1 - eqT*nd1*((2*(rr-qq)*t - d2*v*sqrtT)/(2*t*v*sqrtT))
+                elif c == 9: x = s*eqT*nd1*sqrtT*((d1*d2)/v)
+                elif c == 10: x = -s*eqT*nd1*sqrtT*(qq+(((rr-qq)*d1)/(v*sqrtT))-(1+d1*d2)/(2*t))
+                elif c == 11: x = -eqT*((nd1)/(s**2*v*sqrtT))*(d1/(v*sqrtT)+1)
+                elif c == 12: x = eqT*((nd1*(d1*d2-1))/(s*v**2*sqrtT))
+                elif c == 13: x = -eqT*(nd1/(2*s*t*v*sqrtT))
+                elif c == 14: x = (-vega/v**2)*(d1*d2*(1-d1*d2)+d1**2+d2**2)
+                elif c == 15: x = -erT*N2
+                else: x = erT*(nd2/(k*v*sqrtT))
+                out[j, i] = x
+            i += 1
+
+#pricing.greeks for a boolean isCall (scalar or array) on the compiled kernel. inputs
+#are passed as broadcast views, never copied, and the outputs are written into one
+#(len(names),) + grid block, each output a contiguous slice of it, in float32 when the
+#inputs are and float64 otherwise. the kernel compiles once per grid rank, dtype and
+#memory layout of the inputs, and is cached on disk after that
+def greeks(names, isCall, S0, K, vol, r, T, q=0):
+    for name in names:
+        if name not in _INDEX: raise ValueError('Unknown output ' + str(name))
+    codes = np.array([_INDEX[name] for name in names], dtype=np.int64)
+    shape = np.broadcast(isCall, S0, K, vol, r, T, q).shape
+    dtype = np.float32 if np.result_type(S0, K, vol, r, T, q) == np.float32 else np.float64
+    #the kernel loops over rows, so a single point is a grid of one
+    grid = shape or (1,)
+    args = [np.broadcast_to(x if isinstance(x, np.ndarray) and x.dtype in (np.float32, np.float64)
+                            else np.asarray(x, dtype=np.float64), grid) for x in (S0, K, vol, r, T, q)]
+    block = np.empty((codes.size,) + shape, dtype=dtype)
+    _kernel(np.broadcast_to(np.asarray(isCall, dtype=bool), grid), *args, codes,
+            any(c in _CDF for c in codes), any(c in _PDF1 for c in codes), any(c in _PDF2 for c in codes),
+            block.reshape(codes.size, -1))
+    return dict(zip(names, block))
@@ -0,0 +1,88 @@
+import numpy as np
+
+import perf
+from pricing import OptionBook, greeks, ncdf, npdf
+
+#inputs a live book can change between ticks, S0 is given to every reprice instead
+UPDATABLE = ('K', 'vol', 'r', 'T', 'q')
+
+#a book re-priced tick by tick where usually only the spot moves. every leg's
+#spot-independent terms (sqrt(T), vol*sqrt(T), discount factors, log(K) and the
+#drift) are cached, folded so a tick is a handful of array operations, and refreshed
+#only for the legs whose K, vol, r, T or q change through update. price, delta, gamma
+#and vega come from the cache, any other output goes through the fused greeks kernel.
+#built from an OptionBook (copied) or a list of options
+class LiveBook():
+    fast = ('price', 'delta', 'gamma', 'vega')
+
+    def __init__(self, book, qty=1):
+        #a book of its own, update never touches the one passed in
+        book = book.copy() if isinstance(book, OptionBook) else OptionBook.fromOptions(book, qty)
+        self.book = book
+        self.weights = book.weights
+        #+1 for calls and -1 for puts, so both are priced by one expression
+        self.w = np.where(book.isCall, 1.0, -1.0)
+        n = len(book)
+        for k in ('offset', 'scale', 'wVolSqrtT', 'wEqT', 'wKerT', 'gammaScale', 'vegaScale'):
+            setattr(self, k, np.empty(n))
+        self.refreshes = 0
+        self._refresh(slice(None))
+
+    def __len__(self):
+        return len(self.book)
+
+    #w*d1 = (log(S0) + offset)*scale and w*d2 = w*d1 - wVolSqrtT, then
+    #price = S0*wEqT*N(w*d1) - wKerT*N(w*d2)
+    def _refresh(self, rows):
+        b = self.book
+        K, vol, r, T, q, w = b.K[rows], b.vol[rows], b.r[rows], b.T[rows], b.q[rows], self.w[rows]
+        sqrtT = np.sqrt(T)
+        volSqrtT = vol*sqrtT
+        eqT = np.exp(-q*T)
+        self.offset[rows] = (r - q + vol**2/2)*T - np.log(K)
+        self.scale[rows] = w/volSqrtT
+        self.wVolSqrtT[rows] = w*volSqrtT
+        self.wEqT[rows] = w*eqT
+        self.wKerT[rows] = w*K*np.exp(-r*T)
+        self.gammaScale[rows] = eqT/volSqrtT
+        self.vegaScale[rows] = eqT*sqrtT
+        self.refreshes += 1
+
+    #changes inputs of the legs in rows (an index, mask or slice, every leg when None),
+    #e.g. update(T=book.T - dt) as time passes or update(rows=[3], vol=0.25). only
+    #those legs' cached terms are recomputed
+    def update(self, rows=None, **inputs):
+        for k in inputs:
+            if k not in UPDATABLE:
+                raise ValueError('Cannot update ' + str(k) + ', must be one of ' + ', '.join(UPDATABLE))
+        rows = slice(None) if rows is None else rows
+        for k, v in inputs.items():
+            getattr(self.book, k)[rows] = v
+        if inputs: self._refresh(rows)
+
+    #unsigned per-leg values of names at spot S0: a scalar, one spot per leg, or any
+    #shape broadcasting against (legs,), e.g. (m, 1) for m spots at once
+    @perf.timed('liveBook.reprice')
+    def reprice(self, S0, names=('price',)):
+        if isinstance(names, str): names = (names,)
+        S0 = S0 if isinstance(S0, float) else np.asarray(S0, dtype=np.float64)
+        slow = [name for name in names if name not in self.fast]
+        out = {}
+        if slow:
+            b = self.book
+            out.update(greeks(slow, b.isCall, S0, b.K, b.vol, b.r, b.T, b.q))
+        if len(slow) < len(names):
+            wd1 = (np.log(S0) + self.offset)*self.scale
+            if 'price' in names or 'delta' in names:
+                N1 = ncdf(wd1)
+                if 'delta' in names: out['delta'] = self.wEqT*N1
+                if 'price' in names: out['price'] = S0*self.wEqT*N1 - self.wKerT*ncdf(wd1 - self.wVolSqrtT)
+            if 'gamma' in names or 'vega' in names:
+                nd1 = npdf(wd1)
+                if 'gamma' in names: out['gamma'] = self.gammaScale*nd1/S0
+                if 'vega' in names: out['vega'] = self.vegaScale*S0*nd1
+        return dict([(name, out[name]) for name in names])
+
+    #signed sum over legs at spot S0, reduced over the last (legs) axis
+    def total(self, S0, names=('price',)):
+        return dict([(name, v @ self.weights) for name, v in self.reprice(S0, names).items()])
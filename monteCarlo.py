@@ -0,0 +1,201 @@
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import perf
+from pricing import greeks
+
+#float64 path values held per block, paths are simulated this many prices at a time
+#(steps+1 per path) whatever the number of paths asked for
+PATH_CHUNK = 1 << 20
+
+#paths per task. tasks, not workers, own the seed streams, so a run gives the same
+#result on any number of processes
+TASK_PATHS = 1 << 16
+
+#monitoring dates per year for path-dependent payoffs, the trading-day convention
+#tradingCalendar uses
+STEPS_PER_YEAR = 252
+
+#payoffs take the simulated prices S, shape (paths, steps+1) with S0 in the first
+#column, and return one payoff per path. pathDependent payoffs need every monitoring
+#date, the rest only the terminal price
+
+class European():
+    pathDependent = False
+
+    def __call__(self, S, K, isCall):
+        return np.maximum(S[:, -1] - K if isCall else K - S[:, -1], 0)
+
+    def key(self):
+        return ('European',)
+
+#arithmetic average of the monitoring dates after today against a fixed strike
+class Asian():
+    pathDependent = True
+
+    def __call__(self, S, K, isCall):
+        average = S[:, 1:].mean(1)
+        return np.maximum(average - K if isCall else K - average, 0)
+
+    def key(self):
+        return ('Asian',)
+
+#vanilla payoff knocked in or out by the barrier level, checked on the monitoring dates
+#(discrete monitoring, which knocks less often than a continuously watched barrier).
+#kind is 'up-and-out', 'up-and-in', 'down-and-out' or 'down-and-in', rebate is paid
+#on paths the barrier leaves without a vanilla payoff
+class Barrier():
+    pathDependent = True
+    kinds = ('up-and-out', 'up-and-in', 'down-and-out', 'down-and-in')
+
+    def __init__(self, level, kind='down-and-out', rebate=0.0):
+        if kind not in self.kinds:
+            raise ValueError('kind must be one of ' + ', '.join(self.kinds))
+        self.level = level
+        self.kind = kind
+        self.rebate = rebate
+
+    def __call__(self, S, K, isCall):
+        up = self.kind.startswith('up')
+        hit = (S.max(1) >= self.level) if up else (S.min(1) <= self.level)
+        alive = ~hit if self.kind.endswith('out') else hit
+        vanilla = np.maximum(S[:, -1] - K if isCall else K - S[:, -1], 0)
+        return np.where(alive, vanilla, self.rebate)
+
+    def key(self):
+        return ('Barrier', float(self.level), self.kind, float(self.rebate))
+
+#lookback on the extremes of the monitored prices, today's included. 'floating' pays
+#S_T - min (calls) or max - S_T (puts) and ignores K, 'fixed' pays max - K or K - min
+class Lookback():
+    pathDependent = True
+
+    def __init__(self, strike='floating'):
+        if strike not in ('floating', 'fixed'):
+            raise ValueError('strike must be floating or fixed')
+        self.strike = strike
+
+    def __call__(self, S, K, isCall):
+        if self.strike == 'floating':
+            return S[:, -1] - S.min(1) if isCall else S.max(1) - S[:, -1]
+        return np.maximum(S.max(1) - K, 0) if isCall else np.maximum(K - S.min(1), 0)
+
+    def key(self):
+        return ('Lookback', self.strike)
+
+PAYOFFS = {'european': European, 'asian': Asian, 'barrier': Barrier, 'lookback': Lookback}
+
+#geometric brownian motion paths for n standard normal rows Z, (n, steps): S0 and then
+#one price per step, built in log space with a cumulative sum
+def gbmPaths(Z, S0, vol, r, T, q):
+    dt = T/Z.shape[1]
+    logS = np.empty((Z.shape[0], Z.shape[1] + 1))
+    logS[:, 0] = math.log(S0)
+    np.cumsum(Z*(vol*math.sqrt(dt)) + (r - q - vol**2/2)*dt, axis=1, out=logS[:, 1:])
+    logS[:, 1:] += logS[:, :1]
+    return np.exp(logS, out=logS)
+
+#one task: n paths from its own seed, simulated PATH_CHUNK prices at a time. returns
+#the sums the estimate is pooled from: count, sum and sum of squares of the discounted
+#payoff Y and control X, and sum of X*Y. with antithetic pairs a sample is the mean of
+#a path and its mirror
+def _simulate(spec, seed, n):
+    payoff, isCall, S0, K, vol, r, T, q, steps, antithetic, control, controlK = spec
+    rng = np.random.default_rng(seed)
+    disc = math.exp(-r*T)
+    sums = np.zeros(6)
+    pairs = 2 if antithetic else 1
+    block = max(1, PATH_CHUNK//((steps + 1)*pairs))
+    for start in range(0, n, block):
+        m = min(block, n - start)
+        Z = rng.standard_normal((m, steps))
+        Y = np.zeros(m)
+        X = np.zeros(m)
+        for sign in (1, -1)[:pairs]:
+            S = gbmPaths(sign*Z, S0, vol, r, T, q)
+            Y += disc*payoff(S, K, isCall)
+            if control:
+                X += disc*np.maximum(S[:, -1] - controlK if isCall else controlK - S[:, -1], 0)
+        Y /= pairs
+        X /= pairs
+        sums += (m, Y.sum(), (Y*Y).sum(), X.sum(), (X*X).sum(), (X*Y).sum())
+    return sums
+
+#price of a payoff by monte carlo under black-scholes dynamics, option-style inputs.
+#paths are split into TASK_PATHS tasks, each with a child of SeedSequence(seed), run
+#on a process pool of workers (all cores when None, in this process when 1).
+#antithetic mirrors every normal draw, control uses the european vanilla on the same
+#paths (strike K, or S0 when the payoff has none) with its closed-form price from the
+#greeks kernel as the known mean. steps defaults to STEPS_PER_YEAR monitoring dates a
+#year for path-dependent payoffs and 1 otherwise. returns a dict with price, stderr,
+#paths, seconds, pathsPerSecond and the control coefficient beta
+@perf.timed('monteCarlo.simulate')
+def simulate(payoff, otype, S0, K, vol, r, T, q=0, paths=100000, steps=None, antithetic=True, control=True,
+             seed=0, workers=None):
+    payoff = PAYOFFS[payoff]() if isinstance(payoff, str) else payoff
+    isCall = otype.title() == 'Call'
+    if not isCall and otype.title() != 'Put': raise ValueError('Unknown option type ' + otype)
+    if steps is None:
+        steps = max(1, int(round(STEPS_PER_YEAR*T))) if payoff.pathDependent else 1
+    controlK = S0 if K is None else K
+    spec = (payoff, isCall, float(S0), K, float(vol), float(r), float(T), float(q), steps, antithetic, control, controlK)
+    #antithetic pairs count as two paths
+    samples = max(1, int(paths)//(2 if antithetic else 1))
+    sizes = [min(TASK_PATHS, samples - start) for start in range(0, samples, TASK_PATHS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = min(os.cpu_count() or 1, len(sizes)) if workers is None else min(workers, len(sizes))
+    t0 = time.perf_counter()
+    if workers <= 1:
+        parts = [_simulate(spec, s, n) for s, n in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_simulate, [spec]*len(sizes), seeds, sizes))
+    seconds = time.perf_counter() - t0
+    n, sy, syy, sx, sxx, sxy = np.sum(parts, axis=0)
+    mean = sy/n
+    var = max(syy/n - mean**2, 0)*n/max(n - 1, 1)
+    beta = 0.0
+    if control:
+        known = greeks(('price',), otype, S0, controlK, vol, r, T, q)['price']
+        xMean = sx/n
+        varX = (sxx/n - xMean**2)*n/max(n - 1, 1)
+        cov = (sxy/n - mean*xMean)*n/max(n - 1, 1)
+        if varX > 0:
+            beta = cov/varX
+            mean -= beta*(xMean - known)
+            var = max(var - cov*cov/varX, 0)
+    simulated = int(n)*(2 if antithetic else 1)
+    return {'price': mean, 'stderr': math.sqrt(var/n), 'paths': simulated, 'steps': steps, 'seconds': seconds,
+            'pathsPerSecond': simulated/seconds if seconds > 0 else np.inf, 'beta': beta}
+
+#a path-dependent contract with the inputs of pricing.option, valued by simulate.
+#payoff is a name in PAYOFFS or a payoff object (e.g. Barrier(90, 'down-and-out'))
+class PathOption():
+    def __init__(self, payoff, otype, S0, K=None, vol=0.2, T=1.0, r=0.025, q=0, ls='Long'):
+        self.payoff = PAYOFFS[payoff]() if isinstance(payoff, str) else payoff
+        self.otype = otype.title()
+        self.S0 = S0
+        self.K = K
+        self.vol = vol
+        self.T = T
+        self.r = r
+        self.q = q
+        self.ls = ls
+
+    def inputs(self):
+        return {'S0':self.S0, 'K':self.K, 'vol':self.vol, 'r':self.r, 'T':self.T, 'q':self.q}
+
+    def key(self):
+        return (type(self).__name__, self.payoff.key(), self.otype, self.ls) + \
+            tuple(None if v is None else float(v) for v in self.inputs().values())
+
+    #simulate's result for this contract, any of simulate's keywords pass through
+    def simulate(self, **kwargs):
+        return simulate(self.payoff, self.otype, self.S0, self.K, self.vol, self.r, self.T, self.q, **kwargs)
+
+    def price(self, **kwargs):
+        return self.simulate(**kwargs)['price']
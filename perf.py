@@ -0,0 +1,118 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+#opt-in instrumentation: per-stage call counts, wall time and array sizes, plus a ring
+#buffer of the most recent operations. off unless enable() is called or OPTIONS_PERF=1
+#is set, and while off an instrumented call costs one global lookup and a branch
+enabled = False
+_events = deque(maxlen=10000)
+_stats = {}
+_lock = threading.Lock()
+_origin = time.perf_counter()
+
+def enable(maxEvents=None):
+    global enabled, _events
+    if maxEvents is not None and maxEvents != _events.maxlen:
+        _events = deque(_events, maxlen=maxEvents)
+    enabled = True
+
+def disable():
+    global enabled
+    enabled = False
+
+def clear():
+    with _lock:
+        _events.clear()
+        _stats.clear()
+
+#element count of the largest array in value (arrays, dicts/sequences of them, scalars)
+def arraySize(value):
+    if isinstance(value, np.ndarray):
+        return value.size
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        return max([arraySize(v) for v in value] + [0])
+    return 1 if isinstance(value, (int, float, np.generic)) else 0
+
+def record(name, start, end, size=0):
+    event = (name, start, end - start, size, threading.get_ident())
+    with _lock:
+        _events.append(event)
+        s = _stats.get(name)
+        if s is None:
+            s = _stats[name] = {'count': 0, 'seconds': 0.0, 'maxSeconds': 0.0, 'elements': 0, 'maxSize': 0}
+        s['count'] += 1
+        s['seconds'] += end - start
+        s['maxSeconds'] = max(s['maxSeconds'], end - start)
+        s['elements'] += size
+        s['maxSize'] = max(s['maxSize'], size)
+
+#decorator recording every call as stage name, sized by the largest array among the
+#arguments and the result
+def timed(name):
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            end = time.perf_counter()
+            record(name, start, end, max(arraySize(args), arraySize(kwargs), arraySize(result)))
+            return result
+        return inner
+    return wrap
+
+#context manager for a block, with an explicit size
+class span():
+    def __init__(self, name, size=0):
+        self.name = name
+        self.size = size
+
+    def __enter__(self):
+        if enabled: self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if enabled and hasattr(self, 'start'):
+            record(self.name, self.start, time.perf_counter(), self.size)
+        return False
+
+#the last n operations, newest first, as (name, start s, duration s, size, thread id)
+def recent(n=100):
+    with _lock:
+        events = list(_events)[-n:]
+    return [(name, start - _origin, dur, size, tid) for name, start, dur, size, tid in reversed(events)]
+
+def stats():
+    with _lock:
+        return dict([(name, dict(s)) for name, s in _stats.items()])
+
+def toJSON(path=None):
+    data = {'stats': stats(), 'events': [dict(zip(('name', 'start', 'seconds', 'size', 'thread'), e))
+                                         for e in reversed(recent(len(_events)))]}
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=1)
+    return data
+
+#Chrome trace event format (chrome://tracing, Perfetto): one complete event per operation
+def toChromeTrace(path=None):
+    pid = os.getpid()
+    trace = {'traceEvents': [{'name': name, 'ph': 'X', 'ts': start*1e6, 'dur': dur*1e6, 'pid': pid, 'tid': tid,
+                              'args': {'size': size}} for name, start, dur, size, tid in reversed(recent(len(_events)))],
+             'displayTimeUnit': 'ms'}
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump(trace, f)
+    return trace
+
+if os.environ.get('OPTIONS_PERF', '') not in ('', '0'):
+    enable()
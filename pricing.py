@@ -1,8 +1,242 @@
 #from marketData import marketData
-import pandas_market_calendars as mcal
+import importlib
+import math
+import os
 import numpy as np
-from scipy import optimize
-from scipy import stats
+from functools import cached_property
+
+import perf
+import sweeps
+import tradingCalendar
+
+#stands in for a heavy module and imports it on first attribute access, so importing
+#pricing stays cheap for callers that never touch the code paths needing it
+class _LazyModule():
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+stats = _LazyModule('scipy.stats')
+special = _LazyModule('scipy.special')
+
+#normal cdf/pdf used by every kernel. each backend is (cdf, pdf, scalar cdf, scalar pdf);
+#python and numpy float scalars take the scalar pair when a backend has one, which
+#skips array allocation entirely
+_SQRT2 = math.sqrt(2)
+_SQRT2PI = math.sqrt(2*math.pi)
+
+normBackends = {
+    'special': (lambda x: special.ndtr(x), lambda x: np.exp(-x**2/2)/_SQRT2PI,
+                lambda x: 0.5*math.erfc(-x/_SQRT2), lambda x: math.exp(-x*x/2)/_SQRT2PI),
+    'stats': (lambda x: stats.norm.cdf(x), lambda x: stats.norm.pdf(x), None, None),
+}
+_ncdf, _npdf, _scalarCdf, _scalarPdf = normBackends['special']
+
+#select a backend by name or pass (cdf, pdf) callables, optionally with scalar versions
+def setNormBackend(backend='special'):
+    global _ncdf, _npdf, _scalarCdf, _scalarPdf
+    if isinstance(backend, str): backend = normBackends[backend]
+    _ncdf, _npdf, _scalarCdf, _scalarPdf = (tuple(backend) + (None, None))[:4]
+
+def ncdf(x):
+    if _scalarCdf is not None and isinstance(x, float): return _scalarCdf(x)
+    return _ncdf(x)
+
+def npdf(x):
+    if _scalarPdf is not None and isinstance(x, float): return _scalarPdf(x)
+    return _npdf(x)
+
+#every output the greeks kernel and option.sweep can produce, in sweep order
+OUTPUTS = ('price', 'delta', 'vega', 'theta', 'rho', 'omega', 'gamma', 'vanna', 'charm',
+           'vomma', 'veta', 'speed', 'zomma', 'color', 'ultima', 'dualDelta', 'dualGamma')
+
+#intermediates shared between the greeks, each evaluated at most once per grid
+class _Terms():
+    def __init__(self, S0, K, vol, r, T, q):
+        self.S0, self.K, self.vol, self.r, self.T, self.q = S0, K, vol, r, T, q
+
+    @cached_property
+    def sqrtT(self): return np.sqrt(self.T)
+    @cached_property
+    def volSqrtT(self): return self.vol*self.sqrtT
+    @cached_property
+    def d1(self): return (np.log(self.S0/self.K)+(self.r - self.q + self.vol**2/2)*self.T)/self.volSqrtT
+    @cached_property
+    def d2(self): return self.d1-self.volSqrtT
+    @cached_property
+    def eqT(self): return np.exp(-self.q*self.T)
+    @cached_property
+    def erT(self): return np.exp(-self.r*self.T)
+    @cached_property
+    def Nd1(self): return ncdf(self.d1)
+    @cached_property
+    def Nd2(self): return ncdf(self.d2)
+    @cached_property
+    def Nmd1(self): return ncdf(-self.d1)
+    @cached_property
+    def Nmd2(self): return ncdf(-self.d2)
+    @cached_property
+    def nd1(self): return npdf(self.d1)
+    @cached_property
+    def nd2(self): return npdf(self.d2)
+
+#call/put branches of each output, written term for term like the option methods
+def _call(name, t, out):
+    S0, K, vol, r, T, q = t.S0, t.K, t.vol, t.r, t.T, t.q
+    if name == 'price': return S0*t.eqT*t.Nd1-K*t.erT*t.Nd2
+    if name == 'delta': return t.eqT*t.Nd1
+    if name == 'theta': return -(t.eqT*S0*t.nd1*vol)/(2*t.sqrtT) - r*K*t.erT*t.Nd2 + q*S0*t.eqT*t.Nd1
+    if name == 'rho': return K*T*t.erT*t.Nd2
+    if name == 'charm': return q*t.eqT*t.Nd1 - t.eqT*t.nd1*((2*(r-q)*T - t.d2*vol*t.sqrtT)/(2*T*vol*t.sqrtT))
+    if name == 'dualDelta': return -t.erT*t.Nd2
+
+def _put(name, t, out):
+    S0, K, vol, r, T, q = t.S0, t.K, t.vol, t.r, t.T, t.q
+    if name == 'price': return K*t.erT*t.Nmd2 - S0*t.eqT*t.Nmd1
+    if name == 'delta': return -t.eqT*t.Nmd1
+    if name == 'theta': return -(t.eqT*S0*t.nd1*vol)/(2*t.sqrtT) + r*K*t.erT*t.Nmd2 - q*S0*t.eqT*t.Nmd1
+    if name == 'rho': return -K*T*t.erT*t.Nmd2
+    if name == 'charm': return -q*t.eqT*t.Nmd1 - t.eqT*t.nd1*((2*(r-q)*T - t.d2*vol*t.sqrtT)/(2*T*vol*t.sqrtT))
+    if name == 'dualDelta': return -t.erT*t.Nmd2
+
+def _both(name, t, out, isCall):
+    S0, K, vol, r, T, q = t.S0, t.K, t.vol, t.r, t.T, t.q
+    d1, d2 = t.d1, t.d2
+    if name == 'vega': return t.eqT*S0*t.sqrtT*t.nd1
+    if name == 'omega': return _get('delta', t, out, isCall) * (S0/_get('price', t, out, isCall))
+    if name == 'gamma': return t.eqT*(t.nd1/(S0*vol*t.sqrtT))
+    if name == 'vanna': return -t.eqT*t.nd1*d2/vol
+    if name == 'vomma': return S0*t.eqT*t.nd1*t.sqrtT*((d1*d2)/vol)
+    if name == 'veta': return -S0*t.eqT*t.nd1*t.sqrtT*(q+(((r-q)*d1)/(vol*t.sqrtT))-(1+d1*d2)/(2*T))
+    if name == 'speed': return -t.eqT*((t.nd1)/(S0**2*vol*t.sqrtT))*(d1/(vol*t.sqrtT)+1)
+    if name == 'zomma': return t.eqT*((t.nd1*(d1*d2-1))/(S0*vol**2*t.sqrtT))
+    if name == 'color': return -t.eqT*(t.nd1/(2*S0*T*vol*t.sqrtT))
+    if name == 'ultima': return (-_get('vega', t, out, isCall)/vol**2)*(d1*d2*(1-d1*d2)+d1**2+d2**2)
+    if name == 'dualGamma': return t.erT*(t.nd2/(K*vol*t.sqrtT))
+    raise ValueError('Unknown output ' + str(name))
+
+def _get(name, t, out, isCall):
+    if name in out: return out[name]
+    if name in ('price', 'delta', 'theta', 'rho', 'charm', 'dualDelta'):
+        if isCall is True: val = _call(name, t, out)
+        elif isCall is False: val = _put(name, t, out)
+        else: val = np.where(isCall, _call(name, t, out), _put(name, t, out))
+    else:
+        val = _both(name, t, out, isCall)
+    out[name] = val
+    return val
+
+#greeks kernel backends. 'numpy' evaluates the formulas above one array expression at
+#a time, 'numba' runs jitKernel's compiled loop, every requested output per grid point
+#with no temporaries, for float64 array inputs and at least JIT_MIN_OUTPUTS outputs
+#(scalars keep the math path, the rest the numpy one). the loop is single threaded and
+#its fixed cost per point (d1, d2, cdf, discount factors) only pays off across many
+#outputs: on a 1M point grid it runs price alone at ~0.7x numpy, breaks even around 6-8
+#outputs and reaches ~1.3-1.5x with all 17. in float32 numpy was never clearly slower,
+#the kernel computes in float64 whatever the precision. 'numba' falls back to 'numpy'
+#when numba is not installed, setKernelBackend returns the backend in use.
+#OPTIONS_KERNEL=numba selects it at import
+kernelBackends = ('numpy', 'numba')
+JIT_MIN_OUTPUTS = 8
+_jitGreeks = None
+
+def setKernelBackend(backend='numpy'):
+    global _jitGreeks
+    if backend not in kernelBackends: raise ValueError('Unknown kernel backend ' + str(backend))
+    _jitGreeks = None
+    if backend == 'numba':
+        try:
+            import jitKernel
+        except ImportError:
+            return 'numpy'
+        _jitGreeks = jitKernel.greeks
+    return kernelBackend()
+
+def kernelBackend():
+    return 'numpy' if _jitGreeks is None else 'numba'
+
+if os.environ.get('OPTIONS_KERNEL', '') not in ('', 'numpy'):
+    setKernelBackend(os.environ['OPTIONS_KERNEL'])
+
+#fused kernel: computes d1/d2, pdf, cdf and discount factors once and derives only
+#the requested outputs from them. otype is 'Call'/'Put' or a boolean array of calls
+@perf.timed('pricing.greeks')
+def greeks(names, otype, S0, K, vol, r, T, q=0):
+    if isinstance(names, str): names = (names,)
+    if isinstance(otype, str):
+        isCall = otype.title() == 'Call'
+        if not isCall and otype.title() != 'Put': raise ValueError('Unknown option type ' + otype)
+    else:
+        isCall = np.asarray(otype, dtype=bool)
+    if _jitGreeks is not None and len(names) >= JIT_MIN_OUTPUTS and any(isinstance(x, np.ndarray) for x in (S0, K, vol, r, T, q)) \
+            and np.result_type(S0, K, vol, r, T, q) != np.float32:
+        return _jitGreeks(names, isCall, S0, K, vol, r, T, q)
+    t = _Terms(S0, K, vol, r, T, q)
+    out = {}
+    for name in names:
+        _get(name, t, out, isCall)
+    return dict([(name, out[name]) for name in names])
+
+#vectorized implied vol for a whole chain: corrado-miller initial guess, halley steps
+#using vega and vomma, and a per-element [lo, hi] bracket that bisection falls back to
+#whenever a step leaves it. returns vol, iterations and noSolution flags, vol is nan
+#where the price is outside the no-arbitrage bounds or the solve did not converge
+@perf.timed('pricing.impliedVol')
+def impliedVol(price, otype, S0, K, r, T, q=0, tol=1e-10, maxIter=100, volMax=10.0):
+    price, S0, K, r, T, q = np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in (price, S0, K, r, T, q)])
+    shape = price.shape
+    price, S0, K, r, T, q = [x.ravel() for x in (price, S0, K, r, T, q)]
+    if isinstance(otype, str):
+        isCall = np.full(price.shape, otype.title() == 'Call')
+    else:
+        isCall = np.broadcast_to(np.char.title(np.asarray(otype, dtype=str)) == 'Call', shape).ravel()
+
+    fwdS = S0*np.exp(-q*T)
+    fwdK = K*np.exp(-r*T)
+    lower = np.where(isCall, np.maximum(fwdS - fwdK, 0), np.maximum(fwdK - fwdS, 0))
+    upper = np.where(isCall, fwdS, fwdK)
+    noSolution = ~((price > lower) & (price < upper) & (T > 0))
+
+    #corrado-miller on the call-equivalent price, clipped to a sane range
+    c = np.where(isCall, price, price + fwdS - fwdK)
+    m = c - (fwdS - fwdK)/2
+    disc = np.sqrt(np.maximum(m**2 - (fwdS - fwdK)**2/np.pi, 0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vol = np.sqrt(2*np.pi/T)/(fwdS + fwdK)*(m + disc)
+    vol = np.where(np.isfinite(vol), np.clip(vol, 1e-3, volMax/2), 0.2)
+
+    lo = np.full(price.shape, 1e-8)
+    hi = np.full(price.shape, volMax)
+    iterations = np.zeros(price.shape, dtype=np.int64)
+    active = np.flatnonzero(~noSolution)
+    vol[noSolution] = np.nan
+    for i in range(maxIter):
+        if active.size == 0: break
+        s = vol[active]
+        g = greeks(('price', 'vega', 'vomma'), isCall[active], S0[active], K[active], s, r[active], T[active], q[active])
+        f = g['price'] - price[active]
+        iterations[active] += 1
+        lo[active] = np.where(f < 0, s, lo[active])
+        hi[active] = np.where(f > 0, s, hi[active])
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            newton = f/g['vega']
+            step = newton/(1 - 0.5*newton*g['vomma']/g['vega'])
+            step = np.where(np.isfinite(step), step, newton)
+            new = s - step
+        bad = ~np.isfinite(new) | (new < lo[active]) | (new > hi[active])
+        new = np.where(bad, (lo[active] + hi[active])/2, new)
+        priced = np.abs(f) < tol*np.maximum(price[active], 1)
+        vol[active] = np.where(priced, s, new)
+        done = priced | (np.abs(new - s) < tol*s)
+        active = active[~done]
+    noSolution[active] = True
+    vol[active] = np.nan
+    return vol.reshape(shape), iterations.reshape(shape), noSolution.reshape(shape)
 
 class option():
     def __init__(self, otype, S0, K, q=0, marketPrice=None, T=None, expDay=None, vol=None, r=0.025, ls='Long'):
@@ -10,16 +244,14 @@ class option():
         self.K=K
         self.r=r
         self.otype=otype.title()
-        self.daysInYear = 252
+        self.daysInYear = tradingCalendar.nyse.daysInYear
         self.q=q
         self.ls = ls
         if T is None and expDay is None:
             print('Please enter days to expiry or expiration day')
         elif T is None:
             self.expDayStr = expDay
-            expDay = np.datetime64(expDay)
-            nyse = mcal.get_calendar('NYSE')
-            self.T= (np.busday_count(np.datetime64('today'), expDay, holidays=nyse.holidays().holidays)+1)/self.daysInYear
+            self.T= float(tradingCalendar.yearFraction(expDay))
         else:
             self.T=T
         
@@ -32,33 +264,36 @@ class option():
             self.marketPrice=marketPrice
             self.vol=self.IV()
             
-    def inpcheck(self, S0=None, K=None, vol=None, r=None, T=None, q=0):
+    #inputs not given are the option's own, the dividend yield included, so price,
+    #marketPrice and IV all see the same q
+    def inpcheck(self, S0=None, K=None, vol=None, r=None, T=None, q=None):
         if S0 is None: S0 = self.S0
         if K is None: K = self.K
         if vol is None: vol = self.vol
         if r is None: r = self.r
         if T is None: T = self.T
+        if q is None: q = self.q
         return S0, K, vol, r, T, q
     
-    def d1d2(self, S0=None, K=None, vol=None, r=None, T=None, q=0):
+    def d1d2(self, S0=None, K=None, vol=None, r=None, T=None, q=None):
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1 = (np.log(S0/K)+(r - q + vol**2/2)*T)/(vol*np.sqrt(T))
         d2 = d1-vol*np.sqrt(T)
         return d1, d2
     
-    def price(self, S0=None, K=None, vol=None, r=None, T=None, q=0):
+    def price(self, S0=None, K=None, vol=None, r=None, T=None, q=None):
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
         if self.otype == 'Call':
-            return S0*np.exp(-q*T)*stats.norm.cdf(d1)-K*np.exp(-r*T)*stats.norm.cdf(d2)
+            return S0*np.exp(-q*T)*ncdf(d1)-K*np.exp(-r*T)*ncdf(d2)
         elif self.otype == 'Put':
-            return K*np.exp(-r*T)*stats.norm.cdf(-d2) - S0*np.exp(-q*T)*stats.norm.cdf(-d1)
+            return K*np.exp(-r*T)*ncdf(-d2) - S0*np.exp(-q*T)*ncdf(-d1)
     
     def IV(self):
-        c = lambda x: (self.price(vol=x)-self.marketPrice)**2
-        x = 0.2
-        res = optimize.minimize(c, x)
-        return res.x[0]
+        vol, iterations, noSolution = impliedVol(self.marketPrice, self.otype, self.S0, self.K, self.r, self.T, self.q)
+        if noSolution:
+            print('No implied volatility matches market price ' + str(self.marketPrice))
+        return float(vol)
     
     #variables
     #V - option price (referred to as price in code)
@@ -70,133 +305,314 @@ class option():
     #T - time to expiration in years
     
     
-    def delta(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #dV/dS
+    def delta(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #dV/dS
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
         if self.otype == 'Call':
-            return np.exp(-q*T)*stats.norm.cdf(d1)
+            return np.exp(-q*T)*ncdf(d1)
         elif self.otype == 'Put':
-            return -np.exp(-q*T)*stats.norm.cdf(-d1)
+            return -np.exp(-q*T)*ncdf(-d1)
         
-    def vega(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #dV/dvol
+    def vega(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #dV/dvol
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
-        return np.exp(-q*T)*S0*np.sqrt(T)*stats.norm.pdf(d1)
+        return np.exp(-q*T)*S0*np.sqrt(T)*npdf(d1)
     
-    def theta(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #-dV/dT
+    def theta(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #-dV/dT
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
         if self.otype == 'Call':
-            return -(np.exp(-q*T)*S0*stats.norm.pdf(d1)*vol)/(2*np.sqrt(T)) - r*K*np.exp(-r*T)*stats.norm.cdf(d2) + q*S0*np.exp(-q*T)*stats.norm.cdf(d1) 
+            return -(np.exp(-q*T)*S0*npdf(d1)*vol)/(2*np.sqrt(T)) - r*K*np.exp(-r*T)*ncdf(d2) + q*S0*np.exp(-q*T)*ncdf(d1) 
         elif self.otype == 'Put':
-            return -(np.exp(-q*T)*S0*stats.norm.pdf(-d1)*vol)/(2*np.sqrt(T)) + r*K*np.exp(-r*T)*stats.norm.cdf(-d2) - q*S0*np.exp(-q*T)*stats.norm.cdf(-d1) 
+            return -(np.exp(-q*T)*S0*npdf(-d1)*vol)/(2*np.sqrt(T)) + r*K*np.exp(-r*T)*ncdf(-d2) - q*S0*np.exp(-q*T)*ncdf(-d1) 
     
-    def rho(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #dV.dr
+    def rho(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #dV.dr
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
         if self.otype == 'Call':
-            return K*T*np.exp(-r*T)*stats.norm.cdf(d2)
+            return K*T*np.exp(-r*T)*ncdf(d2)
         elif self.otype == 'Put':
-            return -K*T*np.exp(-r*T)*stats.norm.cdf(-d2)
+            return -K*T*np.exp(-r*T)*ncdf(-d2)
         
-    def omega(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #aka lambda - leverage = dV/dS * S/V
+    def omega(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #aka lambda - leverage = dV/dS * S/V
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         return self.delta(S0, K, vol, r, T, q) * (S0/self.price(S0, K, vol, r, T, q))
     
-    def gamma(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #d^2V/dS^2
+    def gamma(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #d^2V/dS^2
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
-        return np.exp(-q*T)*(stats.norm.pdf(d1)/(S0*vol*np.sqrt(T)))
+        return np.exp(-q*T)*(npdf(d1)/(S0*vol*np.sqrt(T)))
     
-    def vanna(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #d^2V/dSdvol
+    def vanna(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #d^2V/dSdvol
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
-        return -np.exp(-q*T)*stats.norm.pdf(d1)*d2/vol
+        return -np.exp(-q*T)*npdf(d1)*d2/vol
     
-    def charm(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #-d^2V/dTdS
+    def charm(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #-d^2V/dTdS
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
         if self.otype == 'Call':
-            return q*np.exp(-q*T)*stats.norm.cdf(d1) - np.exp(-q*T)*stats.norm.pdf(d1)*((2*(r-q)*T - d2*vol*np.sqrt(T))/(2*T*vol*np.sqrt(T)))
+            return q*np.exp(-q*T)*ncdf(d1) - np.exp(-q*T)*npdf(d1)*((2*(r-q)*T - d2*vol*np.sqrt(T))/(2*T*vol*np.sqrt(T)))
         elif self.otype == 'Put':
-            return -q*np.exp(-q*T)*stats.norm.cdf(-d1) - np.exp(-q*T)*stats.norm.pdf(d1)*((2*(r-q)*T - d2*vol*np.sqrt(T))/(2*T*vol*np.sqrt(T)))
+            return -q*np.exp(-q*T)*ncdf(-d1) - np.exp(-q*T)*npdf(d1)*((2*(r-q)*T - d2*vol*np.sqrt(T))/(2*T*vol*np.sqrt(T)))
     
-    def vomma(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #d^2V/dvol^2
+    def vomma(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #d^2V/dvol^2
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
-        return S0*np.exp(-q*T)*stats.norm.pdf(d1)*np.sqrt(T)*((d1*d2)/vol)
+        return S0*np.exp(-q*T)*npdf(d1)*np.sqrt(T)*((d1*d2)/vol)
     
-    def veta(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #d^2V/dvoldT
+    def veta(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #d^2V/dvoldT
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
-        return -S0*np.exp(-q*T)*stats.norm.pdf(d1)*np.sqrt(T)*(q+(((r-q)*d1)/(vol*np.sqrt(T)))-(1+d1*d2)/(2*T))
+        return -S0*np.exp(-q*T)*npdf(d1)*np.sqrt(T)*(q+(((r-q)*d1)/(vol*np.sqrt(T)))-(1+d1*d2)/(2*T))
     
-    def speed(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #d^3V/dS^3
+    def speed(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #d^3V/dS^3
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
-        return -np.exp(-q*T)*((stats.norm.pdf(d1))/(S0**2*vol*np.sqrt(T)))*(d1/(vol*np.sqrt(T))+1)
+        return -np.exp(-q*T)*((npdf(d1))/(S0**2*vol*np.sqrt(T)))*(d1/(vol*np.sqrt(T))+1)
     
-    def zomma(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #d^3V/dS^2dvol
+    def zomma(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #d^3V/dS^2dvol
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
-        return np.exp(-q*T)*((stats.norm.pdf(d1)*(d1*d2-1))/(S0*vol**2*np.sqrt(T)))
+        return np.exp(-q*T)*((npdf(d1)*(d1*d2-1))/(S0*vol**2*np.sqrt(T)))
     
-    def color(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #d^3V/dS^2dT
+    def color(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #d^3V/dS^2dT
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
-        return -np.exp(-q*T)*(stats.norm.pdf(d1)/(2*S0*T*vol*np.sqrt(T)))
+        return -np.exp(-q*T)*(npdf(d1)/(2*S0*T*vol*np.sqrt(T)))
     
-    def ultima(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #d^3V/dvol^3
+    def ultima(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #d^3V/dvol^3
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
         return (-self.vega(S0, K, vol, r, T, q)/vol**2)*(d1*d2*(1-d1*d2)+d1**2+d2**2)
     
-    def dualDelta(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #dV/dK
+    def dualDelta(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #dV/dK
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
         if self.otype == 'Call':
-            return -np.exp(-r*T)*stats.norm.cdf(d2)
+            return -np.exp(-r*T)*ncdf(d2)
         elif self.otype == 'Put':
-            return -np.exp(-r*T)*stats.norm.cdf(-d2)
+            return -np.exp(-r*T)*ncdf(-d2)
     
-    def dualGamma(self, S0=None, K=None, vol=None, r=None, T=None, q=0): #d^2V/dK^2
+    def dualGamma(self, S0=None, K=None, vol=None, r=None, T=None, q=None): #d^2V/dK^2
         S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
         d1, d2 = self.d1d2(S0, K, vol, r, T, q)
-        return np.exp(-r*T)*(stats.norm.pdf(d2)/(K*vol*np.sqrt(T)))
+        return np.exp(-r*T)*(npdf(d2)/(K*vol*np.sqrt(T)))
+    
+    #any subset of OUTPUTS from one fused evaluation, returned as {name: value}. with a
+    #surface (a volSurface.VolSurface) vol is read from surface.vol(K, T) instead, in
+    #the precision of K and T
+    def greeks(self, names=OUTPUTS, S0=None, K=None, vol=None, r=None, T=None, q=None, surface=None):
+        S0, K, vol, r, T, q = self.inpcheck(S0, K, vol, r, T, q)
+        if surface is not None: vol = surface.vol(K, T).astype(np.result_type(K, T), copy=False)
+        return greeks(names, self.otype, S0, K, vol, r, T, q)
+    
+    #the option's own inputs, as taken by greeks and the sweep engine
+    def inputs(self):
+        return {'S0':self.S0, 'K':self.K, 'vol':self.vol, 'r':self.r, 'T':self.T, 'q':self.q}
+    
+    #hashable snapshot of everything the option's values depend on
+    def key(self):
+        return (type(self).__name__, self.otype, self.ls, float(self.S0), float(self.K), float(self.vol),
+                float(self.r), float(self.T), float(self.q))
+    
+    #hashable name of the kernel pricing this option, legs of a Strategy sharing one are
+    #priced together by kernel(), a callable taking the arguments of greeks
+    def engine(self):
+        return ('European',)
+    
+    def kernel(self):
+        return greeks
     
     #toSweep dictionary with variables to sweep as key and value as (min, max, steps)
-    def sweep(self, toSweep, toGrab):
-        inps = {'S0':self.S0, 'K':self.K, 'vol':self.vol, 'r':self.r, 'T':self.T, 'q':self.q}
-        vectors = dict([(k, np.linspace(toSweep[k][0], toSweep[k][1], toSweep[k][2])) for k in toSweep])
-        scalars = dict([(k, inps[k]) for k in inps if k not in vectors])
-        if len(toSweep) == 1:
-            out = np.array(list(vectors.values()))
-        if len(toSweep) == 2:
-            out = np.meshgrid(list(vectors.values())[0], list(vectors.values())[1])
-        if len(toSweep) == 3:
-            out = np.meshgrid(list(vectors.values())[0], list(vectors.values())[1], list(vectors.values())[2])
-        grids = dict([(k, out[i]) for i, k in enumerate(vectors)])
-        combined = {**grids, **scalars}
-        
-        data = (combined['S0'], combined['K'], combined['vol'], combined['r'], combined['T'], combined['q'])
-        out = {}
-        
-        if 'price' in toGrab: out['price'] = self.price(*data)
-        if 'delta' in toGrab: out['delta'] = self.delta(*data)
-        if 'vega' in toGrab: out['vega'] = self.vega(*data)
-        if 'theta' in toGrab: out['theta'] = self.theta(*data)
-        if 'rho' in toGrab: out['rho'] = self.rho(*data)
-        if 'omega' in toGrab: out['omega'] = self.omega(*data)
-        if 'gamma' in toGrab: out['gamma'] = self.gamma(*data)
-        if 'vanna' in toGrab: out['vanna'] = self.vanna(*data)
-        if 'charm' in toGrab: out['charm'] = self.charm(*data)
-        if 'vomma' in toGrab: out['vomma'] = self.vomma(*data)
-        if 'veta' in toGrab: out['veta'] = self.veta(*data)
-        if 'speed' in toGrab: out['speed'] = self.speed(*data)
-        if 'zomma' in toGrab: out['zomma'] = self.zomma(*data)
-        if 'color' in toGrab: out['color'] = self.color(*data)
-        if 'ultima' in toGrab: out['ultima'] = self.ultima(*data)
-        if 'dualDelta' in toGrab: out['dualDelta'] = self.dualDelta(*data)
-        if 'dualGamma' in toGrab: out['dualGamma'] = self.dualGamma(*data)
-        
-        return {**combined, **out, **{'ls': self.ls}}
+    #or an array of values. any number of the inputs can be swept; returns a SweepResult
+    #with the axis names, 1-D coordinates and one array per output in toGrab. with a
+    #surface, vol follows surface.vol(K, T) at every grid point. dtype np.float32 runs
+    #the kernel and stores the outputs in single precision, half the memory and
+    #bandwidth of float64, for sweeps that are only looked at (see sweeps.FLOAT64_ONLY).
+    #workers other than 1 evaluates the grid on a process pool (all cores when None),
+    #with the same result, see sweeps.evaluateParallel
+    def sweepGrid(self, toSweep, toGrab, chunkSize=None, progress=None, surface=None, dtype=np.float64, workers=1):
+        axes = sweeps.sweepAxes(toSweep)
+        kernel, scalars = sweeps.withSurface(self.greeks, axes, self.inputs(), surface)
+        names = [k for k in OUTPUTS if k in toGrab]
+        data = sweeps.evaluate(kernel, axes, scalars, names, chunkSize=chunkSize, progress=progress, dtype=dtype,
+                               workers=workers)
+        return sweeps.SweepResult(axes, data, scalars, self.ls)
+    
+    #sweepGrid streamed block by block into .npy memmaps under path, for grids that do
+    #not fit in memory. returns the result reopened from disk
+    def sweepToDisk(self, toSweep, toGrab, path, chunkSize=None, memoryLimit=None, surface=None, dtype=np.float64):
+        axes = sweeps.sweepAxes(toSweep)
+        kernel, scalars = sweeps.withSurface(self.greeks, axes, self.inputs(), surface)
+        names = [k for k in OUTPUTS if k in toGrab]
+        return sweeps.sweepToDisk(kernel, axes, scalars, names, path, chunkSize, memoryLimit, self.ls, dtype)
+    
+    #same as sweepGrid but returned as a dict laid out like np.meshgrid (xy indexing),
+    #swept inputs come back as read-only broadcast views rather than dense copies
+    def sweep(self, toSweep, toGrab, surface=None, dtype=np.float64, workers=1):
+        res = self.sweepGrid(sweeps.meshgridOrder(toSweep), toGrab, surface=surface, dtype=dtype, workers=workers)
+        return dict([(k, res[k]) for k in res.keys()])
+
+
+#struct-of-arrays book of option legs, priced in one broadcasted pass of the greeks
+#kernel instead of one python call per leg. every field is a writable float64 array of
+#the book's own, always copied from the inputs, so a book never aliases its caller's data
+class OptionBook():
+    fields = ('S0', 'K', 'vol', 'r', 'T', 'q')
+
+    def __init__(self, otype, S0, K, vol, T, r=0.025, q=0, ls='Long', marketPrice=None, expDay=None, qty=1):
+        otype = np.char.title(np.atleast_1d(np.asarray(otype, dtype=str)))
+        ls = np.char.title(np.atleast_1d(np.asarray(ls, dtype=str)))
+        n = np.broadcast(otype, ls, *[np.atleast_1d(x) for x in (S0, K, vol, T, r, q, qty)]).shape[0]
+        self.isCall = np.array(np.broadcast_to(otype == 'Call', (n,)), dtype=bool)
+        self.sign = np.array(np.broadcast_to(np.where(ls == 'Short', -1.0, 1.0), (n,)), dtype=np.float64)
+        self.qty = np.array(np.broadcast_to(np.asarray(qty, dtype=np.float64), (n,)), dtype=np.float64)
+        for k, v in zip(self.fields, (S0, K, vol, r, T, q)):
+            setattr(self, k, np.array(np.broadcast_to(np.asarray(v, dtype=np.float64), (n,)), dtype=np.float64))
+        self.marketPrice = None if marketPrice is None else np.array(np.broadcast_to(np.asarray(marketPrice, dtype=np.float64), (n,)), dtype=np.float64)
+        self.expDay = None if expDay is None else list(np.broadcast_to(np.asarray(expDay, dtype=object), (n,)))
+
+    @classmethod
+    def fromOptions(cls, opts, qty=1):
+        return cls(otype=[o.otype for o in opts], ls=[o.ls for o in opts],
+                   S0=[o.S0 for o in opts], K=[o.K for o in opts], vol=[o.vol for o in opts],
+                   r=[o.r for o in opts], T=[o.T for o in opts], q=[o.q for o in opts],
+                   marketPrice=[o.marketPrice for o in opts],
+                   expDay=[getattr(o, 'expDayStr', None) for o in opts], qty=qty)
+
+    #an independent book with the same legs
+    def copy(self):
+        return OptionBook(self.otype, *[getattr(self, k) for k in ('S0', 'K', 'vol', 'T', 'r', 'q')], ls=self.ls,
+                          marketPrice=self.marketPrice, expDay=self.expDay, qty=self.qty)
+
+    def toOptions(self):
+        opts = []
+        for i in range(len(self)):
+            opt = option(otype='Call' if self.isCall[i] else 'Put', ls='Long' if self.sign[i] > 0 else 'Short',
+                         S0=self.S0[i], K=self.K[i], vol=self.vol[i], r=self.r[i], T=self.T[i], q=self.q[i])
+            if self.marketPrice is not None: opt.marketPrice = self.marketPrice[i]
+            if self.expDay is not None and self.expDay[i] is not None: opt.expDayStr = self.expDay[i]
+            opts.append(opt)
+        return opts
+
+    def __len__(self):
+        return self.S0.shape[0]
+
+    @property
+    def otype(self):
+        return np.where(self.isCall, 'Call', 'Put')
+
+    @property
+    def ls(self):
+        return np.where(self.sign > 0, 'Long', 'Short')
+
+    #unsigned per-leg values of each output in names
+    def evaluate(self, names=('price',)):
+        return greeks(names, self.isCall, self.S0, self.K, self.vol, self.r, self.T, self.q)
+
+    #long/short sign times quantity of every leg
+    @property
+    def weights(self):
+        return self.sign*self.qty
+
+    #per-leg values with long/short sign and quantity applied
+    def legs(self, names=('price',)):
+        out = self.evaluate(names)
+        weights = self.weights
+        for name in out:
+            out[name] *= weights
+        return out
+
+    #signed sum over all legs
+    def total(self, names=('price',)):
+        return dict([(name, v.sum()) for name, v in self.legs(names).items()])
+
+
+#multi-leg position built from options and quantities. every leg is priced in one
+#broadcasted pass with the legs along a leading axis, which is then collapsed by the
+#signed quantities, so sweeps return portfolio surfaces for any output, not just
+#price. the legs are snapshotted into an OptionBook when the strategy is built
+class Strategy():
+    ls = None
+
+    def __init__(self, legs, qty=1):
+        self.legs = list(legs)
+        self.book = OptionBook.fromOptions(self.legs, qty)
+        self.qty = self.book.qty
+        self.weights = self.book.weights
+        #(kernel, leg indices) per pricing engine among the legs, in order of first use
+        engines = {}
+        for i, leg in enumerate(self.legs):
+            engines.setdefault(leg.engine(), (leg.kernel(), []))[1].append(i)
+        self.groups = [(kernel, np.array(rows)) for kernel, rows in engines.values()]
+        self._key = ('Strategy',) + tuple((leg.key(), float(n)) for leg, n in zip(self.legs, self.qty))
+
+    def __len__(self):
+        return len(self.book)
+
+    #None for every input, greeks then takes each one from the legs themselves
+    def inputs(self):
+        return dict([(k, None) for k in OptionBook.fields])
+
+    def key(self):
+        return self._key
+
+    #signed sum over the legs of every output in names, each of the given shape.
+    #fn(kernel, rows) returns per-leg values for the leg indices rows (leading axis,
+    #the rest broadcasting to shape) from that engine's kernel. legs go through fn in
+    #groups of at most sweeps.CHUNK points each, bounding temporaries however many legs
+    #there are, and legs priced by different engines (e.g. european and american) in
+    #groups of their own. progress(done, total legs) is called after each group and may
+    #raise to stop
+    def aggregate(self, fn, names, shape, dtype=np.float64, progress=None):
+        step = max(1, sweeps.CHUNK//max(1, int(np.prod(shape))))
+        weights = self.weights.astype(dtype, copy=False)
+        out, done = {}, 0
+        for kernel, rows in self.groups:
+            for start in range(0, rows.size, step):
+                part = rows[start:start + step]
+                res = fn(kernel, part)
+                for name in names:
+                    value = np.tensordot(weights[part], np.broadcast_to(res[name], (part.size,) + shape), axes=1)
+                    out[name] = value if name not in out else out[name] + value
+                done += part.size
+                if progress is not None: progress(done, len(self))
+        return out
+
+    #aggregated outputs, inputs given here override that input on every leg and may be
+    #arrays (e.g. an open sweep grid). with a surface every leg's vol is read from
+    #surface.vol(K, T). the legs' own inputs are float32 when every given one is
+    #(float32 grids stay float32) and float64 otherwise, integer inputs included
+    def greeks(self, names=OUTPUTS, S0=None, K=None, vol=None, r=None, T=None, q=None, surface=None):
+        given = [x for x in (S0, K, vol, r, T, q) if x is not None]
+        shape = np.broadcast(*given).shape if given else ()
+        dtype = np.float32 if given and all(np.asarray(x).dtype == np.float32 for x in given) else np.float64
+        legShape = (-1,) + (1,)*len(shape)
+        def legs(kernel, part):
+            args = [getattr(self.book, k)[part].reshape(legShape).astype(dtype, copy=False) if x is None else x
+                    for k, x in zip(OptionBook.fields, (S0, K, vol, r, T, q))]
+            if surface is not None: args[2] = surface.vol(args[1], args[4]).astype(dtype, copy=False)
+            return kernel(names, self.book.isCall[part].reshape(legShape), *args)
+        return self.aggregate(legs, names, shape, dtype)
+
+    #same toSweep/toGrab/dtype/workers as option.sweepGrid, every output is the signed
+    #sum over legs. inputs that are not swept keep each leg's own value
+    def sweepGrid(self, toSweep, toGrab, chunkSize=None, progress=None, surface=None, dtype=np.float64, workers=1):
+        axes = sweeps.sweepAxes(toSweep)
+        kernel, scalars = sweeps.withSurface(self.greeks, axes, self.inputs(), surface)
+        names = [k for k in OUTPUTS if k in toGrab]
+        data = sweeps.evaluate(kernel, axes, scalars, names, chunkSize=chunkSize, progress=progress, dtype=dtype,
+                               workers=workers)
+        return sweeps.SweepResult(axes, data, scalars, self.ls)
+
+    def sweepToDisk(self, toSweep, toGrab, path, chunkSize=None, memoryLimit=None, surface=None, dtype=np.float64):
+        axes = sweeps.sweepAxes(toSweep)
+        kernel, scalars = sweeps.withSurface(self.greeks, axes, self.inputs(), surface)
+        names = [k for k in OUTPUTS if k in toGrab]
+        return sweeps.sweepToDisk(kernel, axes, scalars, names, path, chunkSize, memoryLimit, self.ls, dtype)
+
+    #meshgrid (xy) layout, like option.sweep
+    def sweep(self, toSweep, toGrab, surface=None, dtype=np.float64, workers=1):
+        res = self.sweepGrid(sweeps.meshgridOrder(toSweep), toGrab, surface=surface, dtype=dtype, workers=workers)
+        return dict([(k, res[k]) for k in res.keys()])
@@ -0,0 +1,132 @@
+import time
+
+import numpy as np
+
+import perf
+import sweeps
+from pricing import option, OptionBook, Strategy
+
+#shocks a scenario grid can apply to every leg: 'spot' is a relative spot move (0.05
+#is +5%), 'spotAbs' an absolute one, 'vol' a parallel shift in vol points (0.02 is +2
+#vols), 'time' the years that pass (theta decay) and 'rate' a shift of r
+SHOCKS = ('spot', 'spotAbs', 'vol', 'time', 'rate')
+
+#greeks the taylor mode is built from, taken once per leg at the unshocked inputs
+TAYLOR = ('delta', 'gamma', 'vega', 'vanna', 'vomma', 'theta', 'rho')
+
+#shocked vol and time to expiry are floored here, so a leg shocked through expiry is
+#worth its intrinsic value rather than nan
+MIN_VOL = 1e-6
+MIN_T = 1e-10
+
+#ordered [(kind, vector)] from {kind: (min, max, steps)} or {kind: array of shocks}
+def shockAxes(shocks):
+    axes = []
+    for k in shocks:
+        if k not in SHOCKS:
+            raise ValueError('Unknown shock ' + str(k) + ', must be one of ' + ', '.join(SHOCKS))
+        spec = shocks[k]
+        if isinstance(spec, tuple) and len(spec) == 3:
+            vec = np.linspace(spec[0], spec[1], int(spec[2]))
+        else:
+            vec = np.asarray(spec, dtype=np.float64).ravel()
+        axes.append((k, vec))
+    return axes
+
+#an option, a list of options or a Strategy, as a Strategy
+def asStrategy(target):
+    if isinstance(target, Strategy): return target
+    if isinstance(target, option): return Strategy([target])
+    return Strategy(target)
+
+#open grid of the shocks, each kind missing from axes is 0
+def _shockGrid(axes):
+    grid = dict([(k, 0.0) for k in SHOCKS])
+    for i, (k, vec) in enumerate(axes):
+        shape = [1]*len(axes)
+        shape[i] = vec.size
+        grid[k] = vec.reshape(shape)
+    return grid
+
+#per-leg inputs for rows of the book, legs along a leading axis, with the shocks applied
+def _shocked(book, rows, grid, ndim):
+    legShape = (-1,) + (1,)*ndim
+    S0, K, vol, r, T, q = [getattr(book, k)[rows].reshape(legShape) for k in OptionBook.fields]
+    S0 = S0*(1 + grid['spot']) + grid['spotAbs']
+    vol = np.maximum(vol + grid['vol'], MIN_VOL)
+    T = np.maximum(T - grid['time'], MIN_T)
+    return S0, K, vol, r + grid['rate'], T, q
+
+#value of the strategy today, every leg at its own inputs
+def baseValue(strategy):
+    book, value = strategy.book, 0.0
+    for kernel, rows in strategy.groups:
+        price = kernel(('price',), book.isCall[rows], *[getattr(book, k)[rows] for k in OptionBook.fields])['price']
+        value += strategy.weights[rows] @ price
+    return value
+
+#exact pnl cube: every leg re-priced by its own engine at every scenario, through
+#Strategy.aggregate
+def fullPnL(strategy, axes):
+    shape = tuple(vec.size for k, vec in axes)
+    grid = _shockGrid(axes)
+    book = strategy.book
+    legs = lambda kernel, part: kernel(('price',), book.isCall[part].reshape((-1,) + (1,)*len(shape)),
+                                       *_shocked(book, part, grid, len(shape)))
+    cube = strategy.aggregate(legs, ('price',), shape).get('price', np.zeros(shape))
+    return cube - baseValue(strategy)
+
+#second order taylor pnl cube from each leg's greeks at today's inputs: delta and gamma
+#in the spot move, vega and vomma in the vol shift, vanna across the two, theta for the
+#time that passes and rho for the rate shift. a relative spot shock moves each leg by
+#its own S0, so the legs are folded into portfolio coefficients of the relative and
+#absolute moves and the cube costs the same however many legs there are
+def taylorPnL(strategy, axes):
+    shape = tuple(vec.size for k, vec in axes)
+    book, weights = strategy.book, strategy.weights
+    g = dict([(name, np.empty(len(book))) for name in TAYLOR])
+    for kernel, rows in strategy.groups:
+        res = kernel(TAYLOR, book.isCall[rows], *[getattr(book, k)[rows] for k in OptionBook.fields])
+        for name in TAYLOR:
+            g[name][rows] = res[name]
+    S0 = book.S0
+    c = lambda *terms: weights @ np.prod(terms, axis=0)
+    grid = _shockGrid(axes)
+    a, b, dv = grid['spot'], grid['spotAbs'], grid['vol']
+    pnl = c(g['delta'], S0)*a + c(g['delta'])*b \
+        + 0.5*(c(g['gamma'], S0, S0)*a*a + 2*c(g['gamma'], S0)*a*b + c(g['gamma'])*b*b) \
+        + c(g['vega'])*dv + 0.5*c(g['vomma'])*dv*dv + (c(g['vanna'], S0)*a + c(g['vanna'])*b)*dv \
+        + c(g['theta'])*grid['time'] + c(g['rho'])*grid['rate']
+    return np.broadcast_to(pnl, shape).copy()
+
+MODES = {'full': fullPnL, 'taylor': taylorPnL}
+
+#pnl of target (an option, list of options or Strategy) over every combination of
+#shocks, {kind: (min, max, steps) or array}. mode is 'full' for exact revaluation or
+#'taylor' for the greeks approximation. returns a SweepResult with the shock axes, the
+#'pnl' cube and today's 'value'
+@perf.timed('scenarios.scenarios')
+def scenarios(target, shocks, mode='full'):
+    if mode not in MODES: raise ValueError('Unknown mode ' + str(mode) + ', must be full or taylor')
+    strategy = asStrategy(target)
+    axes = shockAxes(shocks)
+    return sweeps.SweepResult(axes, {'pnl': MODES[mode](strategy, axes)}, {'value': baseValue(strategy)})
+
+#both modes over the same shocks with the taylor mode's error against full revaluation:
+#{'full', 'taylor': SweepResults, 'seconds': per mode, 'error': taylor - full cube,
+#'maxAbs', 'rms', 'maxRel' (max abs error over the largest full pnl) and 'worst', the
+#shocks of the largest error}
+def compare(target, shocks):
+    strategy = asStrategy(target)
+    out = {'seconds': {}}
+    for mode in MODES:
+        t0 = time.perf_counter()
+        out[mode] = scenarios(strategy, shocks, mode)
+        out['seconds'][mode] = time.perf_counter() - t0
+    full, error = out['full']['pnl'], out['taylor']['pnl'] - out['full']['pnl']
+    worst = np.unravel_index(np.nanargmax(np.abs(error)), error.shape) if error.size else ()
+    scale = np.nanmax(np.abs(full)) if full.size else 0.0
+    out.update(error=error, maxAbs=np.nanmax(np.abs(error)), rms=np.sqrt(np.nanmean(error**2)),
+               maxRel=np.nanmax(np.abs(error))/scale if scale > 0 else 0.0,
+               worst=dict([(k, out['full'].coords[k][i]) for k, i in zip(out['full'].axes, worst)]))
+    return out
@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import sweeps
+from pricing import OUTPUTS
+
+#memoizes greeks and sweeps per output, keyed on the option's (or Strategy's) key()
+#plus the normalized sweep spec. entries are evicted least recently used first once the
+#cached arrays exceed maxBytes. an option whose inputs change gets a new key, so
+#stale results are never served; invalidate drops them eagerly. safe to share
+#between the GUI thread and workers, evaluation itself runs outside the lock
+class SweepCache():
+    def __init__(self, maxBytes=256 << 20):
+        self.maxBytes = maxBytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def optionKey(opt):
+        return opt.key()
+
+    def _get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def _put(self, key, value):
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        nbytes = getattr(value, 'nbytes', 8)
+        if nbytes > self.maxBytes: return
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= getattr(self._entries.pop(key), 'nbytes', 8)
+            self._entries[key] = value
+            self.bytes += nbytes
+            while self.bytes > self.maxBytes:
+                k, v = self._entries.popitem(last=False)
+                self.bytes -= getattr(v, 'nbytes', 8)
+                self.evictions += 1
+
+    #only the outputs missing from the cache are evaluated, in one fused pass
+    def _outputs(self, prefix, names, compute):
+        out = dict([(name, self._get(prefix + (name,))) for name in names])
+        missing = [name for name in names if out[name] is None]
+        if missing:
+            for name, value in compute(missing).items():
+                self._put(prefix + (name,), value)
+                out[name] = value
+        return out
+
+    #greeks at the option's own inputs, like opt.greeks(names, **opt.inputs())
+    def greeks(self, opt, names=OUTPUTS):
+        if isinstance(names, str): names = (names,)
+        return self._outputs((self.optionKey(opt), None), list(names),
+                             lambda missing: opt.greeks(missing, **opt.inputs()))
+
+    #sweeps with vol from a volatility surface are keyed on the surface too, and every
+    #sweep on the precision it was computed in
+    def sweepKey(self, opt, toSweep, surface=None, dtype=np.float64):
+        return (self.optionKey(opt), sweeps.specKey(toSweep), None if surface is None else surface.key(), np.dtype(dtype).str)
+
+    #workers only changes how a missing sweep is computed, not its key
+    def sweepGrid(self, opt, toSweep, toGrab, progress=None, surface=None, dtype=np.float64, workers=1):
+        axes = sweeps.sweepAxes(toSweep)
+        kernel, scalars = sweeps.withSurface(opt.greeks, axes, opt.inputs(), surface)
+        names = [k for k in OUTPUTS if k in toGrab]
+        data = self._outputs(self.sweepKey(opt, toSweep, surface, dtype), names,
+                             lambda missing: sweeps.evaluate(kernel, axes, scalars, missing, progress=progress, dtype=dtype,
+                                                             workers=workers))
+        return sweeps.SweepResult(axes, data, scalars, opt.ls)
+
+    #whether every output in toGrab is cached, without touching the hit statistics
+    def contains(self, opt, toSweep, toGrab, surface=None, dtype=np.float64):
+        prefix = self.sweepKey(opt, toSweep, surface, dtype)
+        with self._lock:
+            return all(prefix + (name,) in self._entries for name in OUTPUTS if name in toGrab)
+
+    #stores outputs computed elsewhere (e.g. progressively) for opt over toSweep
+    def store(self, opt, toSweep, data, surface=None, dtype=np.float64):
+        prefix = self.sweepKey(opt, toSweep, surface, dtype)
+        for name, value in data.items():
+            self._put(prefix + (name,), value)
+
+    #cached counterpart of option.sweep
+    def sweep(self, opt, toSweep, toGrab, progress=None, surface=None, dtype=np.float64, workers=1):
+        res = self.sweepGrid(opt, sweeps.meshgridOrder(toSweep), toGrab, progress, surface, dtype, workers)
+        return dict([(k, res[k]) for k in res.keys()])
+
+    #drops every entry computed for the option's current inputs
+    def invalidate(self, opt):
+        key = self.optionKey(opt)
+        with self._lock:
+            for k in [k for k in self._entries if k[0] == key]:
+                self.bytes -= getattr(self._entries.pop(k), 'nbytes', 8)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self._entries), 'bytes': self.bytes, 'maxBytes': self.maxBytes}
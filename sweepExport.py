@@ -0,0 +1,227 @@
+import os
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+
+import perf
+import sweeps
+from pricing import OUTPUTS
+
+#writes sweeps to HDF5, MAT v7.3 (HDF5 behind MATLAB's 512 byte header), compressed
+#NPZ or the .npy directory of sweeps.sweepToDisk, block by block: each block of at
+#most chunkSize points is written as soon as it is copied out of a stored sweep or
+#computed, so an export never holds a second copy of the sweep. every format carries
+#the axes (one vector per swept input), the inputs that were not swept and the outputs.
+#HDF5 and MAT are written with h5py, imported only when one of them is exported
+
+#format by file extension, .npy is a directory holding one .npy file per output
+FORMATS = {'.h5': 'hdf5', '.hdf5': 'hdf5', '.mat': 'mat', '.npz': 'npz', '.npy': 'npy'}
+
+#gzip level of the HDF5 and MAT datasets, deflate level of the NPZ members
+COMPRESSION = 4
+
+#numpy dtype names as MATLAB classes
+MATLAB_CLASSES = {'float64': 'double', 'float32': 'single'}
+
+def formatFor(path, fmt=None):
+    fmt = fmt or FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt not in FORMATS.values():
+        raise ValueError('Unknown export format for ' + str(path) + ', use one of ' + ', '.join(sorted(FORMATS)))
+    return fmt
+
+#MATLAB's MAT-file header: 116 bytes of text, 8 for the subsystem offset, the version
+#and the endian indicator, in the HDF5 user block
+def matHeader():
+    text = 'MATLAB 7.3 MAT-file, Platform: ' + os.name + ', Created on: ' + time.strftime('%a %b %d %H:%M:%S %Y') + \
+        ' HDF5 schema 1.00 .'
+    return text.ljust(116).encode('ascii') + b'\x00'*8 + b'\x00\x02IM'
+
+class _HDF5Writer():
+    sequential = False
+
+    #MATLAB reads HDF5 dimensions in reverse, so for mat every array is written
+    #transposed and MATLAB sees the shapes numpy does, vectors as rows
+    def __init__(self, path, axes, scalars, ls, names, dtype, mat=False):
+        try:
+            import h5py
+        except ImportError:
+            raise ImportError('HDF5 and MAT v7.3 export need h5py (pip install h5py)')
+        self.path = path
+        self.mat = mat
+        self.f = h5py.File(path, 'w', userblock_size=512 if mat else 0)
+        self.f.attrs['axes'] = [k for k, vec in axes]
+        if ls is not None: self.f.attrs['ls'] = ls
+        for k, vec in axes:
+            self._variable(k, vec.reshape(-1, 1) if mat else vec)
+        for k, v in scalars.items():
+            self._variable(k, np.full((1, 1) if mat else (), v, dtype=np.float64))
+        shape = tuple(vec.size for k, vec in axes)
+        self.datasets = {}
+        for name in names:
+            self.datasets[name] = self.f.create_dataset(name, shape[::-1] if mat else shape, dtype, chunks=True,
+                                                        compression='gzip', compression_opts=COMPRESSION, shuffle=True)
+            self._label(self.datasets[name])
+
+    def _label(self, dataset):
+        if self.mat: dataset.attrs['MATLAB_class'] = np.bytes_(MATLAB_CLASSES[dataset.dtype.name])
+
+    def _variable(self, name, value):
+        self._label(self.f.create_dataset(name, data=value))
+
+    def write(self, block, data):
+        for name, dataset in self.datasets.items():
+            if self.mat:
+                dataset[block[::-1]] = data[name].T
+            else:
+                dataset[block] = data[name]
+
+    def close(self):
+        self.f.close()
+        if self.mat:
+            with open(self.path, 'r+b') as f:
+                f.write(matHeader())
+
+class _NpyWriter():
+    sequential = False
+
+    def __init__(self, path, axes, scalars, ls, names, dtype):
+        os.makedirs(path, exist_ok=True)
+        self.meta = (path, axes, scalars, names, dtype, ls)
+        self.dtype = dtype
+        self.files = {}
+        shape = tuple(vec.size for k, vec in axes)
+        for name in names:
+            self.files[name] = sweeps.openNpy(path, name, shape, dtype)
+
+    def write(self, block, data):
+        for name, f in self.files.items():
+            f.write(np.ascontiguousarray(data[name], dtype=self.dtype).tobytes())
+
+    def close(self):
+        for f in self.files.values(): f.close()
+        sweeps.writeManifest(*self.meta)
+
+#a zip member can only be written while no other is open, so outputs go one after
+#another (begin/write per output) rather than all per block
+class _NpzWriter():
+    sequential = True
+
+    def __init__(self, path, axes, scalars, ls, names, dtype):
+        self.shape = tuple(vec.size for k, vec in axes)
+        self.dtype = dtype
+        self.zf = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=COMPRESSION)
+        self.member = None
+        self._array('axes', np.array([k for k, vec in axes]))
+        if ls is not None: self._array('ls', np.array(ls))
+        for k, vec in axes:
+            self._array(k, vec)
+        for k, v in scalars.items():
+            self._array(k, np.float64(v))
+
+    def _array(self, name, value):
+        with self.zf.open(name + '.npy', 'w') as f:
+            np.lib.format.write_array(f, np.asarray(value), allow_pickle=False)
+
+    def begin(self, name):
+        if self.member is not None: self.member.close()
+        self.member = self.zf.open(name + '.npy', 'w', force_zip64=True)
+        np.lib.format.write_array_header_1_0(self.member, {'descr': self.dtype.str, 'fortran_order': False,
+                                                           'shape': self.shape})
+
+    def write(self, block, data):
+        for value in data.values():
+            self.member.write(np.ascontiguousarray(value, dtype=self.dtype).tobytes())
+
+    def close(self):
+        if self.member is not None: self.member.close()
+        self.zf.close()
+
+def _writer(fmt, path, axes, scalars, ls, names, dtype):
+    if fmt == 'npz': return _NpzWriter(path, axes, scalars, ls, names, dtype)
+    if fmt == 'npy': return _NpyWriter(path, axes, scalars, ls, names, dtype)
+    return _HDF5Writer(path, axes, scalars, ls, names, dtype, mat=fmt == 'mat')
+
+#blocks of a stored sweep's outputs (in memory or memory-mapped), in C order
+def _storedBlocks(result, names, chunkSize):
+    for block in sweeps.chunks(result.shape, chunkSize):
+        yield block, dict([(name, np.broadcast_to(result[name], result.shape)[block]) for name in names])
+
+#blocks of a sweep evaluated as they are written, in C order
+def _computedBlocks(kernel, axes, scalars, names, chunkSize, dtype):
+    for block in sweeps.chunks(tuple(vec.size for k, vec in axes), chunkSize):
+        yield block, sweeps.evaluate(kernel, [(k, vec[s]) for (k, vec), s in zip(axes, block)], scalars, names,
+                                     chunkSize=chunkSize, dtype=dtype)
+
+#runs blocks(names) through the format's writer, one pass over every output or, for
+#sequential formats, one per output. progress(done, total) is called after each block
+#and may raise to stop the export, a partial file is then removed
+def _write(fmt, path, axes, scalars, ls, names, dtype, blocks, chunkSize, progress):
+    shape = tuple(vec.size for k, vec in axes)
+    scalars = dict([(k, v) for k, v in scalars.items() if k not in dict(axes) and v is not None])
+    writer = _writer(fmt, path, axes, scalars, ls, names, dtype)
+    passes = [[name] for name in names] if writer.sequential else [names]
+    total = len(passes)*sum(1 for block in sweeps.chunks(shape, chunkSize))
+    done = 0
+    try:
+        for part in passes:
+            if writer.sequential: writer.begin(part[0])
+            for block, data in blocks(part):
+                writer.write(block, data)
+                done += 1
+                if progress is not None: progress(done, total)
+        writer.close()
+    except BaseException:
+        try:
+            writer.close()
+        except Exception:
+            pass
+        _remove(fmt, path, names)
+        raise
+    return path
+
+def _remove(fmt, path, names):
+    if fmt != 'npy':
+        if os.path.exists(path): os.remove(path)
+        return
+    for fname in [name + '.npy' for name in names] + [sweeps.MANIFEST]:
+        if os.path.exists(os.path.join(path, fname)): os.remove(os.path.join(path, fname))
+
+#writes a SweepResult (e.g. from option.sweepGrid, or memory-mapped from sweepToDisk)
+#to path, in the format of its extension unless fmt is given. names defaults to every
+#output of the result. returns path
+@perf.timed('sweepExport.export')
+def export(result, path, fmt=None, names=None, chunkSize=None, progress=None):
+    fmt = formatFor(path, fmt)
+    names = [k for k in OUTPUTS if k in result.data] if names is None else [k for k in OUTPUTS if k in names]
+    dtype = np.dtype(np.result_type(*[result.data[name] for name in names])).newbyteorder('<')
+    axes = [(k, result.coords[k]) for k in result.axes]
+    chunkSize = chunkSize or sweeps.CHUNK
+    return _write(fmt, path, axes, result.scalars, result.ls, names, dtype,
+                  lambda part: _storedBlocks(result, part, chunkSize), chunkSize, progress)
+
+#evaluates target's (an option or Strategy) sweep over toSweep straight into path, the
+#same toSweep/toGrab/surface/dtype as option.sweepGrid: only one block of outputs is
+#ever in memory. NPZ takes its outputs one at a time, so with several the sweep is
+#first streamed into .npy files in a temporary directory next to path and compressed
+#from there rather than computed once per output. returns path
+@perf.timed('sweepExport.exportSweep')
+def exportSweep(target, toSweep, toGrab, path, fmt=None, surface=None, dtype=np.float64, chunkSize=None, progress=None):
+    fmt = formatFor(path, fmt)
+    axes = sweeps.sweepAxes(toSweep)
+    kernel, scalars = sweeps.withSurface(target.greeks, axes, target.inputs(), surface)
+    names = [k for k in OUTPUTS if k in toGrab]
+    dtype = np.dtype(dtype).newbyteorder('<')
+    chunkSize = chunkSize or sweeps.CHUNK
+    blocks = lambda part: _computedBlocks(kernel, axes, scalars, part, chunkSize, dtype)
+    if fmt == 'npz' and len(names) > 1:
+        #each of the two passes reports half of the progress
+        half = lambda first: None if progress is None else (lambda done, total: progress(done + (0 if first else total), 2*total))
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as spool:
+            _write('npy', spool, axes, scalars, target.ls, names, dtype, blocks, chunkSize, half(True))
+            stored = sweeps.loadSweep(spool)
+            export(stored, path, fmt, names, chunkSize, half(False))
+            del stored
+        return path
+    return _write(fmt, path, axes, scalars, target.ls, names, dtype, blocks, chunkSize, progress)
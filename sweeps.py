@@ -0,0 +1,337 @@
+import functools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import perf
+
+#inputs that can be swept, in the order the greeks kernels take them
+INPUTS = ('S0', 'K', 'vol', 'r', 'T', 'q')
+
+#default number of grid points evaluated per block, bounds kernel temporaries
+CHUNK = 1 << 16
+
+#rough count of float64 temporaries the greeks kernel keeps alive per grid point:
+#the shared terms (d1, d2, cdfs, pdfs, ...) plus two per requested output
+KERNEL_TEMPS = 12
+
+#outputs that lose too much in float32 arithmetic (omega divides by prices that
+#underflow out of the money), see benchmarks/precision.py. float32 sweeps compute them
+#in float64 and store them as float32 like the rest
+FLOAT64_ONLY = ('omega',)
+
+#shards per worker in a parallel sweep, so shards that price slower than others (short
+#expiries, american legs) even out over the pool
+SHARDS_PER_WORKER = 4
+
+MANIFEST = 'manifest.json'
+
+#ordered [(name, vector)] from {name: (min, max, steps)} or {name: array of values}
+def sweepAxes(toSweep):
+    axes = []
+    for k in toSweep:
+        if k not in INPUTS:
+            raise ValueError('Cannot sweep ' + str(k) + ', must be one of ' + ', '.join(INPUTS))
+        spec = toSweep[k]
+        if isinstance(spec, tuple) and len(spec) == 3:
+            vec = np.linspace(spec[0], spec[1], int(spec[2]))
+        else:
+            vec = np.asarray(spec, dtype=np.float64).ravel()
+        axes.append((k, vec))
+    return axes
+
+#toSweep reordered so sweepGrid lays the result out like np.meshgrid (xy indexing),
+#the layout option.sweep has always returned. the specs are passed on untouched, so an
+#array of three values stays three values rather than a (min, max, steps) range
+def meshgridOrder(toSweep):
+    keys = list(toSweep)
+    if len(keys) > 1: keys[0], keys[1] = keys[1], keys[0]
+    return dict([(k, toSweep[k]) for k in keys])
+
+#hashable form of a sweep spec, used as a cache key
+def specKey(toSweep):
+    key = []
+    for k, vec in sweepAxes(toSweep):
+        spec = toSweep[k]
+        if isinstance(spec, tuple) and len(spec) == 3:
+            key.append((k, float(spec[0]), float(spec[1]), int(spec[2])))
+        else:
+            key.append((k, vec.tobytes()))
+    return tuple(key)
+
+#open grid: every swept vector is reshaped to lie along its own axis so the inputs
+#broadcast against each other without materializing a meshgrid. with a dtype other
+#than float64 the vectors and (not None) scalars are cast to it, so the kernel runs in it
+def openGrid(axes, scalars, dtype=np.float64):
+    dtype = np.dtype(dtype)
+    inputs = dict(scalars)
+    if dtype != np.float64:
+        inputs = dict([(k, v if v is None else dtype.type(v)) for k, v in inputs.items()])
+    for i, (k, vec) in enumerate(axes):
+        shape = [1]*len(axes)
+        shape[i] = vec.size
+        inputs[k] = vec.reshape(shape).astype(dtype, copy=False)
+    return inputs
+
+#[(names, dtype)] kernel passes for a sweep stored in dtype, FLOAT64_ONLY outputs get a
+#float64 pass of their own
+def precisionPasses(names, dtype=np.float64):
+    dtype = np.dtype(dtype)
+    if dtype == np.float64: return [(list(names), dtype)]
+    passes = [([n for n in names if n not in FLOAT64_ONLY], dtype), ([n for n in names if n in FLOAT64_ONLY], np.dtype(np.float64))]
+    return [(group, d) for group, d in passes if group]
+
+#kernel and scalars for a sweep whose vol comes from surface.vol(K, T): the kernel gets
+#the surface as a keyword and the vol scalar is dropped, since it no longer applies
+def withSurface(kernel, axes, scalars, surface):
+    if surface is None:
+        return kernel, scalars
+    if 'vol' in dict(axes):
+        raise ValueError('Cannot sweep vol when it is read from a volatility surface')
+    return functools.partial(kernel, surface=surface), dict(scalars, vol=None)
+
+#splits a grid of the given shape into blocks of at most maxElements points, each a
+#tuple of slices. blocks come in C order, so each one is a contiguous run of the
+#flattened grid
+def chunks(shape, maxElements=CHUNK):
+    inner, split = 1, len(shape)
+    while split > 0 and inner*shape[split-1] <= maxElements:
+        split -= 1
+        inner *= shape[split]
+    if split == 0:
+        yield tuple(slice(None) for n in shape)
+        return
+    split -= 1
+    step = max(1, maxElements//inner)
+    for idx in np.ndindex(*shape[:split]):
+        for start in range(0, shape[split], step):
+            yield tuple(slice(i, i+1) for i in idx) + (slice(start, min(start+step, shape[split])),) \
+                + tuple(slice(None) for n in shape[split+1:])
+
+#evaluates the given blocks of the grid into out, returns the number of points
+def evaluateBlocks(kernel, axes, scalars, names, out, blocks, dtype=np.float64, progress=None, total=None):
+    done = 0
+    for block in blocks:
+        sub = [(k, vec[s]) for (k, vec), s in zip(axes, block)]
+        for group, precision in precisionPasses(names, dtype):
+            grid = openGrid(sub, scalars, precision)
+            res = kernel(group, *[grid[k] for k in INPUTS])
+            for name in group:
+                out[name][block] = res[name]
+        done += int(np.prod([vec.size for k, vec in sub]))
+        if progress is not None:
+            progress(done, total)
+    return done
+
+#evaluates kernel(names, S0, K, vol, r, T, q) over the grid block by block into out,
+#a dict of preallocated arrays (allocated here in dtype when not given). progress(done,
+#total) is called with grid point counts after every block and may raise to abort.
+#dtype float32 runs the kernel in float32 too, apart from FLOAT64_ONLY outputs.
+#workers other than 1 shards the grid over a process pool (all cores when None), see
+#evaluateParallel
+@perf.timed('sweeps.evaluate')
+def evaluate(kernel, axes, scalars, names, out=None, chunkSize=None, progress=None, dtype=np.float64, workers=1):
+    shape = tuple(vec.size for k, vec in axes)
+    if workers != 1 and out is None:
+        return evaluateParallel(kernel, axes, scalars, names, workers, chunkSize, progress, dtype)
+    if out is None:
+        out = dict([(name, np.empty(shape, dtype=dtype)) for name in names])
+    evaluateBlocks(kernel, axes, scalars, names, out, chunks(shape, chunkSize or CHUNK), dtype, progress,
+                   int(np.prod(shape)))
+    return out
+
+#one shard of evaluateParallel, run in a worker: attaches to the shared output buffers
+#and evaluates its blocks straight into them
+def _evaluateShard(kernel, axes, scalars, names, buffers, shape, dtype, blocks):
+    shared = [shared_memory.SharedMemory(name=b) for b in buffers]
+    try:
+        out = dict([(name, np.ndarray(shape, dtype=dtype, buffer=shm.buf)) for name, shm in zip(names, shared)])
+        done = evaluateBlocks(kernel, axes, scalars, names, out, blocks, dtype)
+        #the views must go before the buffers can be closed
+        del out
+        return done
+    finally:
+        for shm in shared: shm.close()
+
+#evaluate over a process pool. the grid's blocks (the same ones evaluate uses, so the
+#result is identical to the serial sweep) are split into runs of consecutive blocks,
+#i.e. slabs along the outermost axis the blocks divide, SHARDS_PER_WORKER per worker.
+#workers write into one multiprocessing.shared_memory buffer per output, so no result
+#array is pickled, and each output is copied out and its buffer released in turn.
+#progress is called as shards finish. the kernel (e.g. a bound option.greeks) has to
+#be picklable. falls back to evaluate for a single worker or a grid of one block
+@perf.timed('sweeps.evaluateParallel')
+def evaluateParallel(kernel, axes, scalars, names, workers=None, chunkSize=None, progress=None, dtype=np.float64):
+    dtype = np.dtype(dtype)
+    shape = tuple(vec.size for k, vec in axes)
+    blocks = list(chunks(shape, chunkSize or CHUNK))
+    workers = min((os.cpu_count() or 1) if workers is None else workers, len(blocks))
+    if workers <= 1:
+        return evaluate(kernel, axes, scalars, names, chunkSize=chunkSize, progress=progress, dtype=dtype)
+    total = int(np.prod(shape))
+    shards = [list(part) for part in np.array_split(np.arange(len(blocks)), min(len(blocks), workers*SHARDS_PER_WORKER))]
+    shared = dict([(name, shared_memory.SharedMemory(create=True, size=max(1, total*dtype.itemsize))) for name in names])
+    try:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = [pool.submit(_evaluateShard, kernel, axes, scalars, names, [shared[name].name for name in names],
+                                   shape, dtype.str, [blocks[i] for i in shard]) for shard in shards]
+            done = 0
+            for future in as_completed(futures):
+                done += future.result()
+                if progress is not None:
+                    progress(done, total)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        out = {}
+        for name in names:
+            out[name] = np.ndarray(shape, dtype=dtype, buffer=shared[name].buf).copy()
+            shm = shared.pop(name)
+            shm.close()
+            shm.unlink()
+        return out
+    finally:
+        for shm in shared.values():
+            shm.close()
+            shm.unlink()
+
+#per-axis index sets for coarse-to-fine refinement of an axis with n points. each
+#level halves the stride of the one before and keeps the last index, so every level
+#contains all the nodes of the earlier ones
+def refineLevels(n, coarse=16):
+    stride = 1
+    while (n - 1)//stride + 1 > coarse: stride *= 2
+    levels = []
+    while True:
+        idx = np.arange(0, n, stride)
+        if idx[-1] != n - 1: idx = np.append(idx, n - 1)
+        levels.append(idx)
+        if stride == 1: return levels
+        stride //= 2
+
+#evaluates the grid coarse to fine, yielding (index, out) after every stage: index
+#holds the per-axis indices of the nodes computed so far and out the full-resolution
+#outputs, valid at those nodes. each stage only evaluates nodes new to it. progress,
+#when given, is called as progress(done, stages) after every block, done counting the
+#stages finished in fractions, so a caller can stop (raise) in the middle of a stage
+def refineStages(kernel, axes, scalars, names, coarse=16, dtype=np.float64, progress=None):
+    shape = tuple(vec.size for k, vec in axes)
+    out = dict([(name, np.full(shape, np.nan, dtype=dtype)) for name in names])
+    if not axes:
+        yield (), evaluate(kernel, axes, scalars, names, out=out, progress=progress, dtype=dtype)
+        return
+    levels = [refineLevels(vec.size, coarse) for k, vec in axes]
+    nStages = max(len(l) for l in levels)
+    levels = [[l[0]]*(nStages - len(l)) + l for l in levels]
+    prev = [np.array([], dtype=np.intp) for a in axes]
+    for s in range(nStages):
+        cur = [l[s] for l in levels]
+        #nodes whose first index outside the previous level is on axis a
+        for a in range(len(axes)):
+            parts = prev[:a] + [np.setdiff1d(cur[a], prev[a])] + cur[a+1:]
+            if any(p.size == 0 for p in parts): continue
+            step = None if progress is None else \
+                (lambda done, total, s=s, a=a: progress(s + (a + done/total)/len(axes), nStages))
+            res = evaluate(kernel, [(k, vec[p]) for (k, vec), p in zip(axes, parts)], scalars, names, progress=step,
+                           dtype=dtype)
+            for name in names:
+                out[name][np.ix_(*parts)] = res[name]
+        prev = cur
+        yield tuple(cur), out
+
+#largest block that keeps kernel temporaries for names under memoryLimit bytes
+def chunkForMemory(memoryLimit, names, itemsize=8):
+    return max(1, int(memoryLimit//(itemsize*(KERNEL_TEMPS + 2*len(names)))))
+
+#new .npy file for an output of shape, its header written and the data preallocated.
+#returns the file positioned at the data, to be written in C order
+def openNpy(path, name, shape, dtype):
+    f = open(os.path.join(path, name + '.npy'), 'wb')
+    np.lib.format.write_array_header_1_0(f, {'descr': dtype.str, 'fortran_order': False, 'shape': shape})
+    f.truncate(f.tell() + dtype.itemsize*int(np.prod(shape)))
+    return f
+
+#the manifest loadSweep reads back the axes, scalars and outputs of a .npy directory from
+def writeManifest(path, axes, scalars, names, dtype, ls=None):
+    manifest = {
+        'shape': [vec.size for k, vec in axes],
+        'axes': [{'name': k, 'values': vec.tolist()} for k, vec in axes],
+        'scalars': dict([(k, float(v)) for k, v in scalars.items() if k not in dict(axes) and v is not None]),
+        'outputs': dict([(name, name + '.npy') for name in names]),
+        'dtype': np.dtype(dtype).name,
+        'ls': ls,
+    }
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+#streams the sweep into one preallocated .npy file per output under path, with a
+#manifest describing the axes. blocks come in C order, so each one is appended to the
+#files as it is computed and only one block of outputs and temporaries is ever held
+#in memory. memoryLimit (bytes) caps the block size on top of chunkSize. dtype is
+#float64 or float32, for both the arithmetic and the files
+@perf.timed('sweeps.sweepToDisk')
+def sweepToDisk(kernel, axes, scalars, names, path, chunkSize=None, memoryLimit=None, ls=None, dtype=np.float64):
+    os.makedirs(path, exist_ok=True)
+    dtype = np.dtype(dtype).newbyteorder('<')
+    shape = tuple(vec.size for k, vec in axes)
+    chunkSize = chunkSize or CHUNK
+    if memoryLimit is not None:
+        chunkSize = min(chunkSize, chunkForMemory(memoryLimit, names, dtype.itemsize))
+    files = {}
+    try:
+        for name in names:
+            files[name] = openNpy(path, name, shape, dtype)
+        for block in chunks(shape, chunkSize):
+            res = evaluate(kernel, [(k, vec[s]) for (k, vec), s in zip(axes, block)], scalars, names, chunkSize=chunkSize,
+                           dtype=dtype)
+            for name in names:
+                files[name].write(np.ascontiguousarray(res[name], dtype=dtype).tobytes())
+    finally:
+        for f in files.values(): f.close()
+    writeManifest(path, axes, scalars, names, dtype, ls)
+    return loadSweep(path)
+
+#reopens a sweep written by sweepToDisk, outputs are memory-mapped read-only
+def loadSweep(path, mmapMode='r'):
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    axes = [(a['name'], np.asarray(a['values'], dtype=np.float64)) for a in manifest['axes']]
+    data = dict([(name, np.load(os.path.join(path, fname), mmap_mode=mmapMode)) for name, fname in manifest['outputs'].items()])
+    return SweepResult(axes, data, manifest['scalars'], manifest['ls'])
+
+#labelled sweep output: axis names, their 1-D coordinate vectors and one array per
+#requested output. indexing by an input name gives a broadcast (zero-copy) grid.
+#scalars that are None (per-leg inputs of a Strategy) are left out
+class SweepResult():
+    def __init__(self, axes, data, scalars, ls=None):
+        self.axes = tuple(k for k, vec in axes)
+        self.coords = dict(axes)
+        self.data = data
+        self.scalars = dict([(k, v) for k, v in scalars.items() if k not in self.coords and v is not None])
+        self.ls = ls
+
+    @property
+    def shape(self):
+        return tuple(self.coords[k].size for k in self.axes)
+
+    def grid(self, name):
+        i = self.axes.index(name)
+        shape = [1]*len(self.axes)
+        shape[i] = self.coords[name].size
+        return np.broadcast_to(self.coords[name].reshape(shape), self.shape)
+
+    def __getitem__(self, key):
+        if key in self.data: return self.data[key]
+        if key in self.coords: return self.grid(key)
+        if key in self.scalars: return self.scalars[key]
+        if key == 'ls': return self.ls
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.data or key in self.coords or key in self.scalars or key == 'ls'
+
+    def keys(self):
+        return list(self.coords) + list(self.scalars) + list(self.data) + ['ls']
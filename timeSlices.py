@@ -0,0 +1,62 @@
+import numpy as np
+
+import perf
+import sweeps
+from pricing import OptionBook
+from scenarios import asStrategy
+
+#value of a strategy over spot at several points in its life, time being one more
+#broadcast axis: every slice of every leg goes through its engine's kernel in one pass
+#over the legs, and slices at or past a leg's expiry take its intrinsic value in closed
+#form instead of the kernel at a tiny T. the options themselves are never modified
+
+#max(S - K, 0) for calls and max(K - S, 0) for puts
+def intrinsic(isCall, S0, K):
+    return np.maximum(np.where(isCall, S0 - K, K - S0), 0)
+
+#(min, max, steps) or an array of spots, as a vector
+def _vector(spec):
+    if isinstance(spec, tuple) and len(spec) == 3:
+        return np.linspace(spec[0], spec[1], int(spec[2]))
+    return np.asarray(spec, dtype=np.float64).ravel()
+
+#signed price of the strategy, (slices, spots), for every leg's time to expiry T (legs,
+#slices). leg/slice pairs with T > 0 are priced by the kernel on a (pairs, spots) grid,
+#the rest are intrinsic. legs are summed by Strategy.aggregate, which calls progress
+def sliceValues(strategy, S0, T, progress=None):
+    book = strategy.book
+    shape = (T.shape[1], S0.size)
+    def legs(kernel, part):
+        isCall, K = book.isCall[part], book.K[part]
+        price = np.empty((part.size,) + shape)
+        price[...] = intrinsic(isCall[:, None, None], S0, K[:, None, None])
+        leg, slc = np.nonzero(T[part] > 0)
+        if leg.size:
+            args = [getattr(book, k)[part][leg][:, None] for k in OptionBook.fields]
+            args[0], args[4] = S0, T[part][leg, slc][:, None]
+            price[leg, slc] = kernel(('price',), isCall[leg][:, None], *args)['price']
+        return {'price': price}
+    return strategy.aggregate(legs, ('price',), shape, progress=progress).get('price', np.zeros(shape))
+
+#value of target (an option, list of options or Strategy) over the spots S0, (min, max,
+#steps) or an array, at several times: remaining is the fraction of each leg's own time
+#to expiry left (1 is now, 0 expiration, default 3 slices: now, half time, expiration)
+#and elapsed instead gives the years that pass, the same for every leg. slices is a
+#shorthand for remaining evenly spaced from 1 down to 0, progress is sliceValues'.
+#returns a SweepResult with the time axis ('remaining' or 'elapsed') and 'S0', and the
+#strategy's signed 'price'
+@perf.timed('timeSlices.timeSlices')
+def timeSlices(target, S0, remaining=None, elapsed=None, slices=3, progress=None):
+    if remaining is not None and elapsed is not None:
+        raise ValueError('Give remaining or elapsed, not both')
+    strategy = asStrategy(target)
+    S0 = _vector(S0)
+    T = strategy.book.T.astype(np.float64)[:, None]
+    if elapsed is not None:
+        axis = ('elapsed', _vector(elapsed))
+        legT = T - axis[1]
+    else:
+        axis = ('remaining', np.linspace(1, 0, int(slices)) if remaining is None else _vector(remaining))
+        legT = T*axis[1]
+    price = sliceValues(strategy, S0, np.maximum(legT, 0), progress)
+    return sweeps.SweepResult([axis, ('S0', S0)], {'price': price}, {})
@@ -0,0 +1,55 @@
+import numpy as np
+
+import perf
+
+#exchange holidays and numpy business-day calendars, loaded once per exchange
+_busdaycals = {}
+
+def busdaycalendar(name='NYSE'):
+    if name not in _busdaycals:
+        import pandas_market_calendars as mcal
+        holidays = np.asarray(mcal.get_calendar(name).holidays().holidays, dtype='datetime64[D]')
+        _busdaycals[name] = np.busdaycalendar(holidays=holidays)
+    return _busdaycals[name]
+
+#converts expiries to years to expiration. daysInYear and offset are the day count
+#convention: T = (business days from the valuation date to expiry + offset)/daysInYear
+class TradingCalendar():
+    def __init__(self, name='NYSE', daysInYear=252, offset=1):
+        self.name = name
+        self.daysInYear = daysInYear
+        self.offset = offset
+        self._counts = {}
+
+    #business days from today (or the valuation date) to each expiry, cached per pair
+    @perf.timed('tradingCalendar.busdays')
+    def busdays(self, expiry, today=None):
+        today = np.datetime64('today', 'D') if today is None else np.datetime64(today, 'D')
+        if np.ndim(expiry) == 0:
+            key = (today, np.datetime64(expiry, 'D').item())
+            if key not in self._counts:
+                self._counts[key] = int(np.busday_count(today, key[1], busdaycal=busdaycalendar(self.name)))
+            return self._counts[key]
+        expiry = np.asarray(expiry, dtype='datetime64[D]')
+        unique, inverse = np.unique(expiry.ravel(), return_inverse=True)
+        keys = [(today, d) for d in unique.tolist()]
+        missing = [i for i, k in enumerate(keys) if k not in self._counts]
+        if missing:
+            counts = np.busday_count(today, unique[missing], busdaycal=busdaycalendar(self.name))
+            self._counts.update(zip([keys[i] for i in missing], counts.tolist()))
+        counts = np.array([self._counts[k] for k in keys], dtype=np.int64)
+        return counts[inverse].reshape(expiry.shape)
+
+    def yearFraction(self, expiry, today=None, daysInYear=None, offset=None):
+        daysInYear = self.daysInYear if daysInYear is None else daysInYear
+        offset = self.offset if offset is None else offset
+        return (self.busdays(expiry, today)+offset)/daysInYear
+
+    def clear(self):
+        self._counts.clear()
+
+#shared instance used by pricing and volSurfacePlot
+nyse = TradingCalendar('NYSE')
+
+def yearFraction(expiry, today=None, daysInYear=None, offset=None):
+    return nyse.yearFraction(expiry, today, daysInYear, offset)
@@ -0,0 +1,101 @@
+import itertools
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+import perf
+
+#raised inside a job's progress callback once the job has been superseded
+class Cancelled(Exception):
+    pass
+
+class JobSignals(QObject):
+    progress = pyqtSignal(str, int, int)
+    partial = pyqtSignal(str, int, object)
+    finished = pyqtSignal(str, int, object)
+    failed = pyqtSignal(str, int, str)
+
+#runs fn(progress) on a pool thread. fn reports progress(done, total) as it goes,
+#optionally with an intermediate result to show, and the call raises Cancelled when
+#the job has been cancelled so it stops at the next block
+class Job(QRunnable):
+    def __init__(self, channel, jobId, fn, signals):
+        super(Job, self).__init__()
+        self.channel = channel
+        self.jobId = jobId
+        self.fn = fn
+        self.signals = signals
+        self.cancelled = False
+
+    def progress(self, done, total, partial=None):
+        if self.cancelled: raise Cancelled()
+        self.signals.progress.emit(self.channel, self.jobId, int(100*done/max(total, 1)))
+        if partial is not None: self.signals.partial.emit(self.channel, self.jobId, partial)
+
+    #recorded per channel kind, e.g. every 'add<n>' job as uiWorkers.job add
+    def run(self):
+        try:
+            with perf.span('uiWorkers.job ' + self.channel.rstrip('0123456789')):
+                result = self.fn(self.progress)
+        except Cancelled:
+            return
+        except Exception as e:
+            if not self.cancelled: self.signals.failed.emit(self.channel, self.jobId, str(e))
+            return
+        if not self.cancelled: self.signals.finished.emit(self.channel, self.jobId, result)
+
+#keeps at most one live job per channel: submitting cancels the channel's previous
+#job, and results or progress from superseded jobs are dropped before reaching the GUI.
+#a cancelled job only stops at its next progress call, work between calls runs to the
+#end, so long jobs call progress from inside their loops
+class JobRunner(QObject):
+    progress = pyqtSignal(str, int)
+
+    def __init__(self, pool=None, parent=None):
+        super(JobRunner, self).__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self.signals = JobSignals()
+        self.signals.progress.connect(self._onProgress)
+        self.signals.partial.connect(self._onPartial)
+        self.signals.finished.connect(self._onFinished)
+        self.signals.failed.connect(self._onFailed)
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._handlers = {}
+
+    def submit(self, channel, fn, onResult, onError=None, onPartial=None):
+        self.cancel(channel)
+        job = Job(channel, next(self._ids), fn, self.signals)
+        self._jobs[channel] = job
+        self._handlers[channel] = (onResult, onError, onPartial)
+        self.pool.start(job)
+        return job.jobId
+
+    def cancel(self, channel):
+        job = self._jobs.pop(channel, None)
+        if job is not None: job.cancelled = True
+
+    def busy(self, channel=None):
+        return bool(self._jobs) if channel is None else channel in self._jobs
+
+    def _current(self, channel, jobId):
+        job = self._jobs.get(channel)
+        return job is not None and job.jobId == jobId
+
+    def _onProgress(self, channel, jobId, percent):
+        if self._current(channel, jobId): self.progress.emit(channel, percent)
+
+    def _onPartial(self, channel, jobId, partial):
+        if self._current(channel, jobId) and self._handlers[channel][2] is not None:
+            self._handlers[channel][2](partial)
+
+    def _onFinished(self, channel, jobId, result):
+        if not self._current(channel, jobId): return
+        del self._jobs[channel]
+        self.progress.emit(channel, 100)
+        self._handlers[channel][0](result)
+
+    def _onFailed(self, channel, jobId, message):
+        if not self._current(channel, jobId): return
+        del self._jobs[channel]
+        self.progress.emit(channel, 100)
+        if self._handlers[channel][1] is not None: self._handlers[channel][1](message)
@@ -0,0 +1,163 @@
+import hashlib
+
+import numpy as np
+
+import perf
+import tradingCalendar
+
+METHODS = ('linear', 'svi')
+
+#raw SVI total variance w(k) = a + b*(rho*(k - m) + sqrt((k - m)**2 + sigma**2))
+def sviVariance(k, a, b, rho, m, sigma):
+    return a + b*(rho*(k - m) + np.sqrt((k - m)**2 + sigma**2))
+
+#derivatives of sviVariance with respect to (a, b, rho, m, sigma), stacked last
+def sviJacobian(k, a, b, rho, m, sigma):
+    d = k - m
+    root = np.sqrt(d*d + sigma**2)
+    return np.stack([np.ones_like(k), rho*d + root, b*d, -b*(rho + d/root), b*sigma/root], axis=-1)
+
+#raw SVI fit of every expiry at once, by a batched Levenberg-Marquardt on the total
+#variances w at log-moneyness k. rows are expiries padded to a common length, mask marks
+#the real points. steps are clipped to the parameter bounds (b >= 0, |rho| < 1, sigma > 0,
+#m within a width of the quotes), each row keeps its own damping and stops once its cost
+#stops improving. rows with fewer points than parameters get a flat smile at their mean.
+#returns an (expiries, 5) array of (a, b, rho, m, sigma)
+def fitSVI(k, w, mask, maxIter=300, tol=1e-12):
+    n = k.shape[0]
+    rows = np.arange(n)
+    kMin = np.where(mask, k, np.inf).min(1)
+    kMax = np.where(mask, k, -np.inf).max(1)
+    width = np.maximum(kMax - kMin, 1e-4)
+    wMasked = np.where(mask, w, np.inf)
+    p = np.column_stack([np.maximum(wMasked.min(1), 1e-8), np.full(n, 0.1), np.full(n, -0.5),
+                         k[rows, np.argmin(wMasked, 1)], 0.1*width])
+    lower = np.column_stack([np.full(n, -np.inf), np.zeros(n), np.full(n, -0.999), kMin - width, np.full(n, 1e-6)])
+    upper = np.column_stack([np.full(n, np.inf), np.full(n, np.inf), np.full(n, 0.999), kMax + width, 10*width])
+    residual = lambda p: np.where(mask, sviVariance(k, *p.T[..., None]) - w, 0.0)
+    r = residual(p)
+    cost = (r*r).sum(1)
+    damping = np.full(n, 1e-3)
+    active = mask.sum(1) >= 5
+    for i in range(maxIter):
+        if not active.any(): break
+        J = sviJacobian(k, *p.T[..., None])*mask[..., None]
+        JTJ = np.einsum('nij,nik->njk', J, J)
+        scale = np.maximum(np.diagonal(JTJ, axis1=1, axis2=2), 1e-12)
+        A = JTJ + damping[:, None, None]*np.eye(5)*scale[:, None, :]
+        step = np.linalg.solve(A, -np.einsum('nij,ni->nj', J, r)[..., None])[..., 0]
+        trial = np.clip(p + step, lower, upper)
+        rTrial = residual(trial)
+        cTrial = (rTrial*rTrial).sum(1)
+        better = active & (cTrial < cost)
+        converged = better & (cost - cTrial <= tol*cost)
+        p = np.where(better[:, None], trial, p)
+        r = np.where(better[:, None], rTrial, r)
+        cost = np.where(better, cTrial, cost)
+        damping = np.where(active, np.where(better, damping/3, damping*4), damping)
+        active &= ~converged & (damping < 1e10)
+    flat = mask.sum(1) < 5
+    if flat.any():
+        p[flat] = np.column_stack([np.where(mask, w, 0).sum(1)/np.maximum(mask.sum(1), 1), np.zeros(n), np.zeros(n),
+                                   np.zeros(n), np.full(n, 0.1)])[flat]
+    return p
+
+#implied volatility surface fitted once from quotes at (T, K) and queried with vol(K, T)
+#for any broadcastable K and T. method 'linear' keeps the Delaunay triangulation of the
+#quotes (what make_surf got from griddata) with nearest-quote fill outside their hull.
+#'svi' fits a raw SVI smile per expiry in log-moneyness to the forward, which needs spot,
+#and interpolates total variance linearly in T at fixed moneyness, holding the vol of
+#the first/last expiry outside them. it is smooth in strike and cheaper to query, but
+#assumes the quotes of each expiry share one T
+class VolSurface():
+    def __init__(self, T, K, vol, method='linear', spot=None, r=0, q=0):
+        if method not in METHODS:
+            raise ValueError('method must be one of ' + ', '.join(METHODS))
+        T, K, vol = [np.asarray(x, dtype=np.float64).ravel() for x in (T, K, vol)]
+        keep = np.isfinite(T) & np.isfinite(K) & np.isfinite(vol) & (T > 0) & (vol > 0)
+        self.T, self.K, self.volData = T[keep], K[keep], vol[keep]
+        if self.T.size == 0:
+            raise ValueError('No valid quotes to fit a surface to')
+        self.method = method
+        self.spot = spot
+        self.r = r
+        self.q = q
+        digest = hashlib.sha1(b''.join(x.tobytes() for x in (self.T, self.K, self.volData)))
+        self._key = ('VolSurface', method, spot, r, q, digest.hexdigest())
+        if method == 'linear':
+            self._fitLinear()
+        else:
+            if spot is None:
+                raise ValueError('svi needs the spot price')
+            self._fitSVI()
+
+    #builds chain rows (a chainData frame, one otype) into a surface. T is measured from
+    #asOf (today when None) with the trading calendar, quotes trading under minVolume or
+    #without an implied volatility are dropped
+    @classmethod
+    def fromChain(cls, chain, otype='Put', asOf=None, method='svi', r=0.025, q=0, minVolume=10):
+        rows = chain[(chain['type'] == otype) & (chain['volume'] >= minVolume)]
+        today = None if asOf is None else np.datetime64(asOf, 'D')
+        T = tradingCalendar.yearFraction(rows['expiry'].to_numpy(dtype='datetime64[D]'), today)
+        spot = float(chain['underlying'].iloc[0])
+        return cls(T, rows['strike'].to_numpy(dtype=np.float64), rows['impliedVolatility'].to_numpy(dtype=np.float64),
+                   method=method, spot=spot, r=r, q=q)
+
+    def key(self):
+        return self._key
+
+    @perf.timed('volSurface.fit')
+    def _fitLinear(self):
+        from scipy.interpolate import LinearNDInterpolator, NearestNDInterpolator
+        points = np.column_stack([self.T, self.K])
+        self._linear = LinearNDInterpolator(points, self.volData)
+        self._nearest = NearestNDInterpolator(points, self.volData)
+
+    @perf.timed('volSurface.fit')
+    def _fitSVI(self):
+        self.expiries = np.unique(self.T)
+        slices = np.searchsorted(self.expiries, self.T)
+        counts = np.bincount(slices, minlength=self.expiries.size)
+        #quotes laid out one expiry per row, padded to the longest
+        order = np.argsort(slices, kind='stable')
+        cols = np.arange(self.T.size) - np.repeat(np.cumsum(counts) - counts, counts)
+        k = np.zeros((self.expiries.size, counts.max()))
+        w = np.zeros(k.shape)
+        mask = np.zeros(k.shape, dtype=bool)
+        k[slices[order], cols] = self.logMoneyness(self.K, self.T)[order]
+        w[slices[order], cols] = (self.volData**2*self.T)[order]
+        mask[slices[order], cols] = True
+        self.params = fitSVI(k, w, mask)
+
+    def logMoneyness(self, K, T):
+        return np.log(K/self.spot) - (self.r - self.q)*T
+
+    @perf.timed('volSurface.vol')
+    def vol(self, K, T):
+        K, T = np.broadcast_arrays(np.asarray(K, dtype=np.float64), np.asarray(T, dtype=np.float64))
+        if self.method == 'linear':
+            points = np.column_stack([T.ravel(), K.ravel()])
+            out = self._linear(points)
+            outside = np.isnan(out)
+            if outside.any():
+                out[outside] = self._nearest(points[outside])
+            return out.reshape(K.shape)
+        return self._sviVol(K, T)
+
+    def _sviVol(self, K, T):
+        k = self.logMoneyness(K, T)
+        Ts = self.expiries
+        hi = np.clip(np.searchsorted(Ts, T), 0, Ts.size - 1)
+        lo = np.maximum(hi - 1, 0)
+        wLo = sviVariance(k, *np.moveaxis(self.params[lo], -1, 0))
+        wHi = sviVariance(k, *np.moveaxis(self.params[hi], -1, 0))
+        span = Ts[hi] - Ts[lo]
+        frac = np.clip(np.divide(T - Ts[lo], span, out=np.zeros(T.shape), where=span > 0), 0, 1)
+        #total variance between expiries, constant vol of the nearest expiry outside them
+        tEff = np.clip(T, Ts[0], Ts[-1])
+        return np.sqrt(np.maximum(wLo + frac*(wHi - wLo), 0)/tEff)
+
+    #(TT, KK, vol) over an nT by nK grid spanning the quotes, laid out like make_surf
+    def grid(self, nT, nK=100):
+        TT, KK = np.meshgrid(np.linspace(self.T.min(), self.T.max(), nT), np.linspace(self.K.min(), self.K.max(), nK))
+        return TT, KK, self.vol(KK, TT)
@@ -1,4 +1,3 @@
-from pandas_datareader.data import Options
 from dateutil.parser import parse
 from datetime import datetime
 from numpy import *
@@ -13,11 +12,14 @@ from scipy import stats
 from scipy import interpolate
 import numpy as np
 from scipy.interpolate import griddata
-import yfinance as yf
 import pandas as pd
-import pandas_market_calendars as mcal
 from matplotlib.colors import LinearSegmentedColormap
 from parula import parula
+from pricing import impliedVol
+import perf
+import tradingCalendar
+import chainData
+from volSurface import VolSurface
 
 
 pd.set_option('display.max_columns', None)
@@ -45,62 +47,47 @@ def plot3D(X,Y,Z):
    plt.ylabel("strike")
    plt.show()
 
-def toT(bid, ask, expiry):
-    daysInYear = 255
-    nyse = mcal.get_calendar('NYSE')
-    price = (bid+ask)/2.0
-    expiry = expiry.to_numpy()
-    expDay = expiry.astype('datetime64', copy=False)
-    T = (np.busday_count(np.datetime64('today'), expDay, holidays=nyse.holidays().holidays)+2)/daysInYear
-    return T
+#years to each expiry on the shared NYSE calendar, the same T as option(expDay=) on the
+#pricing side (252 days and +1 unless overridden, rather than the 255 and +2 used before)
+def toT(bid, ask, expiry, daysInYear=None, offset=None, today=None):
+    return tradingCalendar.yearFraction(expiry.to_numpy(dtype='datetime64[D]'), today=today, daysInYear=daysInYear, offset=offset)
 
-def get_surf(ticker, otype):
-   tick = yf.Ticker(ticker)
-   underlying = (tick.info['bid'] + tick.info['ask'])/2
-   dates = list(tick.options)
-   nyse = mcal.get_calendar('NYSE')
-   for i in dates:
-       if np.busday_count(np.datetime64('today'), np.datetime64(i), holidays=nyse.holidays().holidays) < 2:
-           dates.remove(i)
-
-   ran = 0
-   for d in dates:
-       if ran == 0:
-           if otype == 'Put':
-               q = tick.option_chain(d).puts
-           elif otype == 'Call':
-               q = tick.option_chain(d).calls
-           q.insert(14, 'expiry', [d for i in range(len(q.index))])
-           q = q[q['volume'] >= 10]
-           ran = 1
-       else:
-           if otype == 'Put':
-               temp = tick.option_chain(d).puts
-           elif otype == 'Call':
-               temp = tick.option_chain(d).calls
-           temp.insert(14, 'expiry', [d for i in range(len(temp.index))])
-           temp = temp[temp['volume'] >= 10]
-           q = q.append(temp)
-   q['expiry'] = toT(q['bid'], q['ask'], q['expiry'])
+#solveIV inverts mid prices with the batch solver instead of using yahoo's impliedVolatility.
+#the chain comes from source (live Yahoo by default, chainData.ReplaySource for a saved
+#snapshot) and is snapshotted to cache when one is given, see chainData.loadChain.
+#returns the fitted VolSurface (method 'linear' or 'svi') for later vol(K, T) queries
+@perf.timed('volSurfacePlot.get_surf')
+def get_surf(ticker, otype, solveIV=False, r=0.025, divYield=0, source=None, cache=None, maxAge=None, method='linear'):
+   chain, asOf = chainData.loadChain(ticker, source, cache, maxAge)
+   underlying = chain['underlying'].iloc[0]
+   q = chain[(chain['type'] == otype) & (chain['volume'] >= 10)].copy()
+   q['expiry'] = toT(q['bid'], q['ask'], q['expiry'], today=np.datetime64(asOf, 'D'))
+   if solveIV:
+       vol, iterations, noSolution = impliedVol(((q['bid'] + q['ask'])/2).to_numpy(), otype, underlying, q['strike'].to_numpy(dtype=float), r, q['expiry'].to_numpy(dtype=float), divYield)
+       q['impliedVolatility'] = vol
+       q = q[~noSolution]
    q = q[['expiry', 'strike', 'impliedVolatility']]
    q = q[q['expiry'] < 0.25]
    q = q[(q['strike'].astype('float') > underlying * 0.5) & (q['strike'].astype('float') < underlying * 1.5)]
    vals = q.to_numpy().T
    vals = vals.astype(np.float64)
+   surface = VolSurface(vals[0], vals[1], vals[2], method, spot=underlying, r=r, q=divYield)
    fig = plt.figure()
    ax = Axes3D(fig, azim = 170, elev = 40)
-   mesh_plot2(vals[0],vals[1],vals[2], len(set(q['expiry'])),fig, ax, ticker + ' ' + otype + ' Volatility Surface')
+   mesh_plot2(vals[0],vals[1],vals[2], len(set(q['expiry'])),fig, ax, ticker + ' ' + otype + ' Volatility Surface', surface)
+   return surface
 
-def make_surf(X,Y,Z,nDates):
-   XX,YY = meshgrid(linspace(min(X),max(X),nDates),linspace(min(Y),max(Y),int(max(Y)-min(Y))))
-   ZZ = griddata(array([X,Y]).T,array(Z),(XX,YY), method='linear')
-   nans, x = nan_helper(ZZ)
-   ZZ[nans] = np.interp(x(nans), x(~nans), ZZ[~nans])
-   return XX,YY,ZZ
+#nStrikes rows of strike regardless of the price level, gaps outside the quotes take
+#the nearest quote's vol
+@perf.timed('volSurfacePlot.make_surf')
+def make_surf(X,Y,Z,nDates,nStrikes=100,surface=None):
+   surface = VolSurface(X, Y, Z) if surface is None else surface
+   return surface.grid(nDates, nStrikes)
 
-def mesh_plot2(X,Y,Z,nDates,fig,ax, title):
+@perf.timed('volSurfacePlot.mesh_plot2')
+def mesh_plot2(X,Y,Z,nDates,fig,ax, title, surface=None):
    parula_map = LinearSegmentedColormap.from_list('parula', parula())
-   XX,YY,ZZ = make_surf(X,Y,Z,nDates)
+   XX,YY,ZZ = make_surf(X,Y,Z,nDates,surface=surface)
    ax.plot_surface(XX,YY,ZZ, cmap=parula_map)
    ax.set_xlabel("Years to Expiry")
    ax.set_ylabel("Strike")
@@ -108,4 +95,5 @@ def mesh_plot2(X,Y,Z,nDates,fig,ax, title):
    ax.set_title(title)
 
 
-get_surf('SPY', 'Put')
\ No newline at end of file
+if __name__ == '__main__':
+   get_surf('SPY', 'Put')
\ No newline at end of file